@@ -1,5 +1,11 @@
 import streamlit as st
 
+from event_analysis.warmup import ensure_started
+
+# Start precomputing every chart, fit and the search index in worker processes (once per dataset version),
+# so the first visitor of each page does not wait for them
+ensure_started()
+
 # Add page title and contents
 st.title('How Socioeconomic and Infrastructural Factors Influence the Distribution of Music Events Across the U.S.')
 st.markdown('''
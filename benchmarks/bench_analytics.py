@@ -0,0 +1,85 @@
+"""Time each `event_analysis.analytics` function on the dataset and on scaled copies of it.
+
+The scaled datasets replicate the normalized tables 10x, 100x and 1000x,
+renaming the copies' states, cities and airports so every copy adds new
+groups rather than duplicate rows. Run from the app root:
+
+    python benchmarks/bench_analytics.py [scale ...]
+
+Each cell is the median of several runs in milliseconds (best in brackets).
+"""
+import sys
+
+import pandas as pd
+
+from common import print_table, timed
+from event_analysis import analytics, data_loader
+
+SCALES = [1, 10, 100, 1000]
+
+# Columns renamed in every copy, so copies are new states, cities and airports
+RENAMED = {'states': ['State'], 'cities': ['City'], 'airports': ['IATA', 'ICAO', 'Airport Name']}
+ID_COLUMNS = {'states': ['state_id'], 'cities': ['city_id', 'state_id'], 'events': ['event_id', 'city_id'],
+              'airports': ['airport_id', 'city_id']}
+ID_TABLES = {'state_id': 'states', 'city_id': 'cities', 'event_id': 'events', 'airport_id': 'airports'}
+
+
+def scale_tables(tables, factor):
+    """Return the normalized tables replicated `factor` times with renamed, re-keyed copies."""
+    if factor == 1:
+        return tables
+    scaled = {}
+    for name, table in tables.items():
+        copies = []
+        for copy in range(factor):
+            frame = table.copy()
+            for column in ID_COLUMNS[name]:
+                frame[column] = frame[column] + copy * len(tables[ID_TABLES[column]])
+            if name == 'events':
+                frame['Event Number'] = frame['Event Number'] + copy * (int(table['Event Number'].max()) + 1)
+            if copy:
+                for column in RENAMED.get(name, []):
+                    frame[column] = frame[column].astype(str) + f' {copy}'
+            copies.append(frame)
+        scaled[name] = pd.concat(copies, ignore_index=True)
+    return scaled
+
+
+def _cases(tables):
+    state_summary = analytics.state_summary(tables)
+    city_summary = analytics.city_summary(tables)
+    ranked = analytics.events_per_city(city_summary)
+    return [
+        ('state_summary', lambda: analytics.state_summary(tables)),
+        ('city_summary', lambda: analytics.city_summary(tables)),
+        ('events_per_state', lambda: analytics.events_per_state(state_summary)),
+        ('events_per_city', lambda: analytics.events_per_city(city_summary)),
+        ("events_per_city('port')", lambda: analytics.events_per_city(city_summary, 'port')),
+        ('ranking_window', lambda: analytics.ranking_window(ranked, 'Number of Events', 'City_State')),
+        ('predictor_table (each)', lambda: [analytics.predictor_table(city_summary, 'city', predictor) for predictor
+                                            in analytics.regression.available_predictors('city', city_summary)]),
+        ('regression_summary(state)', lambda: analytics.regression_summary(state_summary, 'state')),
+        ('regression_summary(city)', lambda: analytics.regression_summary(city_summary, 'city')),
+    ]
+
+
+def main(*scales):
+    scales = [int(scale) for scale in scales] or SCALES
+    tables = data_loader.load_tables()
+
+    columns, sizes = {}, []
+    for factor in scales:
+        scaled = scale_tables(tables, factor)
+        sizes.append(f'{factor}x: {len(scaled["events"])} events, {len(scaled["cities"])} cities')
+        repeat = 7 if factor < 100 else 3
+        for name, fn in _cases(scaled):
+            best, median = timed(fn, repeat=repeat)
+            columns.setdefault(name, []).append(f'{median * 1e3:.2f} ({best * 1e3:.2f})')
+
+    print_table(['function'] + [f'{factor}x (ms)' for factor in scales],
+                [[name] + cells for name, cells in columns.items()])
+    print('\n' + '\n'.join(sizes))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,73 @@
+"""Measure figure payload and render time of the per-city bar chart, full versus top-N window.
+
+"Render" is building the Plotly figure plus serializing it to the JSON that
+`st.plotly_chart` ships to the browser. Run from the app root:
+
+    python benchmarks/bench_city_bar.py [page_size]
+
+Besides the real city summary, synthetic rankings with more cities show how
+both versions scale.
+"""
+import sys
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+from common import print_table, timed
+from event_analysis import analytics, charts, data_loader
+
+LABELS = {'Number of Events': 'Number of Events', 'City_State': 'City, State'}
+
+
+def _full_chart(ranking):
+    # The chart as it was before: one bar per city in a fixed 1200px figure
+    ranked = ranking.sort_values(by='Number of Events', ascending=False)
+    fig = px.bar(ranked, x='Number of Events', y='City_State', orientation='h', labels=LABELS,
+                 title='Number of Music Events per City', color_discrete_sequence=['lightcoral'])
+    fig.update_layout(xaxis_title='Number of Events', yaxis_title='City, State', height=1200, width=800,
+                      margin=dict(l=0, r=0, t=50, b=0), yaxis={'categoryorder': 'total ascending', 'tickangle': 0},
+                      showlegend=False)
+    return fig.to_json()
+
+
+def _window_chart(ranking, page_size):
+    ranked = analytics.rank_rows(ranking, 'Number of Events', 'City_State')
+    window, rest = analytics.ranking_window(ranked, 'Number of Events', 'City_State', 1, page_size,
+                                            others_label='Others ({count} cities)')
+    fig = charts.ranked_bar(window, 'Number of Events', 'City_State', labels=LABELS,
+                            title='Number of Music Events per City', has_others=rest > 0)
+    return fig.to_json()
+
+
+def _synthetic(cities, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'City_State': [f'City {i}, State {i % 50}' for i in range(cities)],
+        'Number of Events': rng.zipf(1.6, cities).clip(max=10000),
+    })
+
+
+def main(page_size=25):
+    page_size = int(page_size)
+    summary = data_loader.load_city_summary()
+    real = pd.DataFrame({
+        'City_State': summary['City'].astype(str) + ', ' + summary['State'].astype(str),
+        'Number of Events': summary['Number of Events'],
+    })
+
+    rows = []
+    for name, ranking in [('dataset', real)] + [(f'synthetic {n}', _synthetic(n)) for n in (500, 5000, 50000)]:
+        full_bytes = len(_full_chart(ranking))
+        window_bytes = len(_window_chart(ranking, page_size))
+        full_time, _ = timed(lambda: _full_chart(ranking), repeat=5)
+        window_time, _ = timed(lambda: _window_chart(ranking, page_size), repeat=5)
+        rows.append([name, len(ranking), f'{full_bytes / 1024:.1f}', f'{window_bytes / 1024:.1f}',
+                     f'{full_time * 1e3:.1f}', f'{window_time * 1e3:.1f}'])
+
+    print_table(['ranking', 'cities', 'full (KB)', f'top {page_size} (KB)', 'full render (ms)',
+                 f'top {page_size} render (ms)'], rows)
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:2])
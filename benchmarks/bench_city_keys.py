@@ -0,0 +1,169 @@
+"""Check that every city computation keys on (City, State) and time the single-pass city summary.
+
+Several U.S. cities share a name (Portland, OR and Portland, ME; the
+Springfields of Illinois, Massachusetts and Missouri). This script writes a
+small dataset in the layout of WANG_QING_final_data.csv with such cities,
+plus the dataset at `csv_path` when given, and checks on each that:
+
+- (homonyms dataset only) every one of those cities is its own row of the
+  city summary and its own bar, with the events, airports and population it
+  was written with;
+- the bar chart ranking (`analytics.events_per_city`) has one bar per
+  (City, State), with the distinct events a (City, State) groupby of the flat
+  rows counts;
+- the city summary has the same airports, population and income per
+  (City, State);
+- the regressions are fitted on one point per city, with the same
+  coefficients as a fit on the flat (City, State) groupby.
+
+It then times `aggregates.city_dimension` against distinct counts by groupby
+joined to the cities table. Failed checks are listed by name and the script
+exits with status 1. Run from the app root:
+
+    python benchmarks/bench_city_keys.py [csv_path]
+"""
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from common import print_table, timed
+from event_analysis import aggregates, analytics, regression, schema, snapshot
+
+KEYS = ['City', 'State']
+
+# (City, State, Population_city, Median Household Income_city, IATA codes, events)
+HOMONYMS = [
+    ('Portland', 'Oregon', 652503, '$85,876', ['PDX', 'HIO'], 9),
+    ('Portland', 'Maine', 68408, '$71,186', ['PWM'], 4),
+    ('Springfield', 'Illinois', 114394, '$56,497', ['SPI'], 3),
+    ('Springfield', 'Massachusetts', 155929, '$45,236', [], 5),
+    ('Springfield', 'Missouri', 169176, '$44,692', ['SGF'], 6),
+    ('Salem', 'Oregon', 175535, '$69,341', [], 2),
+    ('Salem', 'Massachusetts', 44480, '$80,151', [], 1),
+]
+STATES = {'Oregon': ('4,240,137', '$76,632'), 'Maine': ('1,385,340', '$68,251'),
+          'Illinois': ('12,549,689', '$78,433'), 'Massachusetts': ('7,001,399', '$96,505'),
+          'Missouri': ('6,196,156', '$65,920')}
+
+
+def write_homonyms(path):
+    """Write a flat CSV with one row per (event, airport) of the `HOMONYMS` cities."""
+    rows, number = [], 0
+    for city, state, population, income, codes, events in HOMONYMS:
+        for _ in range(events):
+            number += 1
+            for code in codes or [None]:
+                rows.append({'Event Number': number, 'City': city, 'State': state,
+                             'Population_state': STATES[state][0], 'Median Household Income_state': STATES[state][1],
+                             'Population_city': f'{population:,}', 'Median Household Income_city': income,
+                             'IATA': code, 'ICAO': code and 'K' + code, 'Airport Name': code and f'{code} Airport'})
+    pd.DataFrame(rows).to_csv(path, index=False)
+
+
+def _expected(flat):
+    # The per-city figures straight from the flat rows, grouped by (City, State)
+    grouped = flat.groupby(KEYS, observed=True)
+    expected = pd.DataFrame({'Number of Events': grouped['Event Number'].nunique(),
+                             'Number of Airports': grouped['IATA'].nunique(),
+                             'Population_city': grouped['Population_city'].first(),
+                             'Median Household Income_city': grouped['Median Household Income_city'].first()})
+    expected.index = expected.index.set_levels([level.astype(str) for level in expected.index.levels])
+    return expected
+
+
+def check_homonyms(summary, ranking, expected):
+    # Every `HOMONYMS` city is one summary row and one bar, with the values it was written with
+    assert len(summary) == len(HOMONYMS), f'{len(summary)} summary rows for {len(HOMONYMS)} cities'
+    rows = summary.set_index(KEYS)
+    bars = ranking.set_index('City_State')['Number of Events']
+    for city, state, population, _, codes, events in HOMONYMS:
+        assert (city, state) in rows.index, f'{city}, {state} is missing from the city summary'
+        row = rows.loc[(city, state)]
+        assert row['Number of Events'] == events, f'{city}, {state} has {row["Number of Events"]} events, not {events}'
+        assert row['Number of Airports'] == len(codes), \
+            f'{city}, {state} has {row["Number of Airports"]} airports, not {len(codes)}'
+        assert row['Population_city'] == population, f'{city}, {state} has the population of another {city}'
+        assert bars.get(f'{city}, {state}') == events, f'the {city}, {state} bar does not show {events} events'
+
+
+def check_bars(summary, ranking, expected):
+    # The bar chart: one bar per (City, State) with its distinct events
+    assert len(summary) == len(expected), 'the city summary does not have one row per (City, State)'
+    assert ranking['City_State'].is_unique, 'two bars share a City, State label'
+    bars = ranking.set_index(KEYS)['Number of Events']
+    pd.testing.assert_series_equal(bars.sort_index(), expected['Number of Events'].sort_index(), check_dtype=False)
+
+
+def check_columns(summary, ranking, expected):
+    # The other per-city columns the scatter plots use
+    columns = ['Number of Airports', 'Population_city', 'Median Household Income_city']
+    pd.testing.assert_frame_equal(summary.set_index(KEYS)[columns].sort_index(), expected[columns].sort_index(),
+                                  check_dtype=False)
+
+
+def check_regressions(summary, ranking, expected):
+    # The regressions: one point per city, the same fits as on the flat groupby
+    predictors = regression.PREDICTORS['city'][:3]
+    actual = regression.batch_ols(summary[predictors].to_numpy(), summary['Number of Events'].to_numpy())
+    reference = regression.batch_ols(expected[predictors].to_numpy(), expected['Number of Events'].to_numpy())
+    assert (actual['n'] == len(expected)).all(), 'a regression is not fitted on one point per city'
+    for name in ['slope', 'intercept', 'r_squared']:
+        assert np.allclose(actual[name], reference[name], equal_nan=True), f'the {name} differs from the flat groupby'
+
+
+def check(flat, homonyms=False):
+    """Run the checks on one flat frame; return (cities, cities sharing a name, [(check, error)] of the failed ones)."""
+    expected = _expected(flat)
+    summary = aggregates.build_city_summary(schema.normalize(flat))
+    ranking = analytics.events_per_city(summary)
+    checks = ([check_homonyms] if homonyms else []) + [check_bars, check_columns, check_regressions]
+
+    failures = []
+    for run in checks:
+        try:
+            run(summary, ranking, expected)
+        except AssertionError as error:
+            failures.append((run.__name__, str(error).strip().splitlines()[0]))
+    shared = int(expected.index.get_level_values('City').duplicated(keep=False).sum())
+    return len(expected), shared, failures
+
+
+def _grouped_summary(tables):
+    # Distinct counts by groupby, joined to the cities table
+    summary = schema.city_keys(tables).set_index('city_id')
+    summary = summary.join(tables['events'].groupby('city_id')['Event Number'].nunique().rename('Number of Events'))
+    summary = summary.join(tables['airports'].groupby('city_id')['airport_id'].nunique().rename('Number of Airports'))
+    return summary.fillna({'Number of Events': 0, 'Number of Airports': 0})
+
+
+def main(csv_path=None):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'homonyms.csv')
+        write_homonyms(path)
+        datasets = [('homonyms', snapshot.read_csv(path))]
+        if csv_path:
+            datasets.append((csv_path, snapshot.read_csv(csv_path)))
+
+        rows, failed = [], []
+        for name, flat in datasets:
+            cities, shared, failures = check(flat, homonyms=name == 'homonyms')
+            failed += [(name, check_name, error) for check_name, error in failures]
+            tables = schema.normalize(flat)
+            single, _ = timed(lambda: aggregates.city_dimension(tables))
+            grouped, _ = timed(lambda: _grouped_summary(tables))
+            rows.append([name, f'{cities:,}', f'{shared:,}', f'{len(failures)} failed' if failures else 'ok',
+                         f'{single * 1e3:.2f}', f'{grouped * 1e3:.2f}'])
+        print_table(['dataset', 'cities', 'sharing a name', 'checks', 'single pass (ms)', 'groupby + join (ms)'],
+                    rows)
+
+    for name, check_name, error in failed:
+        print(f'FAILED {name}: {check_name}: {error}')
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:2])
@@ -0,0 +1,58 @@
+"""Throughput of the concurrent fetch engine against a local mock server.
+
+Fetches the 26 Wikipedia letter pages and 20 Ticketmaster result pages
+sequentially (one urllib request at a time) and through `FetchEngine`, with
+50 ms of simulated server latency and an occasional 429 response.
+
+    python benchmarks/bench_fetch.py
+"""
+import string
+import time
+
+from common import print_table
+from mock_server import MockServer
+from event_analysis.ingest import transport
+from event_analysis.ingest.engine import FetchEngine
+
+RATE = 20.0
+
+
+def _urls(base_url, total_pages):
+    pages = [f'{base_url}/wiki/List_of_airports_by_IATA_airport_code:_{letter}' for letter in string.ascii_uppercase]
+    events = [f'{base_url}/discovery/v2/events.json?page={page}' for page in range(total_pages)]
+    return pages + events
+
+
+def _sequential(urls):
+    for url in urls:
+        # The sequential baseline has no retry logic, so keep going until the request is not throttled
+        while transport.fetch(url).status == 429:
+            pass
+
+
+def main():
+    rows = []
+    for name in ['sequential urllib', 'FetchEngine']:
+        with MockServer(latency=0.05, throttle_every=15) as server:
+            urls = _urls(server.base_url, 20)
+            engine = FetchEngine(max_workers=8, default_rate=RATE, backoff=0.05)
+            start = time.perf_counter()
+            if name == 'sequential urllib':
+                _sequential(urls)
+                retries = len(server.request_times) - len(urls)
+            else:
+                responses = engine.map(engine.fetch, urls)
+                assert all(response.status == 200 for response in responses)
+                retries = engine.stats['retries']
+            seconds = time.perf_counter() - start
+            engine.close()
+            rows.append([name, len(urls), f'{seconds:.2f}', f'{len(urls) / seconds:.1f}', retries, server.peak_rate()])
+
+    print_table(['client', 'pages', 'seconds', 'pages/s', 'retries', 'peak requests in 1 s'], rows)
+    # A token bucket allows at most `burst` requests plus `rate` refills within any one second
+    print(f'\nFetchEngine rate limit: {RATE:.0f} requests/s per host with a burst of {RATE:.0f}, '
+          f'so at most {2 * RATE:.0f} requests can land in one second')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""Build the map geometry from synthetic boundary and place files and time the maps at each zoom.
+
+The Census files are not shipped with the repository, so this script writes
+stand-ins of similar size: one jagged outline of `points` vertices (plus a
+few islands) per state around a point of its real region, and a Gazetteer
+place file with `places` places. It then reports:
+
+- the build time, the size of the GeoJSON input and of `geo.npz`, and the
+  points kept at each level of detail;
+- for the whole country and for one zoomed state: the level of detail
+  picked, the time to build the choropleth and the size of its JSON, against
+  drawing the same view from the unsimplified outlines.
+
+Run from the app root:
+
+    python benchmarks/bench_geo.py [points] [places]
+"""
+import json
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from common import print_table, timed
+from event_analysis import charts, geo
+from event_analysis.ingest.matching import STATE_ABBREVIATIONS
+
+# Rough (longitude, latitude) of the states outside the contiguous grid
+INSETS = {'Alaska': (-152.0, 64.0), 'Hawaii': (-157.0, 20.5), 'Puerto Rico': (-66.5, 18.2)}
+
+
+def _outline(rng, lon, lat, radius, points):
+    # A closed ring with fractal-looking noise on its radius
+    angles = np.linspace(0, 2 * np.pi, points, endpoint=False)
+    noise = sum(rng.normal(0, 0.25 / octave, points).cumsum() / np.sqrt(points) for octave in (1, 2, 4))
+    radii = radius * np.exp(0.3 * (noise - noise.mean()))
+    ring = np.column_stack([lon + radii * np.cos(angles) / np.cos(np.radians(lat)), lat + radii * np.sin(angles)])
+    return np.vstack([ring, ring[:1]])
+
+
+def write_inputs(directory, points=3000, places=30000, seed=0):
+    """Write states.geojson and places.txt stand-ins into `directory`; return their paths."""
+    rng = np.random.default_rng(seed)
+    names = sorted(set(STATE_ABBREVIATIONS.values()))
+    grid = [name for name in names if name not in INSETS]
+    centers = {name: (-121.0 + 5.2 * (index % 10), 30.0 + 3.8 * (index // 10)) for index, name in enumerate(grid)}
+    centers.update(INSETS)
+
+    features = []
+    for name, (lon, lat) in centers.items():
+        rings = [_outline(rng, lon, lat, 1.6, points)]
+        rings += [_outline(rng, lon + rng.uniform(-2, 2), lat + rng.uniform(-2, 2), rng.uniform(0.02, 0.3), points // 20)
+                  for _ in range(5)]
+        features.append({'type': 'Feature', 'properties': {'NAME': name},
+                         'geometry': {'type': 'MultiPolygon', 'coordinates': [[ring.tolist()] for ring in rings]}})
+    states_path = os.path.join(directory, 'states.geojson')
+    with open(states_path, 'w') as handle:
+        json.dump({'type': 'FeatureCollection', 'features': features}, handle)
+
+    codes = {name: code for code, name in STATE_ABBREVIATIONS.items()}
+    state = rng.choice(names, places)
+    lon, lat = np.array([centers[name] for name in state]).T
+    places_path = os.path.join(directory, 'places.txt')
+    pd.DataFrame({'USPS': [codes[name] for name in state], 'NAME': [f'City {index} city' for index in range(places)],
+                  'INTPTLAT': lat + rng.normal(0, 0.8, places),
+                  'INTPTLONG': lon + rng.normal(0, 0.8, places)}).to_csv(places_path, sep='\t', index=False)
+    return states_path, places_path
+
+
+def _choropleth(geometry, focus, level=None):
+    bounds = geometry.bounds(None if focus is None else [focus])
+    states = geometry.states_in(bounds)
+    level = geometry.level_for(bounds) if level is None else level
+    outlines = [geometry.outline(state, level) for state in states]
+    points = [np.nanmean(outline, axis=0) for outline in outlines]
+    values = np.arange(len(states))
+    return charts.outline_choropleth(outlines, points, values, list(states), 'Map', bounds, 'Events'), level
+
+
+def main(points=3000, places=30000):
+    with tempfile.TemporaryDirectory() as directory:
+        states_path, places_path = write_inputs(directory, int(points), int(places))
+        output = os.path.join(directory, 'geo.npz')
+        best, _ = timed(lambda: geo.build_geometry(states_path, places_path, output), repeat=1)
+        report = geo.build_geometry(states_path, places_path, output)
+        print(f"build {best:.2f}s: {report['states']} states, {report['source_points']:,} points, "
+              f"{report['places']:,} places; GeoJSON {os.path.getsize(states_path) / 1e6:.1f} MB -> "
+              f"geo.npz {report['bytes'] / 1e6:.2f} MB")
+        print('points per level: ' + ', '.join(f"{tolerance:g} km: {report[f'level_{level}_points']:,}"
+                                                for level, tolerance in enumerate(geo.LEVELS)))
+        geometry = geo.load_geometry(output)
+        # A tolerance of 0 keeps every point: the outlines as a map without levels of detail would draw them
+        geo.build_geometry(states_path, places_path, output + '.full.npz', levels=(0.0,))
+        full = geo.load_geometry(output + '.full.npz')
+        print()
+
+        rows = []
+        for view, focus in [('United States', None), ('one state', 'Texas')]:
+            for name, source, level in [('level of detail', geometry, None), ('unsimplified', full, 0)]:
+                fig, used = _choropleth(source, focus, level)
+                best, _ = timed(lambda: _choropleth(source, focus, level)[0].to_json())
+                rows.append([view, name, f'{source.levels[used]:g} km', f'{best * 1e3:.1f}',
+                             f'{len(fig.to_json()) / 1e3:.0f}'])
+        print_table(['view', 'outlines', 'tolerance', 'build + JSON (ms)', 'JSON (kB)'], rows)
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:3])
@@ -0,0 +1,67 @@
+"""Latency of Specific Search lookups: pandas summaries versus the prebuilt `SearchIndex`.
+
+Replays random state and (City, State) selections the way the tab handles
+them: fill the city dropdown for the state, then read the metrics of the
+selected state or city. Run from the app root:
+
+    python benchmarks/bench_lookup.py [lookups]
+"""
+import random
+import statistics
+import sys
+import time
+
+from common import print_table, timed
+from event_analysis import data_loader, lookup
+
+
+def _pandas_lookup(state_metrics, city_metrics, city_summary, state, city):
+    # What the tab did before: filter the summary for the dropdown, then index into the frames
+    sorted(city_summary.loc[city_summary['State'] == state, 'City'])
+    state_metrics.loc[state, ['Number of Events', 'Population_state', 'Median Household Income_state',
+                              'Number of Airports']]
+    city_metrics.loc[(city, state), ['Number of Events', 'Population_city', 'Median Household Income_city',
+                                     'Number of Airports']]
+
+
+def _index_lookup(index, state, city):
+    index.cities(state)
+    index.state(state)
+    index.city(city, state)
+
+
+def _latencies(fn, selections):
+    samples = []
+    for state, city in selections:
+        start = time.perf_counter()
+        fn(state, city)
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return statistics.mean(samples), samples[len(samples) // 2], samples[int(len(samples) * 0.99)]
+
+
+def main(lookups=10000):
+    state_summary = data_loader.load_state_summary()
+    city_summary = data_loader.load_city_summary()
+    build, _ = timed(lambda: lookup.SearchIndex(state_summary, city_summary), repeat=5)
+    index = lookup.SearchIndex(state_summary, city_summary)
+
+    rng = random.Random(0)
+    pairs = [(state, city) for state in index.states for city in index.cities(state)]
+    selections = [rng.choice(pairs) for _ in range(int(lookups))]
+
+    state_metrics = state_summary.set_index('State')
+    city_metrics = city_summary.set_index(['City', 'State'])
+    old = _latencies(lambda state, city: _pandas_lookup(state_metrics, city_metrics, city_summary, state, city),
+                     selections)
+    new = _latencies(lambda state, city: _index_lookup(index, state, city), selections)
+
+    print_table(['path', 'mean (us)', 'p50 (us)', 'p99 (us)'],
+                [[name, *(f'{value * 1e6:.2f}' for value in values)]
+                 for name, values in [('pandas summaries', old), ('SearchIndex', new)]])
+    print(f'\n{len(selections)} lookups over {len(pairs)} cities; index build: {build * 1e3:.2f} ms, '
+          f'speedup (mean): {old[0] / new[0]:.0f}x')
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:2])
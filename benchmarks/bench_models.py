@@ -0,0 +1,115 @@
+"""Check the model options of `event_analysis.models` against statsmodels and time them at city level.
+
+For the city summary of `csv_path` (e.g. a synthetic dataset with thousands
+of cities, see `event_analysis.synthetic`), every combination of transform,
+estimator and standard errors is fitted on all city predictors at once and:
+
+- compared, predictor by predictor, with statsmodels: `OLS` (classical and
+  `cov_type='HC3'`), `RLM` with `HuberT`, and `GLM` with the Poisson and
+  negative binomial families (the latter at the alpha `models` estimated),
+  fitted to a tight tolerance (fits where statsmodels diverges are
+  reported, not compared). statsmodels' GLM `cov_type='HC3'` has no
+  leverage correction (it equals HC0), so the GLM HC3 errors are checked
+  against the sandwich built from the GLM's scores and leverages instead;
+- timed from the cached design matrices, against statsmodels (at its default
+  tolerance) fitting the predictors one by one. Toggling an option costs only this fit.
+
+The script exits with status 1 when any compared fit differs from statsmodels.
+
+Run from the app root:
+
+    python benchmarks/bench_models.py [csv_path]
+"""
+import sys
+import warnings
+
+import numpy as np
+import statsmodels.api as sm
+
+from common import print_table, timed
+from event_analysis import aggregates, models, regression, schema, snapshot
+
+TOLERANCE = 1e-5
+
+
+def _statsmodels_fit(x, y, options, alpha, tol=1e-13):
+    # The same model of one predictor with statsmodels: (params, bse, rows used), or None if it diverged
+    valid = np.isfinite(x) & np.isfinite(y)
+    exog, endog = sm.add_constant(x[valid], has_constant='add'), y[valid]
+    cov_type = 'HC3' if options.errors == 'hc3' else 'nonrobust'
+    if options.estimator == 'ols':
+        result = sm.OLS(endog, exog).fit(cov_type=cov_type)
+    elif options.estimator == 'huber':
+        result = sm.RLM(endog, exog, M=sm.robust.norms.HuberT()).fit()
+    else:
+        family = sm.families.Poisson() if options.estimator == 'poisson' else sm.families.NegativeBinomial(alpha=alpha)
+        result = sm.GLM(endog, exog, family=family).fit(tol=tol, maxiter=1000)
+        if not np.isfinite(result.deviance):
+            # statsmodels' IRLS has no step-halving and can diverge on raw-scale predictors
+            return None
+        if options.errors == 'hc3':
+            # Leverage from the expected-information weights the bread (X'WX)^-1 uses
+            bread = result.cov_params()
+            weighted = exog * np.sqrt(result.model.family.weights(result.mu))[:, None]
+            leverage = np.einsum('ij,jk,ik->i', weighted, bread, weighted)
+            scores = result.model.score_obs(result.params) / (1 - leverage)[:, None]
+            return np.asarray(result.params), np.sqrt(np.diag(bread @ scores.T @ scores @ bread)), int(valid.sum())
+    return np.asarray(result.params), np.asarray(result.bse), int(valid.sum())
+
+
+def _close(actual, expected):
+    return np.allclose(actual, expected, rtol=TOLERANCE, atol=1e-12)
+
+
+def main(csv_path=snapshot.DATA_PATH):
+    summary = aggregates.build_city_summary(schema.normalize(snapshot.read_csv(csv_path)))
+    predictors = regression.available_predictors('city', summary)
+    x_raw = summary[predictors].to_numpy(dtype=float)
+    y_raw = summary[regression.RESPONSE].to_numpy(dtype=float)
+    print(f'{len(summary):,} cities, {len(predictors)} predictors')
+    print()
+
+    rows, mismatched = [], 0
+    for transform in models.TRANSFORMS:
+        for estimator in models.ESTIMATORS:
+            for errors in models.ERRORS:
+                if estimator == 'huber' and errors == 'hc3':
+                    continue
+                options = models.ModelOptions(transform, estimator, errors)
+                x = models.transform(x_raw, transform)
+                y = y_raw if models.is_count_model(options) else models.transform(y_raw, transform)
+                fit = models.fit_arrays(x, y, options)
+
+                matches, compared = 0, 0
+                for j in range(len(predictors)):
+                    with warnings.catch_warnings():
+                        warnings.simplefilter('ignore')
+                        reference = _statsmodels_fit(x[:, j], y, options, fit['alpha'][j])
+                    if reference is None:
+                        continue
+                    params, bse, n = reference
+                    compared += 1
+                    matches += (n == fit['n'][j]
+                                and _close([fit['intercept'][j], fit['slope'][j]], params)
+                                and _close([fit['intercept_se'][j], fit['slope_se'][j]], bse))
+
+                best, _ = timed(lambda: models.fit_arrays(x, y, options))
+                with warnings.catch_warnings():
+                    warnings.simplefilter('ignore')
+                    # statsmodels at its default tolerance
+                    elapsed, _ = timed(lambda: [_statsmodels_fit(x[:, j], y, options, fit['alpha'][j], tol=1e-8)
+                                                for j in range(len(predictors))], repeat=1)
+                mismatched += compared - matches
+                diverged = len(predictors) - compared
+                rows.append([transform, estimator, errors,
+                             f'{matches}/{compared}' + (f' ({diverged} diverged)' if diverged else ''),
+                             f'{best * 1e3:.1f}', f'{elapsed * 1e3:.1f}'])
+    print_table(['transform', 'estimator', 'errors', 'match statsmodels', 'fit, all predictors (ms)',
+                 'statsmodels (ms)'], rows)
+    if mismatched:
+        print(f'\n{mismatched} fits differ from statsmodels')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:2])
@@ -0,0 +1,91 @@
+"""Time date-range summaries from the month partitions against rescanning the raw events.
+
+On a dataset with event dates (e.g. a synthetic one, see
+`event_analysis.synthetic`), this script:
+
+- writes the month partitions of the daily counts into a temporary directory;
+- adds one day of new events after the last date and writes them again,
+  showing that only the partition of that month is rewritten;
+- times the city summary for ranges of growing length, summed from the
+  partitions (`partitions.Partitions.summary`) and recomputed from the raw
+  events table, and checks that both give the same counts.
+
+Run from the app root:
+
+    python benchmarks/bench_partitions.py [csv_path] [new_events]
+"""
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from common import print_table, timed
+from event_analysis import aggregates, partitions, schema, snapshot
+
+
+def rescan(tables, summary, start, end):
+    """The city summary with events counted from `start` to `end`, recomputed from the events table."""
+    events = tables['events']
+    dated = events[(events['Event Date'] >= start) & (events['Event Date'] <= end)]
+    counts = dated.groupby('city_id')['Event Number'].nunique()
+    keys = schema.city_keys(tables).set_index('city_id')[['City', 'State']].join(counts).fillna(0)
+    counts = keys.set_index(['City', 'State'])['Event Number'].astype('int64').rename('Number of Events')
+    filtered = summary.drop(columns='Number of Events').join(counts, on=['City', 'State'])
+    filtered['Number of Events'] = filtered['Number of Events'].fillna(0).astype('int64')
+    return filtered[list(summary.columns)]
+
+
+def _new_day(tables, count, seed=0):
+    # `count` new events on the day after the last one, in random cities
+    events = tables['events']
+    rng = np.random.default_rng(seed)
+    day = events['Event Date'].max() + pd.Timedelta(days=1)
+    new = pd.DataFrame({'Event Number': np.arange(count) + events['Event Number'].max() + 1,
+                        'Event Date': np.full(count, day),
+                        'city_id': rng.choice(tables['cities']['city_id'].to_numpy(), count)})
+    new = new.astype(events[new.columns].dtypes.to_dict())
+    return dict(tables, events=pd.concat([events, new], ignore_index=True))
+
+
+def main(csv_path=snapshot.DATA_PATH, new_events=500):
+    tables = schema.normalize(snapshot.read_csv(csv_path))
+    if 'Event Date' not in tables['events'].columns:
+        sys.exit(f'{csv_path} has no Event Date column')
+    summary = aggregates.build_city_summary(tables)
+
+    rows = []
+    updated = _new_day(tables, int(new_events))
+    with tempfile.TemporaryDirectory() as directory:
+        for name, data in [('initial build', tables), (f'+1 day ({int(new_events)} events)', updated)]:
+            start = time.perf_counter()
+            counts = partitions.daily_counts(data)
+            aggregated = time.perf_counter() - start
+            report = partitions.write_partitions(counts, directory)
+            rows.append([name, f'{aggregated:.3f}', f'{time.perf_counter() - start - aggregated:.3f}',
+                         len(report['written']), len(report['kept'])])
+        print_table(['partitions', 'daily counts (s)', 'write (s)', 'months written', 'months kept'], rows)
+        print()
+
+        start = time.perf_counter()
+        dated = partitions.load(directory)
+        print(f'{len(dated.months)} month partitions loaded in {time.perf_counter() - start:.3f}s, '
+              f'{dated.first} to {dated.last}')
+
+    # Queries run on the updated dataset, which the partitions now hold
+    tables, rows = updated, []
+    for days in [7, 30, 90, 365, (dated.last - dated.first).days + 1]:
+        start, end = dated.first.isoformat(), (dated.first + pd.Timedelta(days=days - 1)).isoformat()
+        expected = rescan(tables, summary, start, end)
+        pd.testing.assert_frame_equal(dated.summary(summary, start, end), expected)
+        best_partitions, _ = timed(lambda: dated.summary(summary, start, end))
+        best_rescan, _ = timed(lambda: rescan(tables, summary, start, end))
+        rows.append([days, int(expected['Number of Events'].sum()), f'{best_partitions * 1e3:.2f}',
+                     f'{best_rescan * 1e3:.1f}', f'{best_rescan / best_partitions:.0f}x'])
+    print()
+    print_table(['range (days)', 'events', 'partitions (ms)', 'rescan (ms)', 'speed-up'], rows)
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:3])
@@ -0,0 +1,142 @@
+"""Offline end-to-end run of `event_analysis.ingest.pipeline` against recorded-style fixtures.
+
+Serves a small fixed set of events, Census tables, Wikipedia airport rows and
+OurAirports coordinates from the local mock server, then:
+
+- runs the pipeline on one day and checks the merged CSV: every event of a
+  known place is kept with the airports of its (City, State), so Portland, OR
+  and Portland, ME get their own airport, and the event of an unknown place
+  is dropped;
+- runs it again on the next day, after one upcoming event moved to another
+  city and a new one was announced, and checks that only the windows that
+  were still open are requested again, that the cache holds no window
+  outside the refreshed range, and that the merged CSV has the new details.
+
+    python benchmarks/bench_pipeline.py
+"""
+import datetime
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from common import print_table
+from mock_server import MockServer
+from event_analysis.ingest import pipeline, ticketmaster
+from event_analysis.ingest.cache import RawCache
+from event_analysis.ingest.census import CensusSource
+from event_analysis.ingest.engine import FetchEngine
+from event_analysis.ingest.ourairports import OurAirportsSource
+from event_analysis.ingest.ticketmaster import TicketmasterSource
+from event_analysis.ingest.wikipedia import WikipediaAirportsSource
+
+TODAY = datetime.date(2026, 10, 14)
+CITIES = [('Portland', 'Oregon'), ('Portland', 'Maine'), ('Chicago', 'Illinois'), ('Nowhere', 'Nevada')]
+AIRPORTS = {('Portland', 'Oregon'): ['PDX'], ('Portland', 'Maine'): ['PWM'], ('Chicago', 'Illinois'): ['MDW', 'ORD']}
+COORDINATES = {'PDX': (45.5887, -122.5975), 'PWM': (43.6462, -70.3093), 'ORD': (41.9786, -87.9048),
+               'MDW': (41.7868, -87.7522)}
+
+
+def _event(number, day, city, state):
+    return {'id': f'E{number:03d}', 'dates': {'start': {'localDate': day.isoformat()}},
+            '_embedded': {'venues': [{'city': {'name': city}, 'state': {'name': state},
+                                      'location': {'latitude': '45.0', 'longitude': '-100.0'}}]}}
+
+
+def _fixtures():
+    # One event every 13 days from six months back to ten months ahead, rotating over the cities
+    events = [_event(number, TODAY + datetime.timedelta(days=13 * number - 180), *CITIES[number % len(CITIES)])
+              for number in range(40)]
+    rows = ''.join(f'<tr><td>{iata}</td><td>K{iata}</td><td>{city} Airport</td><td>{city}, {state}, United States</td></tr>'
+                   for (city, state), codes in AIRPORTS.items() for iata in codes)
+    return {
+        'events': events,
+        'states': [['NAME', 'B01003_001E', 'B19013_001E', 'state'], ['Oregon', '4240000', '76000', '41'],
+                   ['Maine', '1390000', '69000', '23'], ['Illinois', '12550000', '78000', '17']],
+        'places': [['NAME', 'B01003_001E', 'B19013_001E', 'state', 'place'],
+                   ['Portland city, Oregon', '650000', '85000', '41', '59000'],
+                   ['Portland city, Maine', '68000', '71000', '23', '60545'],
+                   ['Chicago city, Illinois', '2700000', '71000', '17', '14000']],
+        # Every airport on one letter page is enough for the parser; the other letters are empty tables
+        'pages': {'P': f'<table class="wikitable"><tr><th>IATA</th><th>ICAO</th><th>Airport</th>'
+                       f'<th>Location served</th></tr>{rows}</table>'},
+        'airports.csv': 'iata_code,latitude_deg,longitude_deg\n' + ''.join(
+            f'{iata},{lat},{lon}\n' for iata, (lat, lon) in COORDINATES.items()),
+    }
+
+
+def _run(server, cache_dir, output, today):
+    cache = RawCache(cache_dir)
+    engine = FetchEngine(default_rate=1000.0)
+    sources = {
+        'ticketmaster': TicketmasterSource(cache, 'key', base_url=server.base_url + '/discovery/v2', engine=engine),
+        'census': CensusSource(cache, base_url=server.base_url + '/data', engine=engine),
+        'wikipedia': WikipediaAirportsSource(cache, base_url=server.base_url + '/wiki', engine=engine),
+        'ourairports': OurAirportsSource(cache, base_url=server.base_url, engine=engine),
+    }
+    server.event_windows.clear()
+    start = time.perf_counter()
+    report = pipeline.run(output, cache_dir, today=today, sources=sources, build_snapshot=False)
+    seconds = time.perf_counter() - start
+    engine.close()
+    windows = list(sources['ticketmaster'].windows(today - datetime.timedelta(days=182),
+                                                   today + datetime.timedelta(days=365)))
+    return report, windows, seconds
+
+
+def _check_merged(output, events):
+    # Every event of a known place, once per airport of its (City, State)
+    merged = pd.read_csv(output)
+    expected = []
+    for event in events:
+        venue = event['_embedded']['venues'][0]
+        place = venue['city']['name'], venue['state']['name']
+        if place in AIRPORTS:
+            expected += [(event['id'], *place, iata, *COORDINATES[iata]) for iata in AIRPORTS[place]]
+    actual = merged[['Event ID', 'City', 'State', 'IATA', 'Airport Latitude', 'Airport Longitude']]
+    assert sorted(actual.itertuples(index=False, name=None)) == sorted(expected), 'merged rows differ from the fixtures'
+    assert merged.groupby('Event ID')['Event Number'].nunique().eq(1).all()
+    return merged
+
+
+def main():
+    fixtures = _fixtures()
+    rows = []
+    with tempfile.TemporaryDirectory() as directory, MockServer(latency=0, fixtures=fixtures) as server:
+        cache_dir, output = os.path.join(directory, 'raw_cache'), os.path.join(directory, 'events.csv')
+
+        report, windows, seconds = _run(server, cache_dir, output, TODAY)
+        assert report['event_windows_fetched'] == len(windows) == len(server.event_windows)
+        merged = _check_merged(output, fixtures['events'])
+        rows.append([TODAY, report['event_windows_fetched'], len(windows), report['airport_pages_changed'],
+                     merged['Event ID'].nunique(), f'{seconds:.2f}'])
+
+        # Next day: an upcoming event moves from Portland, OR to Chicago and a new one is announced
+        tomorrow = TODAY + datetime.timedelta(days=1)
+        moved = next(event for event in fixtures['events']
+                     if event['dates']['start']['localDate'] > (TODAY + datetime.timedelta(days=30)).isoformat()
+                     and event['_embedded']['venues'][0]['state']['name'] == 'Oregon')
+        moved['_embedded']['venues'][0].update(city={'name': 'Chicago'}, state={'name': 'Illinois'})
+        fixtures['events'].append(_event(99, tomorrow + datetime.timedelta(days=1), 'Portland', 'Maine'))
+
+        report, windows, seconds = _run(server, cache_dir, output, tomorrow)
+        # Only the windows still open after the first run's day are requested again
+        live = [window for window in windows if window[1] > TODAY]
+        assert report['event_windows_fetched'] == len(live) < len(windows), report
+        assert sorted(set(server.event_windows)) == sorted(live)
+        assert report['airport_pages_changed'] == 0 and not report['airport_coordinates_changed']
+        keys = {f'{start:%Y-%m-%d}_{end:%Y-%m-%d}' for start, end in windows}
+        assert set(RawCache(cache_dir).keys(ticketmaster.SOURCE)) == keys, 'windows outside the range are cached'
+        merged = _check_merged(output, fixtures['events'])
+        assert set(merged.loc[merged['Event ID'] == moved['id'], 'City']) == {'Chicago'}
+        rows.append([tomorrow, report['event_windows_fetched'], len(windows), report['airport_pages_changed'],
+                     merged['Event ID'].nunique(), f'{seconds:.2f}'])
+
+    print_table(['run on', 'event windows fetched', 'windows in range', 'airport pages changed', 'events merged',
+                 'seconds'], rows)
+    print('\nmerged output matches the fixtures on both days; the second run fetched only the open windows')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Compare the per-chart statsmodels fits with the batched closed-form engine.
+
+Fits every (level, predictor) pair the pages show, first the way the pages
+used to (one `sm.add_constant` + `sm.OLS` per chart), then with
+`regression.fit_level`, checks both agree to numerical tolerance, and does
+the same for the multivariate model. Run from the app root:
+
+    python benchmarks/bench_regression.py [rows]
+
+With `rows` the summaries are resampled to that many rows first, to see
+how both paths scale.
+"""
+import sys
+
+import numpy as np
+import statsmodels.api as sm
+
+from common import print_table, timed
+from event_analysis import data_loader, regression
+
+TOLERANCE = 1e-7
+
+
+def _statsmodels_fits(frame, predictors):
+    fits = {}
+    for predictor in predictors:
+        results = sm.OLS(frame[regression.RESPONSE], sm.add_constant(frame[predictor]), missing='drop').fit()
+        fits[predictor] = [results.params[predictor], results.params['const'], results.bse[predictor],
+                           results.bse['const'], results.rsquared, results.pvalues[predictor]]
+    return fits
+
+
+def _engine_fits(frame, predictors):
+    return {predictor: [fit.slope, fit.intercept, fit.slope_se, fit.intercept_se, fit.r_squared, fit.p_value]
+            for predictor, fit in regression.fit_level(frame, predictors).items()}
+
+
+def _check(expected, actual, label):
+    expected, actual = np.asarray(expected, dtype=float), np.asarray(actual, dtype=float)
+    assert np.allclose(actual, expected, rtol=TOLERANCE, atol=1e-12, equal_nan=True), \
+        f'{label}: engine {actual} differs from statsmodels {expected}'
+
+
+def main(rows=None):
+    summaries = {'state': data_loader.load_state_summary(), 'city': data_loader.load_city_summary()}
+    if rows:
+        summaries = {level: frame.sample(int(rows), replace=True, random_state=0).reset_index(drop=True)
+                     for level, frame in summaries.items()}
+
+    table = []
+    for level, frame in summaries.items():
+        predictors = regression.available_predictors(level, frame)
+        frame = frame.astype({column: float for column in predictors + [regression.RESPONSE]})
+
+        expected = _statsmodels_fits(frame, predictors)
+        actual = _engine_fits(frame, predictors)
+        for predictor in predictors:
+            _check(expected[predictor], actual[predictor], f'{level} {predictor}')
+
+        model = sm.OLS(frame[regression.RESPONSE], sm.add_constant(frame[predictors]), missing='drop').fit()
+        multiple = regression.multiple_ols(frame, predictors)
+        _check(model.params.to_numpy(), list(multiple.params.values()), f'{level} multiple params')
+        _check(model.bse.to_numpy(), list(multiple.bse.values()), f'{level} multiple bse')
+        _check(model.pvalues.to_numpy(), list(multiple.pvalues.values()), f'{level} multiple p-values')
+        _check([model.rsquared, model.rsquared_adj], [multiple.r_squared, multiple.adj_r_squared],
+               f'{level} multiple R2')
+
+        old, _ = timed(lambda: _statsmodels_fits(frame, predictors), repeat=20)
+        new, _ = timed(lambda: regression.fit_level(frame, predictors), repeat=20)
+        old_multiple, _ = timed(lambda: sm.OLS(frame[regression.RESPONSE],
+                                               sm.add_constant(frame[predictors])).fit(), repeat=20)
+        new_multiple, _ = timed(lambda: regression.multiple_ols(frame, predictors), repeat=20)
+        table.append([level, len(frame), f'{old * 1e3:.2f}', f'{new * 1e3:.2f}', f'{old / new:.1f}x',
+                      f'{old_multiple * 1e3:.2f}', f'{new_multiple * 1e3:.2f}'])
+
+    print_table(['level', 'rows', 'sm.OLS each (ms)', 'batch (ms)', 'speedup', 'sm multiple (ms)', 'multiple (ms)'],
+                table)
+    print(f'\nAll coefficients, standard errors, R2 and p-values agree with statsmodels (rtol={TOLERANCE}).')
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:2])
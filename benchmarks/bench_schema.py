@@ -0,0 +1,80 @@
+"""Report row counts, memory and grouping time of the flat merged CSV against the normalized tables.
+
+Three layouts of the same rows are compared:
+
+- the CSV as `pd.read_csv` returns it, with every text column as Python
+  string objects;
+- the typed flat frame of `snapshot.read_csv` (integer numerics, categorical
+  keys);
+- the normalized tables of `schema.normalize`, where a city is one int32
+  city_id.
+
+For each, it times the distinct events per city and the deduplication of
+(event, city) pairs over every flat row, then the time `normalize` takes.
+Run from the app root:
+
+    python benchmarks/bench_schema.py [csv_path]
+"""
+import sys
+
+import pandas as pd
+
+from common import print_table, timed
+from event_analysis import schema, snapshot
+
+
+def _megabytes(frame):
+    return frame.memory_usage(deep=True).sum() / 2**20
+
+
+def _object_frame(csv_path):
+    raw = pd.read_csv(csv_path)
+    text = raw.select_dtypes(exclude='number').columns
+    return raw.astype({column: object for column in text})
+
+
+def main(csv_path=snapshot.DATA_PATH):
+    raw = _object_frame(csv_path)
+    flat = snapshot.read_csv(csv_path)
+    tables = schema.normalize(flat)
+
+    rows = [['flat, object strings', len(raw), f'{_megabytes(raw):.2f}'],
+            ['flat fact table', len(flat), f'{_megabytes(flat):.2f}']]
+    rows += [[name, len(table), f'{_megabytes(table):.2f}'] for name, table in tables.items()]
+    normalized_rows = sum(len(table) for table in tables.values())
+    normalized_mb = sum(_megabytes(table) for table in tables.values())
+    rows.append(['normalized total', normalized_rows, f'{normalized_mb:.2f}'])
+    print_table(['table', 'rows', 'memory (MB)'], rows)
+
+    print(f'\nRow reduction: {len(flat) / max(normalized_rows, 1):.1f}x, '
+          f'memory reduction: {_megabytes(flat) / max(normalized_mb, 1e-9):.1f}x '
+          f'({_megabytes(raw) / max(normalized_mb, 1e-9):.1f}x against object strings)\n')
+
+    # The joined view must reproduce the flat table exactly (up to row order)
+    rebuilt = schema.fact_view(tables)
+    assert len(rebuilt) == len(flat), 'fact_view does not reproduce the flat row count'
+
+    # The same flat rows keyed by city_id, so every layout groups as many rows
+    coded = tables['events'][['Event Number', 'city_id']].merge(tables['airports'][['city_id']], on='city_id', how='left')
+    keys = ['City', 'State']
+    timings = [
+        ('object strings', lambda: raw.groupby(keys)['Event Number'].nunique(),
+         lambda: raw.drop_duplicates(['Event Number'] + keys)),
+        ('categorical', lambda: flat.groupby(keys, observed=True)['Event Number'].nunique(),
+         lambda: flat.drop_duplicates(['Event Number'] + keys)),
+        ('int32 city_id', lambda: coded.groupby('city_id')['Event Number'].nunique(),
+         lambda: coded.drop_duplicates(['Event Number', 'city_id'])),
+    ]
+    rows = []
+    for name, count, dedup in timings:
+        count_best, _ = timed(count)
+        dedup_best, _ = timed(dedup)
+        rows.append([name, f'{count_best * 1e3:.1f}', f'{dedup_best * 1e3:.1f}'])
+    print_table([f'city key ({len(flat):,} rows)', 'events per city (ms)', 'dedup (event, city) (ms)'], rows)
+
+    best, _ = timed(lambda: schema.normalize(flat), repeat=3)
+    print(f'\nnormalize: {best * 1e3:.0f} ms')
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:2])
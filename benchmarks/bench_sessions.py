@@ -0,0 +1,164 @@
+"""Load test: many concurrent viewers opening every section of the analysis pages.
+
+Starts a headless `streamlit run Homepage.py` server on a free port (from the
+current directory, so it serves the dataset found there) and connects
+`sessions` websocket clients to it, alternating between the State-level and
+City-level pages. Every client speaks the browser's protocol: it loads its
+page, then all clients switch on every section at the same moment and time
+the rerun until the server reports the script finished. Three rounds:
+
+- page load: sections closed;
+- cold open: every section opened at once on a fresh server, so the
+  concurrent sessions ask for figures and fits nobody has built yet (unless
+  `--warmup` leaves the start-up warm-up on, see `event_analysis.warmup`);
+- warm rerun: the same burst again, served from the shared caches.
+
+Reports p50/p99/max latency per round and page. Run from the app root (or a
+directory holding a synthetic WANG_QING_final_data.csv):
+
+    python benchmarks/bench_sessions.py [sessions] [--warmup]
+"""
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+from common import ROOT, print_table
+
+PAGES = ['State-level Analysis', 'City-level Analysis']
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('localhost', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port, warmup=False):
+    """Start the app headless on `port` and wait until it answers its health check."""
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    # A cold server: no figures from an earlier run on disk, and no warm-up unless asked for
+    env.pop('FIGURE_CACHE_DIR', None)
+    if not warmup:
+        env['WARMUP_WORKERS'] = '0'
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'streamlit', 'run', os.path.join(ROOT, 'Homepage.py'), '--server.headless', 'true',
+         '--server.port', str(port), '--browser.gatherUsageStats', 'false'],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=env)
+    for _ in range(300):
+        try:
+            urllib.request.urlopen(f'http://localhost:{port}/_stcore/health', timeout=1)
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError('The Streamlit server did not start')
+
+
+class Session:
+    """One viewer: a websocket connection running page scripts and reading their output."""
+
+    def __init__(self, websocket):
+        self.websocket = websocket
+        self.pages = {}
+
+    async def rerun(self, page_hash='', widgets=None):
+        """Request a script run and return (seconds until it finished, element types received)."""
+        message = BackMsg()
+        message.rerun_script.page_script_hash = page_hash
+        for widget_id, value in (widgets or {}).items():
+            state = message.rerun_script.widget_states.widgets.add()
+            state.id = widget_id
+            state.bool_value = value
+        start = time.perf_counter()
+        await self.websocket.send(message.SerializeToString())
+
+        elements = []
+        while True:
+            reply = ForwardMsg()
+            reply.ParseFromString(await self.websocket.recv())
+            kind = reply.WhichOneof('type')
+            if kind == 'navigation':
+                self.pages = {page.page_name: page.page_script_hash for page in reply.navigation.app_pages}
+            elif kind == 'delta' and reply.delta.WhichOneof('type') == 'new_element':
+                elements.append(reply.delta.new_element)
+            elif kind == 'script_finished':
+                return time.perf_counter() - start, elements
+
+
+async def _viewer(url, page, ready, go, results):
+    # No keepalive pings: a saturated server answers them late, which is what is being measured
+    async with websockets.connect(url, subprotocols=['streamlit'], max_size=None, ping_interval=None) as websocket:
+        session = Session(websocket)
+        await session.rerun()
+        page_hash = session.pages[page]
+        seconds, elements = await session.rerun(page_hash)
+        results['page load', page].append(seconds)
+        toggles = {element.checkbox.id: True for element in elements if element.WhichOneof('type') == 'checkbox'}
+
+        for round_name in ['cold open', 'warm rerun']:
+            ready.release()
+            await go[round_name].wait()
+            seconds, elements = await session.rerun(page_hash, toggles)
+            errors = [element.exception.message for element in elements if element.WhichOneof('type') == 'exception']
+            # A map section shows a notice instead of a chart when the geometry cache is not built
+            charts = sum(element.WhichOneof('type') in ('plotly_chart', 'alert') for element in elements)
+            if errors or charts != len(toggles):
+                raise RuntimeError(f'{page}: {charts} of {len(toggles)} charts, errors {errors}')
+            results[round_name, page].append(seconds)
+
+
+async def _load_test(url, sessions):
+    results = {(round_name, page): [] for round_name in ['page load', 'cold open', 'warm rerun'] for page in PAGES}
+    ready = asyncio.Semaphore(0)
+    go = {round_name: asyncio.Event() for round_name in ['cold open', 'warm rerun']}
+    viewers = asyncio.gather(*(_viewer(url, PAGES[index % len(PAGES)], ready, go, results)
+                               for index in range(sessions)))
+
+    async def release_rounds():
+        # Start each burst only once every session is waiting for it
+        for event in go.values():
+            for _ in range(sessions):
+                await ready.acquire()
+            event.set()
+
+    await asyncio.gather(viewers, release_rounds())
+    return results
+
+
+def _percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def main(sessions=50, warmup=False):
+    sessions = int(sessions)
+    port = _free_port()
+    server = start_server(port, warmup)
+    try:
+        results = asyncio.run(_load_test(f'ws://localhost:{port}/_stcore/stream', sessions))
+    finally:
+        server.terminate()
+        server.wait()
+
+    rows = []
+    for (round_name, page), samples in results.items():
+        if not samples:
+            continue
+        samples = [sample * 1e3 for sample in samples]
+        rows.append([round_name, page, len(samples), f'{statistics.median(samples):.0f}',
+                     f'{_percentile(samples, 0.99):.0f}', f'{max(samples):.0f}'])
+    print_table(['round', 'page', 'sessions', 'p50 (ms)', 'p99 (ms)', 'max (ms)'], rows)
+
+
+if __name__ == '__main__':
+    arguments = [argument for argument in sys.argv[1:] if argument != '--warmup']
+    main(*arguments[:1], warmup='--warmup' in sys.argv)
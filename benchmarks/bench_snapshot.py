@@ -0,0 +1,45 @@
+"""Compare cold-start load time and resident memory of the CSV and snapshot paths.
+
+Each measurement runs in a fresh interpreter. Run from the app root after
+building the snapshot with `python -m event_analysis.snapshot`.
+"""
+import sys
+
+from common import print_table, run_isolated
+from event_analysis import snapshot
+
+CHILD = '''
+import json, resource, time
+import pandas as pd
+import pyarrow.feather
+from event_analysis import schema, snapshot
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+start = time.perf_counter()
+tables = {loader}
+seconds = time.perf_counter() - start
+after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+frame_mb = sum(table.memory_usage(deep=True).sum() for table in tables.values()) / 2**20
+print(json.dumps({{'seconds': seconds, 'rss_mb': (after - before) / 1024, 'frame_mb': frame_mb}}))
+'''
+
+LOADERS = {
+    'csv + type cleaning + normalize': 'schema.normalize(snapshot.read_csv({csv!r}))',
+    'feather snapshot (mmap)': 'snapshot.read_tables({snapshot_dir!r})',
+}
+
+
+def main(csv_path=snapshot.DATA_PATH, snapshot_dir=snapshot.SNAPSHOT_DIR, runs=5):
+    if not snapshot.is_fresh(csv_path, snapshot_dir):
+        snapshot.build_snapshot(csv_path, snapshot_dir)
+
+    rows = []
+    for name, loader in LOADERS.items():
+        code = CHILD.format(loader=loader.format(csv=csv_path, snapshot_dir=snapshot_dir))
+        results = [run_isolated(code) for _ in range(runs)]
+        best = min(results, key=lambda result: result['seconds'])
+        rows.append([name, f"{best['seconds'] * 1000:.1f}", f"{best['rss_mb']:.1f}", f"{best['frame_mb']:.2f}"])
+    print_table(['loader', 'cold load (ms)', 'peak RSS growth (MB)', 'frame size (MB)'], rows)
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:3])
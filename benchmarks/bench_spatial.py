@@ -0,0 +1,101 @@
+"""Latency of airport proximity lookups: the k-d tree of `spatial.AirportIndex` versus a haversine scan.
+
+Places `airports` random airports and `points` random venues over the
+contiguous states (the real lists have about 2,000 U.S. airports with an
+IATA code), then:
+
+- checks that the tree's counts within `spatial.RADIUS_KM` and nearest
+  distances match an exact haversine scan of every airport;
+- times single-point lookups (one call per venue, as a page or a per-venue
+  feature would make them; p50 and p99) and one batch call for all venues.
+
+With a dataset path that has venue and airport coordinates (e.g. a synthetic
+one, see `event_analysis.synthetic`), it also reports how many cities the
+name-matched Number of Airports leaves without an airport although one is
+within the radius. Run from the app root:
+
+    python benchmarks/bench_spatial.py [airports] [points] [csv_path]
+"""
+import sys
+import time
+
+import numpy as np
+
+from common import print_table, timed
+from event_analysis import aggregates, schema, snapshot, spatial
+
+
+def _haversine_km(lat, lon, airport_lat, airport_lon):
+    # Great-circle distance from one point to every airport
+    lat, lon, airport_lat, airport_lon = map(np.radians, (lat, lon, airport_lat, airport_lon))
+    a = (np.sin((airport_lat - lat) / 2) ** 2
+         + np.cos(lat) * np.cos(airport_lat) * np.sin((airport_lon - lon) / 2) ** 2)
+    return 2 * spatial.EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+def _scan(lat, lon, airport_lat, airport_lon):
+    distances = _haversine_km(lat, lon, airport_lat, airport_lon)
+    return int((distances <= spatial.RADIUS_KM).sum()), distances.min()
+
+
+def _percentiles(fn, points):
+    samples = []
+    for lat, lon in points:
+        start = time.perf_counter()
+        fn(lat, lon)
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return samples[len(samples) // 2] * 1e6, samples[int(len(samples) * 0.99)] * 1e6
+
+
+def _name_matching(csv_path):
+    summary = aggregates.build_city_summary(schema.normalize(snapshot.read_csv(csv_path)))
+    if spatial.NEARBY not in summary.columns:
+        print(f'{csv_path} has no venue and airport coordinates')
+        return
+    unmatched = summary['Number of Airports'] == 0
+    nearby = unmatched & (summary[spatial.NEARBY] > 0)
+    print(f'{unmatched.sum():,} of {len(summary):,} cities have no airport listed under their name; '
+          f'{nearby.sum():,} of them have one within {spatial.RADIUS_KM} km '
+          f'(median distance to the nearest: {summary.loc[unmatched, spatial.NEAREST].median():.1f} km)')
+
+
+def main(airports=2000, points=10000, csv_path=None):
+    airports, points = int(airports), int(points)
+    rng = np.random.default_rng(0)
+    airport_lat, airport_lon = rng.uniform(25, 49, airports), rng.uniform(-124, -67, airports)
+    lat, lon = rng.uniform(25, 49, points), rng.uniform(-124, -67, points)
+    iata = np.array([f'A{index:05d}' for index in range(airports)])
+
+    build, _ = timed(lambda: spatial.AirportIndex(iata, airport_lat, airport_lon))
+    index = spatial.AirportIndex(iata, airport_lat, airport_lon)
+    print(f'{airports:,} airports indexed in {build * 1e3:.2f} ms')
+
+    # The tree must agree with the exact scan (up to float rounding at the radius)
+    counts = index.within(lat, lon)
+    distances, _ = index.nearest(lat, lon)
+    expected = np.array([_scan(*point, airport_lat, airport_lon) for point in zip(lat, lon)])
+    assert np.abs(counts - expected[:, 0]).max() <= 1 and (counts == expected[:, 0]).mean() > 0.999
+    assert np.allclose(distances, expected[:, 1], rtol=1e-9, atol=1e-6)
+    print(f'{points:,} venues: counts and nearest distances match the haversine scan')
+    print()
+
+    sample = list(zip(lat[:2000], lon[:2000]))
+    rows = []
+    for name, fn in [('k-d tree', lambda a, b: (index.within(a, b), index.nearest(a, b))),
+                     ('haversine scan', lambda a, b: _scan(a, b, airport_lat, airport_lon))]:
+        p50, p99 = _percentiles(fn, sample)
+        rows.append([name, f'{p50:.1f}', f'{p99:.1f}'])
+    best_tree, _ = timed(lambda: index.features(lat, lon))
+    best_scan, _ = timed(lambda: [_scan(*point, airport_lat, airport_lon) for point in zip(lat, lon)], repeat=1)
+    rows[0].append(f'{best_tree * 1e3:.1f}')
+    rows[1].append(f'{best_scan * 1e3:.1f}')
+    print_table(['lookup', 'one venue p50 (us)', 'one venue p99 (us)', f'all {points:,} venues (ms)'], rows)
+
+    if csv_path:
+        print()
+        _name_matching(csv_path)
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:4])
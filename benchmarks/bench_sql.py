@@ -0,0 +1,88 @@
+"""Compare the SQLite backend (`event_analysis.sql_store`) with the in-memory pandas path.
+
+Builds the database from the CSV into a temporary directory, checks that
+the SQL summaries and overview counts match the pandas ones, then times the
+queries the pages run. The build and the cold-start summaries of each
+backend run in fresh interpreters (peak RSS is per process). Run from the
+app root, e.g. on a synthetic dataset (see `event_analysis.synthetic`):
+
+    python benchmarks/bench_sql.py [csv_path]
+"""
+import os
+import sys
+import tempfile
+
+import pandas as pd
+
+from common import print_table, run_isolated, timed
+from event_analysis import aggregates, lookup, schema, snapshot, sql_store
+
+BUILD = '''
+import json, resource, time
+from event_analysis import sql_store
+start = time.perf_counter()
+sql_store.build_database({path!r}, {db_path!r})
+seconds = time.perf_counter() - start
+print(json.dumps({{'seconds': seconds, 'peak_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}}))
+'''
+
+COLD = '''
+import json, resource, time
+from event_analysis import aggregates, schema, snapshot, sql_store
+start = time.perf_counter()
+if {backend!r} == 'sqlite':
+    store = sql_store.SQLStore({db_path!r})
+    summaries = [store.state_summary(), store.city_summary()]
+else:
+    summaries = list(aggregates.build_summaries(schema.normalize(snapshot.read_csv({path!r}))).values())
+seconds = time.perf_counter() - start
+print(json.dumps({{'seconds': seconds, 'peak_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}}))
+'''
+
+
+def main(csv_path=snapshot.DATA_PATH):
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, sql_store.DB_FILE)
+        # Everything memory-hungry runs in children before this process loads anything:
+        # Linux carries the parent's peak RSS over into the child
+        stats = run_isolated(BUILD.format(path=csv_path, db_path=db_path))
+        print(f"Built {db_path} in {stats['seconds']:.2f}s ({os.path.getsize(db_path) / 2 ** 20:.1f} MB, "
+              f"peak RSS {stats['peak_mb']:.0f} MB)\n")
+
+        cold = []
+        for backend in ['pandas', 'sqlite']:
+            stats = run_isolated(COLD.format(backend=backend, path=csv_path, db_path=db_path))
+            cold.append([backend, f"{stats['seconds']:.2f}", f"{stats['peak_mb']:.0f}"])
+
+        tables = schema.normalize(snapshot.read_csv(csv_path))
+        summaries = aggregates.build_summaries(tables)
+        store = sql_store.SQLStore(db_path)
+        pd.testing.assert_frame_equal(store.state_summary(), summaries['state_summary'], check_dtype=False)
+        pd.testing.assert_frame_equal(store.city_summary(), summaries['city_summary'], check_dtype=False)
+        assert store.overview_counts() == aggregates.overview_counts(tables)
+        print('SQL summaries and overview counts match pandas\n')
+
+        index = lookup.SearchIndex(summaries['state_summary'], summaries['city_summary'])
+        state = summaries['state_summary']['State'].iloc[0]
+        city = summaries['city_summary'].loc[summaries['city_summary']['State'] == state, 'City'].iloc[0]
+        cases = [
+            ('state_summary', lambda: aggregates.build_state_summary(tables), store.state_summary),
+            ('city_summary', lambda: aggregates.build_city_summary(tables), store.city_summary),
+            ('overview_counts', lambda: aggregates.overview_counts(tables), store.overview_counts),
+            ('cities(state)', lambda: index.cities(state), lambda: store.cities(state)),
+            ('city(city, state)', lambda: index.city(city, state), lambda: store.city(city, state)),
+        ]
+        rows = []
+        for name, pandas_fn, sql_fn in cases:
+            cells = [name]
+            for fn in [pandas_fn, sql_fn]:
+                cells.append(f'{timed(fn, repeat=5)[1] * 1e3:.3f}' if fn else '-')
+            rows.append(cells)
+        print_table(['query', 'pandas (ms)', 'sqlite (ms)'], rows)
+
+        print()
+        print_table(['cold summaries', 'seconds', 'peak RSS (MB)'], cold)
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:2])
@@ -0,0 +1,70 @@
+"""Check the chunked summaries against the in-memory ones and compare time and peak memory.
+
+Runs each path in a fresh interpreter (peak RSS is per process):
+
+- in-memory: `snapshot.read_csv` + `schema.normalize` + `aggregates.build_summaries`
+- streaming exact and streaming HyperLogLog (`event_analysis.streaming`)
+
+The exact mode must reproduce the in-memory tables, apart from the airport
+proximity columns of `event_analysis.spatial`, which the streaming path does
+not compute (they need the median venue location of each city); for
+HyperLogLog the largest relative error of the event counts is reported. Run from the app
+root, e.g. on a synthetic dataset (see `event_analysis.synthetic`):
+
+    python benchmarks/bench_streaming.py [csv_path] [chunksize]
+"""
+import sys
+
+import numpy as np
+import pandas as pd
+
+from common import print_table, run_isolated
+from event_analysis import snapshot, spatial
+
+RUN = '''
+import json, resource, time
+from event_analysis import aggregates, schema, snapshot, streaming
+start = time.perf_counter()
+if {mode!r} == 'memory':
+    summaries = aggregates.build_summaries(schema.normalize(snapshot.read_csv({path!r})))
+else:
+    summaries = streaming.stream_summaries({path!r}, {chunksize}, {mode!r})
+seconds = time.perf_counter() - start
+for name, summary in summaries.items():
+    summary.astype(str).to_csv({output!r} + name + '.csv', index=False)
+print(json.dumps({{'seconds': seconds, 'peak_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}}))
+'''
+
+
+def _read(prefix, name):
+    return pd.read_csv(prefix + name + '.csv', dtype={'City': str, 'State': str})
+
+
+def main(csv_path=snapshot.DATA_PATH, chunksize=250000):
+    import tempfile
+
+    rows, results = [], {}
+    with tempfile.TemporaryDirectory() as directory:
+        for mode in ['memory', 'exact', 'hll']:
+            output = f'{directory}/{mode}-'
+            stats = run_isolated(RUN.format(mode=mode, path=csv_path, chunksize=int(chunksize), output=output))
+            results[mode] = {name: _read(output, name) for name in ['state_summary', 'city_summary']}
+            rows.append([mode, f"{stats['seconds']:.2f}", f"{stats['peak_mb']:.0f}"])
+
+        for name, expected in results['memory'].items():
+            expected = expected.drop(columns=spatial.FEATURES, errors='ignore')
+            pd.testing.assert_frame_equal(results['exact'][name], expected, check_dtype=False)
+            approximate = results['hll'][name]
+            pd.testing.assert_frame_equal(approximate.drop(columns='Number of Events'),
+                                          expected.drop(columns='Number of Events'), check_dtype=False)
+            truth = expected['Number of Events'].to_numpy()
+            error = np.abs(approximate['Number of Events'].to_numpy() - truth) / np.maximum(truth, 1)
+            print(f'{name}: exact mode matches; HyperLogLog event counts max relative error '
+                  f'{error.max():.2%}, mean {error.mean():.2%}')
+
+    print()
+    print_table(['path', 'seconds', 'peak RSS (MB)'], rows)
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:3])
@@ -0,0 +1,60 @@
+"""Time the start-up warm-up and the first vs. repeated request for every page artifact.
+
+Each case runs in a fresh interpreter:
+
+- no warm-up: the first request builds every figure, fit and the search index
+  on demand, as the first visitors used to;
+- warm-up with N workers: `warmup.warm_up(N)` builds the bundle in its helper
+  process and publishes it, then the same requests;
+- restart: `warmup.warm_up()` finds that bundle up to date and only publishes it.
+
+A request here is what the pages do on first view: `page_figures.page_figure`
+for every default figure, the fits and `load_search_index`. The last column
+is the median of the next 100 identical requests. Run from the app root:
+
+    python benchmarks/bench_warmup.py [workers ...]
+"""
+import os
+import sys
+import tempfile
+
+from common import print_table, run_isolated
+
+RUN = '''
+import json, statistics, time
+from event_analysis import data_loader, page_figures, regression, warmup
+
+def request():
+    for chart_id, params in page_figures.default_figures():
+        page_figures.page_figure(chart_id, *params)
+    for level in regression.PREDICTORS:
+        regression.get_fits(level)
+    data_loader.load_search_index()
+
+start = time.perf_counter()
+report = warmup.warm_up({workers}, {bundle!r}) if {workers} else None
+warm = time.perf_counter() - start
+start = time.perf_counter()
+request()
+first = time.perf_counter() - start
+repeats = []
+for _ in range(100):
+    start = time.perf_counter()
+    request()
+    repeats.append(time.perf_counter() - start)
+print(json.dumps({{'warm': warm, 'first': first, 'repeat': statistics.median(repeats)}}))
+'''
+
+if __name__ == '__main__':
+    workers = [int(count) for count in sys.argv[1:]] or sorted({1, os.cpu_count() or 1})
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        bundle = os.path.join(directory, 'warmup.pickle')
+        cases = [('no warm-up', 0)] + [(f'warm-up, {count} workers', count) for count in workers] + [('restart', 1)]
+        for name, count in cases:
+            if name != 'restart' and os.path.exists(bundle):
+                os.remove(bundle)
+            stats = run_isolated(RUN.format(workers=count, bundle=bundle))
+            rows.append([name, f"{stats['warm'] * 1e3:.0f}" if count else '-',
+                         f"{stats['first'] * 1e3:.1f}", f"{stats['repeat'] * 1e3:.2f}"])
+    print_table(['case', 'warm-up (ms)', 'first request (ms)', 'repeat request (ms)'], rows)
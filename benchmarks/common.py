@@ -0,0 +1,48 @@
+"""Small timing helpers shared by the benchmark scripts.
+
+The scripts are run directly from the app root, e.g.
+
+    python benchmarks/bench_snapshot.py
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Make `event_analysis` importable when a script is started from the app root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def timed(fn, repeat=5):
+    """Call `fn` `repeat` times and return (best, median) wall time in seconds."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return min(samples), statistics.median(samples)
+
+
+def run_isolated(code):
+    """Run `code` in a fresh interpreter and return the JSON object it prints last.
+
+    Used for cold-start measurements, where module caches and the OS page
+    cache of the current process would otherwise hide the real cost.
+    """
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    output = subprocess.run([sys.executable, '-c', code], check=True, capture_output=True, text=True, env=env).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def print_table(headers, rows):
+    """Print rows as an aligned plain-text table."""
+    cells = [[str(cell) for cell in row] for row in [headers] + list(rows)]
+    widths = [max(len(row[i]) for row in cells) for i in range(len(headers))]
+    for index, row in enumerate(cells):
+        print('  '.join(cell.ljust(width) for cell, width in zip(row, widths)))
+        if index == 0:
+            print('  '.join('-' * width for width in widths))
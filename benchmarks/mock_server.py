@@ -0,0 +1,122 @@
+"""Local stand-in for the source endpoints used by the fetch benchmarks and the offline pipeline check."""
+import datetime
+import json
+import threading
+import time
+import urllib.parse
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockServer:
+    """Serve fake letter pages and paginated event results with configurable latency.
+
+    Every `throttle_every`-th request is answered with 429 and a Retry-After
+    of 0, to exercise the retry path. Request timestamps are recorded so the
+    caller can check the rate the server actually saw.
+
+    With `fixtures`, the server answers like the real sources instead: the
+    Ticketmaster events of the requested date range (`fixtures['events']`,
+    Discovery API event objects, paged by the `size` parameter), the Census
+    tables (`'states'` and `'places'`, rows with a header row), the Wikipedia
+    letter pages (`'pages'`, letter to HTML) and the OurAirports
+    `'airports.csv'`. Pages and the airport list carry an ETag and are
+    answered with 304 when revalidated unchanged. The (start, end) date
+    ranges of the event requests are recorded in `event_windows`.
+    """
+
+    def __init__(self, latency=0.05, total_pages=20, throttle_every=0, fixtures=None):
+        self.latency = latency
+        self.total_pages = total_pages
+        self.throttle_every = throttle_every
+        self.fixtures = fixtures
+        self.request_times = []
+        self.event_windows = []
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self.server.daemon_threads = True
+        self.base_url = f'http://127.0.0.1:{self.server.server_port}'
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with mock.lock:
+                    mock.request_times.append(time.monotonic())
+                    count = len(mock.request_times)
+                time.sleep(mock.latency)
+                if mock.throttle_every and count % mock.throttle_every == 0:
+                    self._send(429, b'', {'Retry-After': '0'})
+                    return
+                url = urllib.parse.urlsplit(self.path)
+                if mock.fixtures is not None:
+                    self._send(*mock._fixture_response(url, self.headers.get('If-None-Match')))
+                elif url.path.endswith('events.json'):
+                    page = int(dict(urllib.parse.parse_qsl(url.query)).get('page', 0))
+                    body = json.dumps({'_embedded': {'events': []},
+                                       'page': {'number': page, 'totalPages': mock.total_pages, 'totalElements': 0}})
+                    self._send(200, body.encode(), {'Content-Type': 'application/json'})
+                else:
+                    self._send(200, b'<table class="wikitable"></table>', {'ETag': '"v1"'})
+
+            def _send(self, status, body, headers):
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+    def _fixture_response(self, url, etag):
+        # (status, body, headers) of a request to one of the fixture sources
+        query = dict(urllib.parse.parse_qsl(url.query))
+        if url.path.endswith('events.json'):
+            start, end = (datetime.date.fromisoformat(query[name][:10]) for name in ('startDateTime', 'endDateTime'))
+            with self.lock:
+                self.event_windows.append((start, end))
+            events = [event for event in self.fixtures['events']
+                      if start <= datetime.date.fromisoformat(event['dates']['start']['localDate']) < end]
+            size, page = int(query.get('size', 20)), int(query.get('page', 0))
+            body = {'_embedded': {'events': events[page * size:(page + 1) * size]},
+                    'page': {'number': page, 'totalPages': max(1, -(-len(events) // size)),
+                             'totalElements': len(events)}}
+            return 200, json.dumps(body).encode(), {'Content-Type': 'application/json'}
+        if url.path.endswith('acs/acs5'):
+            table = 'places' if query['for'].startswith('place') else 'states'
+            return 200, json.dumps(self.fixtures[table]).encode(), {'Content-Type': 'application/json'}
+        if url.path.endswith('airports.csv'):
+            body = self.fixtures['airports.csv'].encode()
+        else:
+            letter = url.path[-1]
+            body = self.fixtures['pages'].get(letter, '<table class="wikitable"></table>').encode()
+        # A checksum of the content is a stable ETag
+        tag = f'"{zlib.crc32(body):08x}"'
+        if etag == tag:
+            return 304, b'', {'ETag': tag}
+        return 200, body, {'ETag': tag}
+
+    def peak_rate(self):
+        """Return the largest number of requests received within any one-second window."""
+        times = sorted(self.request_times)
+        peak, first = 0, 0
+        for last, stamp in enumerate(times):
+            while stamp - times[first] >= 1.0:
+                first += 1
+            peak = max(peak, last - first + 1)
+        return peak
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,83 @@
+"""Run every benchmark script once, on a small synthetic dataset, and fail if any of them fails.
+
+The `bench_*.py` scripts that check their results before timing them
+(against statsmodels, a flat groupby, an exact scan, the in-memory path, ...)
+end with a non-zero status when a check fails; the timing-only ones fail only
+when they crash. This runner writes a synthetic dataset of `--events` events
+(see `event_analysis.synthetic`) as WANG_QING_final_data.csv into a temporary
+directory, runs each script from there with the small arguments of
+`ARGUMENTS`, and lists the status and wall time of each; the output of a
+failed script is printed after the table. It exits with status 1 when any
+script failed. Run from the app root:
+
+    python benchmarks/run_all.py [--events N] [--only NAME ...]
+"""
+import argparse
+import glob
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import ROOT, print_table
+from event_analysis import snapshot, synthetic
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+
+# Arguments keeping each script to seconds on the small dataset; `{csv}` is the dataset's path
+ARGUMENTS = {
+    'bench_analytics': ['1', '10'],
+    'bench_city_keys': ['{csv}'],
+    'bench_geo': ['1000', '5000'],
+    'bench_lookup': ['2000'],
+    'bench_sessions': ['4'],
+    'bench_spatial': ['2000', '2000', '{csv}'],
+    'bench_streaming': ['{csv}', '5000'],
+    'bench_warmup': ['1'],
+}
+
+
+def run(name, directory, csv_path):
+    """Run benchmark `name` from `directory`; return (exit status, seconds, combined output)."""
+    arguments = [argument.format(csv=csv_path) for argument in ARGUMENTS.get(name, [])]
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    start = time.perf_counter()
+    process = subprocess.run([sys.executable, os.path.join(BENCHMARKS, name + '.py')] + arguments, cwd=directory,
+                             env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    return process.returncode, time.perf_counter() - start, process.stdout
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run every benchmark script once and report the failed ones.')
+    parser.add_argument('--events', type=int, default=20000)
+    parser.add_argument('--only', nargs='+', metavar='NAME', help='run only these scripts, e.g. bench_models')
+    args = parser.parse_args(argv)
+
+    names = sorted(os.path.basename(path)[:-len('.py')] for path in glob.glob(os.path.join(BENCHMARKS, 'bench_*.py')))
+    if args.only:
+        unknown = set(args.only) - set(names)
+        if unknown:
+            parser.error(f'no such benchmark: {", ".join(sorted(unknown))}')
+        names = [name for name in names if name in args.only]
+
+    rows, failed = [], []
+    with tempfile.TemporaryDirectory() as directory:
+        csv_path = os.path.join(directory, snapshot.DATA_PATH)
+        synthetic.generate(csv_path, args.events)
+        for name in names:
+            status, seconds, output = run(name, directory, csv_path)
+            rows.append([name, 'ok' if status == 0 else f'FAILED ({status})', f'{seconds:.1f}'])
+            print(f'{name}: {rows[-1][1]}', file=sys.stderr, flush=True)
+            if status:
+                failed.append((name, output))
+
+    print()
+    print_table(['benchmark', 'status', 'seconds'], rows)
+    for name, output in failed:
+        print(f'\n==== {name} ====\n{output.rstrip()}')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""State and city rollups of the merged dataset.
+
+The summaries are computed from the normalized tables in
+`event_analysis.schema`: distinct events and airports are counted per
+city_id / state_id and joined to the census columns on those keys. Every city
+computation keys on city_id alone, never on the City name, so Portland, OR
+and Portland, ME stay two cities (see `benchmarks/bench_city_keys.py`). They are
+computed once, when the snapshot is built or the dataset is first loaded, and
+the pages read them instead of grouping the raw rows on every render.
+
+When the dataset has venue and airport coordinates, the city summary also
+has the airport proximity columns of `event_analysis.spatial`.
+"""
+import numpy as np
+
+from event_analysis import spatial
+from event_analysis.schema import city_keys
+
+STATE_SUMMARY_COLUMNS = ['State', 'Number of Events', 'Number of Airports',
+                         'Population_state', 'Median Household Income_state']
+CITY_SUMMARY_COLUMNS = ['City', 'State', 'Number of Events', 'Number of Airports',
+                        'Population_city', 'Median Household Income_city']
+
+
+def _distinct_counts(table, key, value, name):
+    return table.groupby(key)[value].nunique().rename(name)
+
+
+def _rows_per_city(table, city_ids):
+    # Rows of `table` per city_id, in the order of `city_ids`; cities without rows get 0
+    counts = np.bincount(table['city_id'].to_numpy(), minlength=city_ids.max() + 1 if len(city_ids) else 0)
+    return counts[city_ids].astype('int64')
+
+
+def city_dimension(tables):
+    """Return the cities table with State, Number of Events and Number of Airports, indexed by city_id.
+
+    `schema.normalize` keeps one events row per (event, city) and one
+    airports row per (airport, city), so both counts are distinct counts
+    taken in a single pass over each table's city_id column, with no join.
+    """
+    cities = city_keys(tables).set_index('city_id')
+    city_ids = cities.index.to_numpy()
+    return cities.assign(**{'Number of Events': _rows_per_city(tables['events'], city_ids),
+                            'Number of Airports': _rows_per_city(tables['airports'], city_ids)})
+
+
+def build_city_summary(tables):
+    """Return one row per (City, State) with event/airport counts, population, median income and airport proximity."""
+    summary = city_dimension(tables)
+    columns = CITY_SUMMARY_COLUMNS
+    features = spatial.city_features(tables)
+    if features is not None:
+        # Cities without venue coordinates keep NaN
+        summary, columns = summary.join(features), columns + spatial.FEATURES
+    return summary.sort_values(['City', 'State']).reset_index(drop=True)[columns]
+
+
+def build_state_summary(tables):
+    """Return one row per state with event/airport counts, population and median income."""
+    # Attach each event and airport to its state through the cities table
+    city_states = tables['cities'][['city_id', 'state_id']]
+    events = tables['events'].merge(city_states, on='city_id')
+    airports = tables['airports'].merge(city_states, on='city_id')
+
+    summary = tables['states'].set_index('state_id')
+    summary = summary.join(_distinct_counts(events, 'state_id', 'Event Number', 'Number of Events'))
+    summary = summary.join(_distinct_counts(airports, 'state_id', 'airport_id', 'Number of Airports'))
+    summary[['Number of Events', 'Number of Airports']] = summary[['Number of Events', 'Number of Airports']].fillna(0).astype('int64')
+    return summary.sort_values('State').reset_index(drop=True)[STATE_SUMMARY_COLUMNS]
+
+
+def build_summaries(tables):
+    """Return the state and city summary tables as a dict keyed by table name."""
+    return {'state_summary': build_state_summary(tables), 'city_summary': build_city_summary(tables)}
+
+
+def overview_counts(tables):
+    """Return the headline counts shown in the Data Overview tab."""
+    return {
+        'states': len(tables['states']),
+        'cities': len(tables['cities']),
+        'events': tables['events']['Event Number'].nunique(),
+        'airports': tables['airports']['airport_id'].nunique(),
+    }
@@ -0,0 +1,76 @@
+"""Headless analysis functions behind the pages.
+
+Everything a page shows is computed here from the normalized tables or the
+summary tables of `event_analysis.aggregates`, without importing Streamlit,
+so each step can be imported, timed and profiled on its own (see
+`benchmarks/bench_analytics.py`). The functions never modify their inputs;
+the pages only render what they return.
+"""
+import pandas as pd
+
+from event_analysis import aggregates, regression
+
+RESPONSE = regression.RESPONSE
+
+# Key columns of each summary level
+LEVEL_KEYS = {'state': ['State'], 'city': ['City', 'State']}
+
+
+def state_summary(tables):
+    """Distinct events and airports, population and income per state (see `aggregates.build_state_summary`)."""
+    return aggregates.build_state_summary(tables)
+
+
+def city_summary(tables):
+    """Distinct events and airports, population and income per (City, State) (see `aggregates.build_city_summary`)."""
+    return aggregates.build_city_summary(tables)
+
+
+def events_per_state(state_summary):
+    """Return the number of events per state as a Series indexed by State, most events first."""
+    return state_summary.set_index('State')[RESPONSE].sort_values(ascending=False)
+
+
+def events_per_city(city_summary, query=''):
+    """Return City, State, number of events and a 'City, State' label per city, most events first.
+
+    With `query`, only cities whose label contains it (case-insensitive) are kept.
+    """
+    events = city_summary[['City', 'State', RESPONSE]]
+    events = events.assign(City_State=events['City'].astype(str) + ', ' + events['State'].astype(str))
+    return rank_rows(events, RESPONSE, 'City_State', query)
+
+
+def rank_rows(frame, value, label, query=''):
+    """Return `frame` sorted by `value` descending, keeping only rows whose `label` contains `query` (case-insensitive)."""
+    ranked = frame.sort_values(by=value, ascending=False, kind='stable')
+    if query:
+        ranked = ranked[ranked[label].str.contains(query, case=False, regex=False)]
+    return ranked
+
+
+def ranking_window(ranked, value, label, page=1, page_size=25, others_label='Others ({count})'):
+    """Return (window, rest): the `page`-th slice of `page_size` rows of `ranked`, plus one row
+    aggregating the `rest` rows outside the slice (when there are any).
+
+    Only this window is handed to Plotly, so the figure JSON sent to the
+    browser stays the same size however many rows the ranking has.
+    """
+    start = (page - 1) * page_size
+    window = ranked[[label, value]].iloc[start:start + page_size]
+    rest = len(ranked) - len(window)
+    if rest:
+        others = ranked[value].sum() - window[value].sum()
+        window = pd.concat([window, pd.DataFrame({label: [others_label.format(count=rest)], value: [others]})],
+                           ignore_index=True)
+    return window, rest
+
+
+def predictor_table(summary, level, predictor):
+    """Return the key columns, number of events and `predictor` of each row of a 'state' or 'city' summary."""
+    return summary[LEVEL_KEYS[level] + [RESPONSE, predictor]]
+
+
+def regression_summary(summary, level, predictors=None):
+    """Return {predictor: regression.OLSFit} of events on each predictor of the level (all available by default)."""
+    return regression.fit_level(summary, predictors or regression.available_predictors(level, summary))
@@ -0,0 +1,118 @@
+"""Plotly figure builders shared by the analysis pages."""
+import numpy as np
+import plotly.express as px
+import plotly.graph_objects as go
+from plotly.colors import sample_colorscale
+
+
+def regression_scatter(frame, x, fit, labels, title, y='Number of Events', hover_name=None, log_link=False,
+                       name='OLS trendline'):
+    """Scatter `y` against `x` and overlay the OLS line described by `fit` (an `regression.OLSFit`).
+
+    Equivalent to `px.scatter(..., trendline='ols')`, but the line comes from
+    the already-fitted coefficients, so Plotly does not run statsmodels again.
+    With `log_link`, the trend of a count model, exp(intercept + slope * x),
+    is drawn as a curve instead.
+    """
+    fig = px.scatter(frame, x=x, y=y, labels=labels, title=title, hover_name=hover_name)
+
+    x_label, y_label = labels.get(x, x), labels.get(y, y)
+    if log_link:
+        x_range = np.linspace(frame[x].min(), frame[x].max(), 100)
+        y_line = np.exp(fit.intercept + fit.slope * x_range)
+        formula = f'{y_label} = exp({fit.slope:.6g} * {x_label} + {fit.intercept:.6g})'
+    else:
+        # A straight line only needs its two end points
+        x_range = [frame[x].min(), frame[x].max()]
+        y_line = [fit.intercept + fit.slope * value for value in x_range]
+        formula = f'{y_label} = {fit.slope:.6g} * {x_label} + {fit.intercept:.6g}'
+    fig.add_trace(go.Scatter(
+        x=x_range,
+        y=y_line,
+        mode='lines',
+        name=name,
+        showlegend=False,
+        hovertemplate=f'<b>{name}</b><br>{formula}<br>R<sup>2</sup>={fit.r_squared:.6f}<extra></extra>',
+    ))
+    return fig
+
+
+def ranked_bar(window, value, label, labels, title, has_others=False, color='lightcoral', others_color='lightgray'):
+    """Horizontal bar chart of an `analytics.ranking_window`, in ranking order with the 'others' bar (if any) last."""
+    fig = px.bar(window, x=value, y=label, orientation='h', labels=labels, title=title)
+    colors = [color] * len(window)
+    if has_others:
+        colors[-1] = others_color
+    fig.update_traces(marker_color=colors)
+    fig.update_layout(
+        xaxis_title=labels.get(value, value),
+        yaxis_title=labels.get(label, label),
+        # Grow with the number of bars instead of a fixed height sized for the whole dataset
+        height=120 + 28 * len(window),
+        margin=dict(l=0, r=0, t=50, b=0),
+        yaxis={'categoryorder': 'array', 'categoryarray': window[label].tolist()[::-1], 'tickangle': 0},
+        showlegend=False
+    )
+    return fig
+
+
+def _map_layout(fig, bounds, title, height=600):
+    # Projected coordinates on hidden axes: equal scale, no tiles or geo basemap to download
+    fig.update_layout(title=title, height=height, margin=dict(l=0, r=0, t=50, b=0), plot_bgcolor='white',
+                      showlegend=False, hoverlabel=dict(bgcolor='white'))
+    fig.update_xaxes(visible=False, range=[bounds[0], bounds[2]])
+    fig.update_yaxes(visible=False, range=[bounds[1], bounds[3]], scaleanchor='x', scaleratio=1)
+    return fig
+
+
+def outline_choropleth(outlines, points, values, hover, title, bounds, colorbar_title, classes=7, colorscale='Reds'):
+    """Classed choropleth of projected outlines: one filled trace per class plus hover points carrying the scale.
+
+    `outlines` and `points` hold one (n, 2) array (rings separated by NaN
+    rows) and one (x, y) label point per area; areas are binned into
+    `classes` quantile classes of `values`, so a few outliers do not wash
+    out the rest of the map.
+    """
+    values = np.asarray(values, dtype=float)
+    edges = np.unique(np.quantile(values, np.linspace(0, 1, classes + 1))) if len(values) else np.zeros(1)
+    classes = max(len(edges) - 1, 1)
+    area_class = np.clip(np.searchsorted(edges, values, side='right') - 1, 0, classes - 1)
+    colors = sample_colorscale(colorscale, list((np.arange(classes) + 0.5) / classes))
+
+    fig = go.Figure()
+    for index in range(classes):
+        members = [outline for outline, member in zip(outlines, area_class == index) if member]
+        if members:
+            xy = np.concatenate(members)
+            fig.add_trace(go.Scatter(x=xy[:, 0], y=xy[:, 1], mode='lines', fill='toself', fillcolor=colors[index],
+                                     line=dict(color='white', width=0.6), hoverinfo='skip'))
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    ticks = np.arange(len(edges)) if len(edges) > 1 else [0]
+    fig.add_trace(go.Scatter(
+        x=points[:, 0], y=points[:, 1], mode='markers', text=hover, hovertemplate='%{text}<extra></extra>',
+        # Invisible markers: they only carry the hover text and the class colour bar
+        marker=dict(size=12, opacity=0, color=area_class + 0.5, cmin=0, cmax=classes,
+                    colorscale=[[position, color] for index, color in enumerate(colors)
+                                for position in (index / classes, (index + 1) / classes)],
+                    showscale=True, colorbar=dict(title=colorbar_title, tickvals=ticks,
+                                                  ticktext=[f'{edge:,.0f}' for edge in edges])),
+    ))
+    return _map_layout(fig, bounds, title)
+
+
+def bubble_map(outlines, x, y, sizes, hover, title, bounds, color='lightcoral', max_size=40, note=None):
+    """Bubbles with areas proportional to `sizes` at projected points, over grey projected outlines."""
+    fig = go.Figure()
+    if len(outlines):
+        fig.add_trace(go.Scatter(x=outlines[:, 0], y=outlines[:, 1], mode='lines', fill='toself',
+                                 fillcolor='whitesmoke', line=dict(color='darkgray', width=0.6), hoverinfo='skip'))
+    sizes = np.asarray(sizes, dtype=float)
+    fig.add_trace(go.Scatter(
+        x=x, y=y, mode='markers', text=hover, hovertemplate='%{text}<extra></extra>',
+        marker=dict(size=sizes, sizemode='area', sizeref=2.0 * max(sizes.max(initial=0), 1) / max_size ** 2,
+                    sizemin=2, color=color, opacity=0.7, line=dict(color='white', width=0.5)),
+    ))
+    if note:
+        fig.add_annotation(text=note, xref='paper', yref='paper', x=0, y=0, showarrow=False,
+                           font=dict(size=12, color='gray'), xanchor='left', yanchor='bottom')
+    return _map_layout(fig, bounds, title)
@@ -0,0 +1,271 @@
+"""Process-wide, cached access to the merged music events dataset.
+
+Streamlit re-executes a page script on every widget interaction, but imported
+modules stay alive for the whole server process. Keeping the parsed dataset in
+this module means the dataset is read once per process (and again only when the
+file on disk changes) instead of on every click. When a typed snapshot built by
+`event_analysis.snapshot` is up to date it is memory-mapped instead of parsing
+the CSV, so no type cleaning happens at runtime.
+
+The dataset is held in the normalized tables of `event_analysis.schema`. The
+state and city summary tables and the Specific Search index are derived from
+them and cached the same way, so a page render never has to group the raw
+fact table.
+
+With `EVENT_DATA_BACKEND=sqlite` the summaries, overview counts and search
+lookups come from SQL queries on the SQLite database of
+`event_analysis.sql_store` instead, and the tables are never loaded into the
+process.
+
+When the events have dates, the summaries can also be restricted to a date
+range (`load_period_summary`): the event counts are then summed from the
+daily counts of `event_analysis.partitions`, never from the raw events.
+"""
+import os
+import threading
+import time
+
+from event_analysis import aggregates, lookup, partitions, schema, snapshot, sql_store
+from event_analysis.snapshot import DATA_PATH, SNAPSHOT_DIR
+
+# Cached tables keyed by (absolute path, CSV mtime, snapshot mtime), then by table name
+_cache = {}
+_lock = threading.RLock()
+# One lock per (version, table name) being built, so a slow build only blocks the callers of that table
+_build_locks = {}
+_stats = {'hits': 0, 'misses': 0, 'load_seconds': 0.0, 'source': None}
+
+# Date-filtered summaries kept per dataset version; the oldest are dropped first
+PERIOD_SUMMARIES = 64
+
+# 'pandas' (in-memory tables) or 'sqlite' (see event_analysis.sql_store)
+BACKEND = os.environ.get(sql_store.BACKEND_ENV, 'pandas')
+if BACKEND not in sql_store.BACKENDS:
+    raise ValueError(f'{sql_store.BACKEND_ENV} must be one of {sql_store.BACKENDS}, not {BACKEND!r}')
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def _db_path(snapshot_dir):
+    return os.path.join(snapshot_dir, sql_store.DB_FILE)
+
+
+def _cache_key(path, snapshot_dir=SNAPSHOT_DIR):
+    # The mtimes are part of the key so an updated CSV or a rebuilt snapshot is picked up automatically
+    manifest = os.path.join(snapshot_dir, snapshot.MANIFEST_FILE)
+    key = os.path.abspath(path), _mtime(path), _mtime(manifest)
+    if key[1] is None and key[2] is None and not (BACKEND == 'sqlite' and os.path.exists(_db_path(snapshot_dir))):
+        raise FileNotFoundError(f'Neither {path} nor a snapshot in {snapshot_dir} exists')
+    return key
+
+
+def _freeze(frame):
+    # Mark the column buffers read-only so a page cannot mutate the shared frame in place
+    if not hasattr(frame, 'columns'):
+        return frame
+    for column in frame.columns:
+        values = frame[column].to_numpy()
+        try:
+            values.flags.writeable = False
+        except (AttributeError, ValueError):
+            pass
+    return frame
+
+
+def _entry(key):
+    # Called with the lock held: the tables of dataset version `key`
+    entry = _cache.get(key)
+    if entry is None:
+        # Drop stale versions of the same file so old frames can be garbage collected
+        for stale in [k for k in _cache if k[0] == key[0]]:
+            del _cache[stale]
+        entry = _cache[key] = {}
+    return entry
+
+
+def _lookup(key, name):
+    # Called with the lock held: (True, table) when table `name` of version `key` is cached
+    entry = _entry(key)
+    if name in entry:
+        _stats['hits'] += 1
+        return True, entry[name]
+    return False, None
+
+
+def _cached(name, path, snapshot_dir, build):
+    # Return table `name` for the current dataset version, building it on a miss. The global lock only
+    # guards the dicts; the build runs under the lock of its own table, which concurrent callers wait on
+    key = _cache_key(path, snapshot_dir)
+    with _lock:
+        found, table = _lookup(key, name)
+        if found:
+            return table
+        build_lock = _build_locks.setdefault((key, name), threading.Lock())
+
+    with build_lock:
+        with _lock:
+            # Another caller may have built it while this one waited
+            found, table = _lookup(key, name)
+        if found:
+            return table
+        try:
+            start = time.perf_counter()
+            table = _freeze(build())
+            with _lock:
+                _stats['misses'] += 1
+                _stats['load_seconds'] = time.perf_counter() - start
+                _entry(key)[name] = table
+        finally:
+            with _lock:
+                _build_locks.pop((key, name), None)
+    return table
+
+
+def _load_table(name, path, snapshot_dir):
+    def build():
+        if snapshot.is_fresh(path, snapshot_dir):
+            _stats['source'] = 'snapshot'
+            return snapshot.read_snapshot(name, snapshot_dir)
+        # Without a snapshot, parse and normalize the CSV once; every table is then taken from that result
+        _stats['source'] = 'csv'
+        return _cached('normalized', path, snapshot_dir, lambda: schema.normalize(snapshot.read_csv(path)))[name]
+
+    return _cached(name, path, snapshot_dir, build)
+
+
+def load_tables(path=DATA_PATH, snapshot_dir=SNAPSHOT_DIR):
+    """Return the normalized states, cities, events and airports tables as a dict.
+
+    Every caller gets the same frame objects, so pages must treat them as
+    read-only and derive new frames instead of assigning columns to them.
+    """
+    return {name: _load_table(name, path, snapshot_dir) for name in schema.TABLES}
+
+
+def _sql_store(path, snapshot_dir):
+    def build():
+        _stats['source'] = 'sqlite'
+        return sql_store.open_store(path, _db_path(snapshot_dir))
+
+    return _cached('sql_store', path, snapshot_dir, build)
+
+
+def _load_summary(name, path, snapshot_dir):
+    if BACKEND == 'sqlite':
+        return _cached(name, path, snapshot_dir, lambda: getattr(_sql_store(path, snapshot_dir), name)())
+
+    def build():
+        # Prefer the table materialized at snapshot build time
+        if snapshot.is_fresh(path, snapshot_dir) and snapshot.has_table(name, snapshot_dir):
+            return snapshot.read_snapshot(name, snapshot_dir)
+        return aggregates.build_summaries(load_tables(path, snapshot_dir))[name]
+
+    return _cached(name, path, snapshot_dir, build)
+
+
+def load_state_summary(path=DATA_PATH, snapshot_dir=SNAPSHOT_DIR):
+    """Return the cached per-state summary (see `aggregates.build_state_summary`)."""
+    return _load_summary('state_summary', path, snapshot_dir)
+
+
+def load_city_summary(path=DATA_PATH, snapshot_dir=SNAPSHOT_DIR):
+    """Return the cached per-(City, State) summary (see `aggregates.build_city_summary`)."""
+    return _load_summary('city_summary', path, snapshot_dir)
+
+
+def load_search_index(path=DATA_PATH, snapshot_dir=SNAPSHOT_DIR):
+    """Return the cached `lookup.SearchIndex` built from the state and city summaries.
+
+    With the SQLite backend, the `sql_store.SQLStore` answering the same lookups with queries.
+    """
+    if BACKEND == 'sqlite':
+        return _sql_store(path, snapshot_dir)
+    return _cached('search_index', path, snapshot_dir, lambda: lookup.SearchIndex(
+        load_state_summary(path, snapshot_dir), load_city_summary(path, snapshot_dir)))
+
+
+def load_overview_counts(path=DATA_PATH, snapshot_dir=SNAPSHOT_DIR):
+    """Return the cached headline counts of the Data Overview tab (see `aggregates.overview_counts`)."""
+    if BACKEND == 'sqlite':
+        return _cached('overview_counts', path, snapshot_dir, lambda: _sql_store(path, snapshot_dir).overview_counts())
+    return _cached('overview_counts', path, snapshot_dir,
+                   lambda: aggregates.overview_counts(load_tables(path, snapshot_dir)))
+
+
+def load_partitions(path=DATA_PATH, snapshot_dir=SNAPSHOT_DIR):
+    """Return the cached `partitions.Partitions` of daily event counts, or None when the events have no dates."""
+    def build():
+        # Prefer the month partitions written at snapshot build time
+        if snapshot.is_fresh(path, snapshot_dir):
+            return partitions.load(os.path.join(snapshot_dir, partitions.PARTITION_DIR))
+        if BACKEND == 'sqlite':
+            months = partitions.split_months(_sql_store(path, snapshot_dir).daily_counts())
+            return partitions.Partitions(months) if months else None
+        return partitions.load(tables=load_tables(path, snapshot_dir))
+
+    return _cached('partitions', path, snapshot_dir, build)
+
+
+def load_date_range(path=DATA_PATH, snapshot_dir=SNAPSHOT_DIR):
+    """Return the (first, last) event dates as `datetime.date`s, or None when the events have no dates."""
+    dated = load_partitions(path, snapshot_dir)
+    return None if dated is None else (dated.first, dated.last)
+
+
+def load_period_summary(name, period=None, path=DATA_PATH, snapshot_dir=SNAPSHOT_DIR):
+    """Return summary `name` ('state_summary' or 'city_summary') counting only the events of `period`.
+
+    `period` is a (first day, last day) pair of ISO dates, both included, or
+    None for all events (the plain cached summary).
+    """
+    if period is None:
+        return _load_summary(name, path, snapshot_dir)
+
+    def build():
+        dated = load_partitions(path, snapshot_dir)
+        if dated is None:
+            raise ValueError('The dataset has no event dates to filter on')
+        return dated.summary(_load_summary(name, path, snapshot_dir), *period)
+
+    table = _cached((name, period), path, snapshot_dir, build)
+    with _lock:
+        entry = _entry(_cache_key(path, snapshot_dir))
+        periods = [key for key in entry if isinstance(key, tuple)]
+        for key in periods[:-PERIOD_SUMMARIES]:
+            del entry[key]
+    return table
+
+
+def put(name, value, version, path=DATA_PATH, snapshot_dir=SNAPSHOT_DIR):
+    """Store `value`, computed elsewhere (e.g. by `event_analysis.warmup`), as table `name` of dataset `version`.
+
+    Returns False without storing it when the dataset has changed since `version`.
+    """
+    with _lock:
+        if _cache_key(path, snapshot_dir) != version:
+            return False
+        _entry(version)[name] = _freeze(value)
+        return True
+
+
+def dataset_version(path=DATA_PATH, snapshot_dir=SNAPSHOT_DIR):
+    """Return a hashable identifier that changes whenever the dataset file changes."""
+    return _cache_key(path, snapshot_dir)
+
+
+def cache_info():
+    """Return hit/miss counters and the duration of the most recent load."""
+    with _lock:
+        return dict(_stats, entries=sum(len(entry) for entry in _cache.values()))
+
+
+def clear_cache():
+    """Forget every cached table and reset the counters."""
+    with _lock:
+        _cache.clear()
+        _stats.update(hits=0, misses=0, load_seconds=0.0, source=None)
@@ -0,0 +1,149 @@
+"""Process-wide cache of serialized Plotly figures.
+
+The charts only change when the dataset does, yet every rerun rebuilt and
+re-serialized them. `cached_figure` stores each figure's JSON under
+(dataset fingerprint, chart id, parameters) in an in-memory LRU, optionally
+backed by a directory on disk (set `FIGURE_CACHE_DIR`) so a restarted server
+starts warm. A new dataset fingerprint drops every entry of the old one.
+"""
+import collections
+import hashlib
+import json
+import os
+import shutil
+import threading
+
+from event_analysis import data_loader, shared_store
+
+FIGURE_CACHE_DIR_ENV = 'FIGURE_CACHE_DIR'
+
+
+def _digest(value, length=16):
+    return hashlib.sha1(repr(value).encode()).hexdigest()[:length]
+
+
+class FigureCache:
+    """LRU of figure JSON strings keyed by (fingerprint, chart id, parameters).
+
+    `disk_dir`, when given, keeps one sub-directory per fingerprint with a
+    JSON file per entry; it is consulted on memory misses and written on
+    builds. `params` must be hashable and have a stable `repr`.
+    """
+
+    def __init__(self, max_entries=64, disk_dir=None):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self._entries = collections.OrderedDict()
+        self._fingerprint = None
+        self._flights = shared_store.SingleFlight()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0}
+
+    def _disk_path(self, fingerprint, chart_id, params):
+        return os.path.join(self.disk_dir, _digest(fingerprint), f'{chart_id}-{_digest(params)}.json')
+
+    def _invalidate(self, fingerprint):
+        # Called with the lock held when the dataset changed
+        self._entries.clear()
+        self._fingerprint = fingerprint
+        if self.disk_dir and os.path.isdir(self.disk_dir):
+            current = _digest(fingerprint)
+            for name in os.listdir(self.disk_dir):
+                path = os.path.join(self.disk_dir, name)
+                if name != current and len(name) == len(current) and os.path.isdir(path):
+                    shutil.rmtree(path, ignore_errors=True)
+
+    def _read_disk(self, path):
+        try:
+            with open(path) as handle:
+                return handle.read()
+        except OSError:
+            return None
+
+    def _write_disk(self, path, payload):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.tmp', 'w') as handle:
+            handle.write(payload)
+        os.replace(path + '.tmp', path)
+
+    def get(self, fingerprint, chart_id, params, build):
+        """Return the figure dict for the key, calling `build()` (a Plotly figure) only on a miss."""
+        key = chart_id, params
+        with self._lock:
+            if fingerprint != self._fingerprint:
+                self._invalidate(fingerprint)
+            payload = self._entries.get(key)
+            if payload is not None:
+                self._entries.move_to_end(key)
+                self._stats['hits'] += 1
+                return json.loads(payload)
+        # Concurrent sessions missing the same figure wait for one build instead of each running it
+        payload = self._flights.run((fingerprint, key), lambda: self._load(fingerprint, chart_id, params, build))
+        return json.loads(payload)
+
+    def _load(self, fingerprint, chart_id, params, build):
+        key = chart_id, params
+        path = self._disk_path(fingerprint, chart_id, params) if self.disk_dir else None
+        payload = self._read_disk(path) if path else None
+        if payload is not None:
+            counter = 'disk_hits'
+        else:
+            counter = 'misses'
+            payload = build().to_json()
+            if path:
+                self._write_disk(path, payload)
+
+        with self._lock:
+            self._stats[counter] += 1
+            if fingerprint == self._fingerprint:
+                self._store(key, payload)
+        return payload
+
+    def _store(self, key, payload):
+        # Called with the lock held
+        self._entries[key] = payload
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats['evictions'] += 1
+
+    def put(self, fingerprint, chart_id, params, payload):
+        """Store a figure JSON string built elsewhere (e.g. by `event_analysis.warmup`) under the key."""
+        if self.disk_dir:
+            self._write_disk(self._disk_path(fingerprint, chart_id, params), payload)
+        with self._lock:
+            if fingerprint != self._fingerprint:
+                self._invalidate(fingerprint)
+            self._store((chart_id, params), payload)
+
+    def info(self):
+        """Return hit/miss counters, the hit rate and the number of entries held in memory.
+
+        `waits` counts lookups that missed but shared a build already in flight.
+        """
+        with self._lock:
+            waits = self._flights.waits
+            lookups = self._stats['hits'] + self._stats['disk_hits'] + self._stats['misses'] + waits
+            hit_rate = (self._stats['hits'] + self._stats['disk_hits'] + waits) / lookups if lookups else 0.0
+            return dict(self._stats, waits=waits, hit_rate=hit_rate, entries=len(self._entries))
+
+    def clear(self):
+        """Forget every in-memory entry and reset the counters (disk entries are kept)."""
+        with self._lock:
+            self._entries.clear()
+            self._fingerprint = None
+            self._stats.update(hits=0, disk_hits=0, misses=0, evictions=0)
+            self._flights.waits = 0
+
+
+figures = FigureCache(disk_dir=os.environ.get(FIGURE_CACHE_DIR_ENV))
+
+
+def cached_figure(chart_id, build, *params):
+    """Return the figure of `build(*params)` as a dict, cached for the current dataset version."""
+    return figures.get(data_loader.dataset_version(), chart_id, params, lambda: build(*params))
+
+
+def cache_info():
+    """Return the statistics of the shared figure cache (see `FigureCache.info`)."""
+    return figures.info()
@@ -0,0 +1,308 @@
+"""Simplified state outlines and place coordinates for the maps, built once from Census files.
+
+The pages draw a state choropleth and a city bubble map without any tile
+server, topojson download or geocoder. `build_geometry` reads the Census
+cartographic boundary file of the states (the zipped shapefile as published,
+or a GeoJSON conversion of it) and the Gazetteer place file, projects both to
+an Albers equal-area layout of the United States in km (Alaska, Hawaii and
+Puerto Rico as insets), simplifies every outline with Douglas-Peucker at each
+tolerance of `LEVELS` and writes the result as flat float32 arrays to
+`data_snapshot/geo.npz`. `load_geometry` reads that file once per process.
+
+A map picks its level of detail from the extent it shows (`level_for`): the
+whole country is drawn from the coarsest outlines, a single state from the
+finest, so the figure sent to the browser stays small at every zoom.
+
+Usage (from the app root):
+
+    python -m event_analysis.geo STATES PLACES [--output PATH]
+
+with STATES e.g. cb_2022_us_state_20m.zip and PLACES 2022_Gaz_place_national.zip.
+"""
+import argparse
+import json
+import os
+import struct
+import threading
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+from event_analysis import snapshot
+from event_analysis.ingest.census import PLACE_SUFFIX
+from event_analysis.ingest.matching import STATE_ABBREVIATIONS, CityMatcher, canonical_state
+from event_analysis.spatial import EARTH_RADIUS_KM
+
+GEO_FILE = 'geo.npz'
+GEO_PATH = os.path.join(snapshot.SNAPSHOT_DIR, GEO_FILE)
+
+# Douglas-Peucker tolerance (km) of each level of detail, coarsest first
+LEVELS = (20.0, 6.0, 1.5)
+
+# Width of a map in pixels: a level is detailed enough when its tolerance is below one pixel
+MAP_PIXELS = 800
+
+# Albers equal-area conic (central meridian, central latitude, standard parallels) of each part of the
+# layout, and the scale and offset (km) that place the insets next to the contiguous states
+PROJECTIONS = {
+    None: ((-96.0, 37.5, 29.5, 45.5), 1.0, (0.0, 0.0)),
+    'Alaska': ((-154.0, 62.0, 55.0, 65.0), 0.35, (-1750.0, -1300.0)),
+    'Hawaii': ((-157.0, 20.5, 8.0, 18.0), 1.0, (-850.0, -1450.0)),
+    'Puerto Rico': ((-66.5, 18.2, 8.0, 18.0), 1.0, (1900.0, -1450.0)),
+}
+
+
+def project(lon, lat, state=None):
+    """Project longitudes and latitudes (degrees) of points in `state` to layout coordinates in km."""
+    (lon0, lat0, parallel1, parallel2), scale, (dx, dy) = PROJECTIONS.get(state, PROJECTIONS[None])
+    phi0, phi1, phi2 = np.radians([lat0, parallel1, parallel2])
+    n = (np.sin(phi1) + np.sin(phi2)) / 2
+    c = np.cos(phi1) ** 2 + 2 * n * np.sin(phi1)
+    rho0 = EARTH_RADIUS_KM * np.sqrt(c - 2 * n * np.sin(phi0)) / n
+    # Wrap longitudes around the central meridian, so the Aleutians east of 180 degrees stay in place
+    theta = n * np.radians((np.asarray(lon, dtype=float) - lon0 + 180.0) % 360.0 - 180.0)
+    rho = EARTH_RADIUS_KM * np.sqrt(c - 2 * n * np.sin(np.radians(np.asarray(lat, dtype=float)))) / n
+    return rho * np.sin(theta) * scale + dx, (rho0 - rho * np.cos(theta)) * scale + dy
+
+
+def simplify(ring, tolerance):
+    """Return the points of `ring` (an (n, 2) array) kept by Douglas-Peucker at `tolerance`."""
+    keep = np.zeros(len(ring), dtype=bool)
+    keep[[0, -1]] = True
+    stack = [(0, len(ring) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        segment = ring[last] - ring[first]
+        points = ring[first + 1:last] - ring[first]
+        length = np.hypot(*segment)
+        # Distance to the segment's line; a closed ring's first "segment" is a point
+        if length > 0:
+            distance = np.abs(segment[0] * points[:, 1] - segment[1] * points[:, 0]) / length
+        else:
+            distance = np.hypot(points[:, 0], points[:, 1])
+        farthest = int(distance.argmax())
+        if distance[farthest] > tolerance:
+            middle = first + 1 + farthest
+            keep[middle] = True
+            stack += [(first, middle), (middle, last)]
+    return ring[keep]
+
+
+def _area(ring):
+    x, y = ring[:, 0], ring[:, 1]
+    return abs(np.dot(x, np.roll(y, 1)) - np.dot(y, np.roll(x, 1))) / 2
+
+
+def simplify_rings(rings, tolerance):
+    """Simplify the rings of one state, dropping those that shrink below a pixel (the largest ring is always kept)."""
+    simplified = [simplify(ring, tolerance) for ring in rings]
+    largest = int(np.argmax([_area(ring) for ring in rings]))
+    return [ring for index, ring in enumerate(simplified)
+            if index == largest or (len(ring) >= 4 and _area(ring) >= tolerance ** 2)]
+
+
+def _dbf_records(data):
+    # Fixed-width dBASE records: a header with the field layout, then one deletion flag + fields per record
+    count, header_length, record_length = struct.unpack('<IHH', data[4:12])
+    fields, position = [], 32
+    while data[position] != 0x0D:
+        name = data[position:position + 11].split(b'\0')[0].decode('ascii')
+        fields.append((name, data[position + 16]))
+        position += 32
+    records = []
+    for index in range(count):
+        offset = header_length + index * record_length + 1
+        record = {}
+        for name, width in fields:
+            record[name] = data[offset:offset + width].decode('utf-8', 'replace').strip()
+            offset += width
+        records.append(record)
+    return records
+
+
+def _shp_rings(data):
+    # Polygon records of a .shp file: each a list of rings as (n, 2) lon/lat arrays
+    shapes, offset = [], 100
+    while offset < len(data):
+        length = struct.unpack('>i', data[offset + 4:offset + 8])[0] * 2
+        content = data[offset + 8:offset + 8 + length]
+        offset += 8 + length
+        if struct.unpack('<i', content[:4])[0] == 0:
+            shapes.append([])
+            continue
+        parts, points = struct.unpack('<2i', content[36:44])
+        starts = np.frombuffer(content, '<i4', parts, 44)
+        coordinates = np.frombuffer(content, '<f8', 2 * points, 44 + 4 * parts).reshape(-1, 2)
+        shapes.append(np.split(coordinates, starts[1:]))
+    return shapes
+
+
+def read_states(path):
+    """Return {state name: [ring lon/lat arrays]} from a zipped shapefile or a GeoJSON file of state boundaries."""
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            names = archive.namelist()
+            shp = archive.read(next(name for name in names if name.endswith('.shp')))
+            dbf = archive.read(next(name for name in names if name.endswith('.dbf')))
+        features = [(record.get('NAME'), rings) for record, rings in zip(_dbf_records(dbf), _shp_rings(shp))]
+    else:
+        with open(path) as handle:
+            collection = json.load(handle)
+        features = []
+        for feature in collection['features']:
+            properties, geometry = feature.get('properties') or {}, feature['geometry']
+            polygons = [geometry['coordinates']] if geometry['type'] == 'Polygon' else geometry['coordinates']
+            features.append((properties.get('NAME') or properties.get('name'),
+                             [np.asarray(ring, dtype=float)[:, :2] for polygon in polygons for ring in polygon]))
+
+    states = {}
+    for name, rings in features:
+        name = canonical_state(name) or name
+        if name and rings:
+            states.setdefault(name, []).extend(rings)
+    return states
+
+
+def read_places(path):
+    """Return City, State, lon and lat of every place of a Census Gazetteer place file (plain or zipped)."""
+    frame = pd.read_csv(path, sep='\t', dtype=str, encoding_errors='replace')
+    frame.columns = frame.columns.str.strip()
+    return pd.DataFrame({
+        # Same names as the Census API places the dataset was matched against
+        'City': frame['NAME'].str.replace(PLACE_SUFFIX, '', regex=True),
+        'State': frame['USPS'].map(STATE_ABBREVIATIONS),
+        'lon': pd.to_numeric(frame['INTPTLONG']),
+        'lat': pd.to_numeric(frame['INTPTLAT']),
+    }).dropna().reset_index(drop=True)
+
+
+def build_geometry(states_path, places_path, output=GEO_PATH, levels=LEVELS):
+    """Project and simplify the state outlines and place points and write them to `output`; return a report dict."""
+    states = read_states(states_path)
+    names = sorted(states)
+    arrays = {'levels': np.asarray(levels, dtype=np.float32), 'state_names': np.asarray(names)}
+
+    projected = {}
+    for name in names:
+        projected[name] = [np.column_stack(project(ring[:, 0], ring[:, 1], name)) for ring in states[name]]
+    arrays['state_bounds'] = np.asarray([np.concatenate(projected[name]).min(axis=0).tolist()
+                                         + np.concatenate(projected[name]).max(axis=0).tolist() for name in names],
+                                        dtype=np.float32)
+
+    report = {'states': len(names), 'source_points': sum(len(ring) for rings in projected.values() for ring in rings)}
+    separator = np.full((1, 2), np.nan)
+    for level, tolerance in enumerate(levels):
+        # One flat array per level: every ring followed by a NaN row, the rings of state i at offsets[i]:offsets[i + 1]
+        chunks, offsets = [], [0]
+        for name in names:
+            rings = simplify_rings(projected[name], tolerance)
+            chunks += [part for ring in rings for part in (ring, separator)]
+            offsets.append(offsets[-1] + sum(len(ring) + 1 for ring in rings))
+        arrays[f'outline_xy_{level}'] = np.concatenate(chunks).astype(np.float32)
+        arrays[f'outline_offsets_{level}'] = np.asarray(offsets, dtype=np.int64)
+        report[f'level_{level}_points'] = offsets[-1] - len(chunks) // 2
+
+    places = read_places(places_path)
+    xy = np.empty((len(places), 2))
+    for state, rows in places.groupby('State').indices.items():
+        xy[rows] = np.column_stack(project(places['lon'].to_numpy()[rows], places['lat'].to_numpy()[rows], state))
+    arrays.update(place_city=places['City'].to_numpy(dtype=str), place_state=places['State'].to_numpy(dtype=str),
+                  place_xy=xy.astype(np.float32))
+    report['places'] = len(places)
+
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output + '.tmp', 'wb') as handle:
+        np.savez_compressed(handle, **arrays)
+    os.replace(output + '.tmp', output)
+    report['bytes'] = os.path.getsize(output)
+    return report
+
+
+class Geometry:
+    """The arrays written by `build_geometry`, with lookups by state and level of detail."""
+
+    def __init__(self, arrays, version):
+        self.version = version
+        self.levels = tuple(arrays['levels'].tolist())
+        self.states = tuple(arrays['state_names'].tolist())
+        self._index = {name: index for index, name in enumerate(self.states)}
+        self._bounds = arrays['state_bounds']
+        self._outlines = [(arrays[f'outline_xy_{level}'], arrays[f'outline_offsets_{level}'])
+                          for level in range(len(self.levels))]
+        self._places = pd.DataFrame({'City': arrays['place_city'], 'State': arrays['place_state'],
+                                     'x': arrays['place_xy'][:, 0], 'y': arrays['place_xy'][:, 1]})
+        self._matcher = None
+        self._lock = threading.Lock()
+
+    def bounds(self, states=None):
+        """Return (xmin, ymin, xmax, ymax) of `states` (all by default)."""
+        rows = self._bounds if states is None else self._bounds[[self._index[name] for name in states]]
+        return tuple(rows[:, :2].min(axis=0).tolist() + rows[:, 2:].max(axis=0).tolist())
+
+    def states_in(self, bounds):
+        """Return the states whose outline overlaps `bounds`."""
+        xmin, ymin, xmax, ymax = bounds
+        inside = ((self._bounds[:, 0] <= xmax) & (self._bounds[:, 2] >= xmin)
+                  & (self._bounds[:, 1] <= ymax) & (self._bounds[:, 3] >= ymin))
+        return [name for name, overlaps in zip(self.states, inside) if overlaps]
+
+    def level_for(self, bounds, pixels=MAP_PIXELS):
+        """Return the coarsest level whose tolerance is below one pixel of a map showing `bounds`."""
+        size = max(bounds[2] - bounds[0], bounds[3] - bounds[1]) / pixels
+        return next((level for level, tolerance in enumerate(self.levels) if tolerance <= size), len(self.levels) - 1)
+
+    def outline(self, state, level):
+        """Return the rings of `state` at `level` as one (n, 2) array, each ring followed by a NaN row."""
+        xy, offsets = self._outlines[level]
+        index = self._index[state]
+        return xy[offsets[index]:offsets[index + 1]]
+
+    def locate(self, cities):
+        """Return the layout x and y of every City/State row of `cities` (NaN where no place matches)."""
+        with self._lock:
+            if self._matcher is None:
+                self._matcher = CityMatcher(self._places)
+        matched = self._matcher.resolve(cities)['_place'].to_numpy()
+        found = matched >= 0
+        x, y = np.full(len(cities), np.nan), np.full(len(cities), np.nan)
+        x[found] = self._places['x'].to_numpy()[matched[found]]
+        y[found] = self._places['y'].to_numpy()[matched[found]]
+        return x, y
+
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def load_geometry(path=GEO_PATH):
+    """Return the `Geometry` in `path`, read once per version of the file, or None when it has not been built."""
+    try:
+        version = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    key = os.path.abspath(path), version
+    with _lock:
+        if key not in _cache:
+            _cache.clear()
+            with np.load(path) as arrays:
+                _cache[key] = Geometry({name: arrays[name] for name in arrays.files}, version)
+        return _cache[key]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build the simplified map geometry from Census boundary and place files.')
+    parser.add_argument('states', help='state boundaries: zipped shapefile or GeoJSON')
+    parser.add_argument('places', help='Gazetteer place file (.txt or .zip)')
+    parser.add_argument('--output', default=GEO_PATH)
+    args = parser.parse_args(argv)
+
+    report = build_geometry(args.states, args.places, args.output)
+    for name, value in report.items():
+        print(f'{name}: {value}')
+
+
+if __name__ == '__main__':
+    main()
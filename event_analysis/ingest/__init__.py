@@ -0,0 +1,17 @@
+"""Reproducible ingestion of the data sources behind the merged dataset.
+
+One module per source (Ticketmaster Discovery API, Census ACS API, the
+Wikipedia "List of airports by IATA airport code" pages and the OurAirports
+airport list, which gives the airports' coordinates). Each fetcher keeps
+the raw responses in a local `RawCache` and only re-requests what can have
+changed; `pipeline.run` then merges the cached data into the app's CSV and
+rebuilds the snapshot.
+
+Every fetcher takes a `base_url` and an `engine` (see `engine.FetchEngine`,
+which runs requests concurrently under per-host rate limits), so the whole
+pipeline can be pointed at a local HTTP server.
+
+Usage (from the app root):
+
+    TICKETMASTER_API_KEY=... python -m event_analysis.ingest
+"""
@@ -0,0 +1,3 @@
+from event_analysis.ingest.pipeline import main
+
+main()
@@ -0,0 +1,81 @@
+"""On-disk cache of raw source responses."""
+import json
+import os
+import re
+import time
+
+
+class RawCache:
+    """Store raw response bodies with their metadata under `root/<source>/<key>`.
+
+    The metadata (ETag, Last-Modified, fetch time, ...) is what makes
+    incremental refresh possible: a fetcher looks at it to decide whether a
+    key needs to be requested again and which conditional headers to send.
+    """
+
+    def __init__(self, root='raw_cache'):
+        self.root = root
+
+    def _path(self, source, key):
+        safe_key = re.sub(r'[^A-Za-z0-9_.=-]', '_', key)
+        return os.path.join(self.root, source, safe_key)
+
+    def get(self, source, key):
+        """Return (body bytes, metadata dict) for a cached key, or None."""
+        path = self._path(source, key)
+        try:
+            with open(path + '.body', 'rb') as handle:
+                body = handle.read()
+            with open(path + '.json') as handle:
+                return body, json.load(handle)
+        except (OSError, ValueError):
+            return None
+
+    def meta(self, source, key):
+        """Return only the metadata of a cached key, or None."""
+        cached = self.get(source, key)
+        return cached[1] if cached else None
+
+    def conditional_headers(self, source, key):
+        """Return the If-None-Match / If-Modified-Since headers revalidating a cached key (empty when not cached)."""
+        meta = self.meta(source, key) or {}
+        headers = {}
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+        return headers
+
+    def put(self, source, key, body, **meta):
+        """Store a response body and its metadata, replacing any previous version atomically."""
+        path = self._path(source, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        meta.setdefault('fetched_at', time.time())
+        with open(path + '.body.tmp', 'wb') as handle:
+            handle.write(body)
+        with open(path + '.json.tmp', 'w') as handle:
+            json.dump(meta, handle)
+        os.replace(path + '.body.tmp', path + '.body')
+        os.replace(path + '.json.tmp', path + '.json')
+
+    def touch(self, source, key, **meta):
+        """Update the metadata of a cached key without changing its body (e.g. after a 304)."""
+        cached = self.get(source, key)
+        if cached is not None:
+            self.put(source, key, cached[0], **dict(cached[1], **meta, fetched_at=time.time()))
+
+    def delete(self, source, key):
+        """Remove a cached key and its metadata, if present."""
+        path = self._path(source, key)
+        for suffix in ('.body', '.json'):
+            try:
+                os.remove(path + suffix)
+            except FileNotFoundError:
+                pass
+
+    def keys(self, source):
+        """Return the sorted cache keys stored for a source."""
+        directory = os.path.join(self.root, source)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(name[:-len('.body')] for name in os.listdir(directory) if name.endswith('.body'))
@@ -0,0 +1,75 @@
+"""Census ACS 5-year API fetcher for state and place population and income."""
+import json
+import re
+
+import pandas as pd
+
+from event_analysis.ingest.engine import FetchEngine
+from event_analysis.ingest.transport import build_url, raise_for_status
+
+BASE_URL = 'https://api.census.gov/data'
+SOURCE = 'census'
+
+# Total population and median household income (in inflation-adjusted dollars)
+POPULATION = 'B01003_001E'
+INCOME = 'B19013_001E'
+
+# Census place names end with the kind of place, e.g. "Los Angeles city" or "Honolulu CDP"
+PLACE_SUFFIX = re.compile(r'\s+(city and borough|consolidated government \(balance\)|metropolitan government \(balance\)|'
+                          r'unified government \(balance\)|\(balance\)|city|town|village|borough|municipality|CDP)$')
+
+
+class CensusSource:
+    """Fetch state and place tables for one ACS vintage.
+
+    A published ACS vintage never changes, so each table is requested once
+    and served from the cache afterwards.
+    """
+
+    def __init__(self, cache, year=2022, api_key=None, base_url=BASE_URL, engine=None):
+        self.cache = cache
+        self.year = year
+        self.api_key = api_key
+        self.base_url = base_url
+        self.engine = engine or FetchEngine()
+
+    def _get(self, key, geography, within=None):
+        if self.cache.get(SOURCE, key) is None:
+            params = {'get': f'NAME,{POPULATION},{INCOME}', 'for': geography}
+            if within:
+                params['in'] = within
+            if self.api_key:
+                params['key'] = self.api_key
+            url = build_url(self.base_url, f'{self.year}/acs/acs5', params)
+            response = self.engine.fetch(url)
+            raise_for_status(response, url)
+            self.cache.put(SOURCE, key, response.body, year=self.year)
+        rows = json.loads(self.cache.get(SOURCE, key)[0])
+        return pd.DataFrame(rows[1:], columns=rows[0])
+
+    def refresh(self):
+        """Make sure both tables of the configured vintage are cached."""
+        self.states()
+        self.places()
+
+    def states(self):
+        """Return State, Population_state and Median Household Income_state."""
+        frame = self._get(f'{self.year}_states', 'state:*')
+        return pd.DataFrame({
+            'State': frame['NAME'],
+            'Population_state': pd.to_numeric(frame[POPULATION]),
+            'Median Household Income_state': pd.to_numeric(frame[INCOME]),
+        })
+
+    def places(self):
+        """Return City, State, Population_city and Median Household Income_city for every place."""
+        frame = self._get(f'{self.year}_places', 'place:*', within='state:*')
+        names = frame['NAME'].str.rsplit(', ', n=1, expand=True)
+        income = pd.to_numeric(frame[INCOME])
+        return pd.DataFrame({
+            'City': names[0].str.replace(PLACE_SUFFIX, '', regex=True),
+            'State': names[1],
+            'Population_city': pd.to_numeric(frame[POPULATION]),
+            # The API reports suppressed medians as large negative sentinels
+            'Median Household Income_city': income.where(income > 0),
+        })
@@ -0,0 +1,217 @@
+"""Name normalization and entity matching for the City/State merge.
+
+The three sources spell places differently ("St. Louis" / "Saint Louis",
+"NY" / "New York", "Winston Salem" / "Winston-Salem"). `CityMatcher` resolves
+a (City, State) pair against the Census places in three steps:
+
+1. exact key match;
+2. match on canonical state and normalized city name;
+3. fuzzy match on character trigrams, blocked by state: names are compared
+   only with the places of their own state, as one sparse matrix product of
+   trigram indicator vectors per state, so a lookup never scans every place.
+
+Only distinct (City, State) pairs are matched and every step works on whole
+columns, so matching a large event table costs one vectorized pass over the
+venue cities rather than one Python lookup per event.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+import scipy.sparse
+
+STATE_ABBREVIATIONS = {
+    'AL': 'Alabama', 'AK': 'Alaska', 'AZ': 'Arizona', 'AR': 'Arkansas', 'CA': 'California', 'CO': 'Colorado',
+    'CT': 'Connecticut', 'DE': 'Delaware', 'DC': 'District of Columbia', 'FL': 'Florida', 'GA': 'Georgia',
+    'HI': 'Hawaii', 'ID': 'Idaho', 'IL': 'Illinois', 'IN': 'Indiana', 'IA': 'Iowa', 'KS': 'Kansas',
+    'KY': 'Kentucky', 'LA': 'Louisiana', 'ME': 'Maine', 'MD': 'Maryland', 'MA': 'Massachusetts',
+    'MI': 'Michigan', 'MN': 'Minnesota', 'MS': 'Mississippi', 'MO': 'Missouri', 'MT': 'Montana',
+    'NE': 'Nebraska', 'NV': 'Nevada', 'NH': 'New Hampshire', 'NJ': 'New Jersey', 'NM': 'New Mexico',
+    'NY': 'New York', 'NC': 'North Carolina', 'ND': 'North Dakota', 'OH': 'Ohio', 'OK': 'Oklahoma',
+    'OR': 'Oregon', 'PA': 'Pennsylvania', 'PR': 'Puerto Rico', 'RI': 'Rhode Island', 'SC': 'South Carolina',
+    'SD': 'South Dakota', 'TN': 'Tennessee', 'TX': 'Texas', 'UT': 'Utah', 'VT': 'Vermont', 'VA': 'Virginia',
+    'WA': 'Washington', 'WV': 'West Virginia', 'WI': 'Wisconsin', 'WY': 'Wyoming',
+}
+
+# Lower-cased spellings (names, abbreviations and common variants) mapped to the Census state name
+_STATE_LOOKUP = {name.lower(): name for name in STATE_ABBREVIATIONS.values()}
+_STATE_LOOKUP.update({code.lower(): name for code, name in STATE_ABBREVIATIONS.items()})
+_STATE_LOOKUP.update({'washington dc': 'District of Columbia', 'washington d.c.': 'District of Columbia', 'd.c.': 'District of Columbia'})
+
+# Abbreviated words in city names, matched as whole words after punctuation is removed
+_CITY_WORDS = {'st': 'saint', 'ste': 'sainte', 'ft': 'fort', 'mt': 'mount', 'pt': 'point', 'n': 'north',
+               's': 'south', 'e': 'east', 'w': 'west', 'twp': 'township'}
+_CITY_SUFFIX = r'\s+(city|town|village|borough|cdp|municipality|township)$'
+
+FUZZY_THRESHOLD = 0.75
+
+# Whole-word abbreviations expanded by the vectorized normalizer (plain strings, so Arrow-backed columns stay vectorized)
+_CITY_WORD_PATTERNS = [(rf'\b{short}\b', long) for short, long in _CITY_WORDS.items()]
+_CITY_WORD_ANY = r'\b(?:' + '|'.join(_CITY_WORDS) + r')\b'
+
+
+def canonical_state(value):
+    """Return the Census name of a state given its name or postal abbreviation, or None."""
+    if not isinstance(value, str):
+        return None
+    return _STATE_LOOKUP.get(re.sub(r'\s+', ' ', value.strip().lower()))
+
+
+def canonical_states(series):
+    """Vectorized `canonical_state` for a Series of state names."""
+    return series.astype(str).str.strip().str.lower().str.replace(r'\s+', ' ', regex=True).map(_STATE_LOOKUP)
+
+
+def normalize_cities(series):
+    """Return comparison keys for a Series of city names: ASCII, lower case, no punctuation, abbreviations expanded."""
+    text = series.fillna('').astype(str).str.normalize('NFKD').str.lower()
+    # Dropping non-ASCII characters after NFKD removes the accents
+    text = text.str.replace(r"[.'’]|[^\x00-\x7f]", '', regex=True).str.replace(r'[^a-z0-9]+', ' ', regex=True).str.strip()
+    # Only the few names containing an abbreviation go through the per-word replacements
+    abbreviated = text.str.contains(_CITY_WORD_ANY, regex=True)
+    if abbreviated.any():
+        subset = text[abbreviated]
+        for pattern, replacement in _CITY_WORD_PATTERNS:
+            subset = subset.str.replace(pattern, replacement, regex=True)
+        text = text.mask(abbreviated, subset)
+    return text.str.replace(_CITY_SUFFIX, '', regex=True)
+
+
+def _sorted_unique(values):
+    # np.unique, written as sort + neighbour comparison (faster than the hash-based path for large int arrays)
+    values = np.sort(values)
+    return values[np.concatenate(([True], values[1:] != values[:-1]))] if len(values) else values
+
+
+def _gram_codes(keys):
+    # Distinct character trigrams of "  key " for every key, as (row, code) pairs with code = b0 << 16 | b1 << 8 | b2
+    padded = ['  ' + key + ' ' for key in keys]
+    lengths = np.fromiter(map(len, padded), dtype=np.int64, count=len(padded))
+    buffer = np.frombuffer(''.join(padded).encode('ascii', 'replace'), dtype=np.uint8).astype(np.int64)
+    counts = lengths - 2
+    rows = np.repeat(np.arange(len(keys)), counts)
+    positions = np.repeat(np.cumsum(lengths) - lengths, counts) + (np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts))
+    codes = buffer[positions] << 16 | buffer[positions + 1] << 8 | buffer[positions + 2]
+
+    # Trigram sets, not multisets: drop repeated trigrams within a key
+    unique = _sorted_unique(rows << 24 | codes)
+    return unique >> 24, unique & 0xFFFFFF
+
+
+def _gram_matrix(keys, vocabulary):
+    # Sparse 0/1 matrix of keys x trigrams in `vocabulary` (sorted codes) and the number of distinct trigrams per key
+    rows, codes = _gram_codes(keys)
+    sizes = np.bincount(rows, minlength=len(keys)).astype(np.float32)
+    columns = np.searchsorted(vocabulary, codes).clip(max=len(vocabulary) - 1)
+    known = vocabulary[columns] == codes
+    data = np.ones(known.sum(), dtype=np.float32)
+    matrix = scipy.sparse.csr_matrix((data, (rows[known], columns[known])), shape=(len(keys), len(vocabulary)))
+    return matrix, sizes
+
+
+class CityMatcher:
+    """Match (City, State) pairs against a reference table of places."""
+
+    def __init__(self, places, threshold=FUZZY_THRESHOLD):
+        self.places = places.reset_index(drop=True)
+        self.threshold = threshold
+        self.reference = pd.DataFrame({
+            'State': self.places['State'].astype(str),
+            'City': self.places['City'].astype(str),
+            '_state': canonical_states(self.places['State']),
+            '_key': normalize_cities(self.places['City']),
+            '_place': np.arange(len(self.places)),
+        })
+        # The trigram index is built on first use, since most lookups never reach the fuzzy step
+        self._gram_index = None
+
+    def _grams(self):
+        if self._gram_index is None:
+            keys = self.reference['_key'].tolist()
+            vocabulary = _sorted_unique(_gram_codes(keys)[1])
+            matrix, sizes = _gram_matrix(keys, vocabulary)
+            blocks = self.reference.groupby('_state').indices
+            self._gram_index = vocabulary, matrix, sizes, blocks
+        return self._gram_index
+
+    def _fuzzy(self, keys, states):
+        # Dice similarity of trigram sets, scored only against the places of each name's own state
+        vocabulary, matrix, sizes, blocks = self._grams()
+        queries, query_sizes = _gram_matrix(keys, vocabulary)
+        places = np.full(len(keys), -1)
+        best_scores = np.zeros(len(keys))
+        for state, rows in pd.Series(np.arange(len(keys))).groupby(np.asarray(states)).indices.items():
+            block = blocks.get(state)
+            if block is None:
+                continue
+            # One sparse product per state: shared trigram counts of every query against every place
+            shared = (queries[rows] @ matrix[block].T).toarray()
+            scores = 2 * shared / (query_sizes[rows, None] + sizes[None, block])
+            best = scores.argmax(axis=1)
+            best_scores[rows] = scores[np.arange(len(rows)), best]
+            places[rows] = np.where(best_scores[rows] >= self.threshold, block[best], -1)
+        return places, best_scores
+
+    def resolve(self, pairs):
+        """Return `pairs` (distinct City/State rows) with the matched place index, method and score."""
+        pairs = pairs[['City', 'State']].astype(str).reset_index(drop=True)
+
+        # 1. exact key
+        exact = self.reference.drop_duplicates(['City', 'State'])[['City', 'State', '_place']]
+        result = pairs.merge(exact, on=['City', 'State'], how='left')
+        result['_method'] = np.where(result['_place'].notna(), 'exact', None)
+        result['_score'] = result['_place'].notna().astype(float)
+
+        # 2. canonical state + normalized city name
+        todo = result['_place'].isna()
+        result['_state'] = canonical_states(result['State'])
+        result['_key'] = ''
+        result.loc[todo, '_key'] = normalize_cities(result.loc[todo, 'City'])
+        normalized = self.reference.drop_duplicates(['_state', '_key'])[['_state', '_key', '_place']]
+        found = result.loc[todo, ['_state', '_key']].merge(normalized, on=['_state', '_key'], how='left')['_place'].to_numpy()
+        result.loc[todo, '_place'] = found
+        result.loc[todo & result['_place'].notna(), ['_method', '_score']] = ['normalized', 1.0]
+
+        # 3. fuzzy, blocked by state
+        todo = result['_place'].isna() & result['_state'].notna()
+        if todo.any():
+            places, scores = self._fuzzy(result.loc[todo, '_key'].tolist(), result.loc[todo, '_state'].to_numpy())
+            index = result.index[todo]
+            result.loc[index, '_score'] = scores
+            result.loc[index[places >= 0], '_place'] = places[places >= 0]
+            result.loc[index[places >= 0], '_method'] = 'fuzzy'
+
+        result['_place'] = result['_place'].fillna(-1).astype(int)
+        return result[['City', 'State', '_place', '_method', '_score']]
+
+    def match(self, frame):
+        """Return `frame` with the matched place columns (City, State, ...) replaced and a match method column.
+
+        Unmatched rows keep their original City/State, get missing place
+        columns and a method of None.
+        """
+        pairs = self.resolve(frame[['City', 'State']].drop_duplicates())
+        keyed = frame.assign(City=frame['City'].astype(str), State=frame['State'].astype(str))
+        matched = keyed.merge(pairs.drop(columns='_score'), on=['City', 'State'], how='left')
+
+        # Attach the matched place's columns; City and State take the reference spelling
+        places = self.places.rename(columns={'City': '_City', 'State': '_State'})
+        matched = matched.merge(places, left_on='_place', right_index=True, how='left')
+        matched['City'] = matched.pop('_City').fillna(matched['City'])
+        matched['State'] = matched.pop('_State').fillna(matched['State'])
+        return matched.drop(columns='_place').rename(columns={'_method': 'Match Method'})
+
+
+def match_report(frame, matched):
+    """Return row counts matched by the plain exact-key merge and by the matching engine, per method."""
+    methods = matched['Match Method'].value_counts()
+    exact = int(methods.get('exact', 0))
+    recovered = int(methods.get('normalized', 0) + methods.get('fuzzy', 0))
+    return {
+        'rows': len(frame),
+        'exact_key_matches': exact,
+        'normalized_matches': int(methods.get('normalized', 0)),
+        'fuzzy_matches': int(methods.get('fuzzy', 0)),
+        'unmatched': int(matched['Match Method'].isna().sum()),
+        'recovered_rows': recovered,
+    }
@@ -0,0 +1,46 @@
+"""Merge the cached source tables into the app's flat dataset."""
+import pandas as pd
+
+from event_analysis.ingest.matching import CityMatcher, canonical_state, match_report
+
+# Column order of WANG_QING_final_data.csv
+OUTPUT_COLUMNS = ['Event Number', 'Event ID', 'Event Date', 'Venue Latitude', 'Venue Longitude', 'City', 'State',
+                  'Population_state', 'Median Household Income_state', 'Population_city', 'Median Household Income_city',
+                  'IATA', 'ICAO', 'Airport Name', 'Airport Latitude', 'Airport Longitude']
+AIRPORT_COLUMNS = ['IATA', 'ICAO', 'Airport Name', 'Airport Latitude', 'Airport Longitude']
+
+
+def _match_places(matcher, frame):
+    # Resolve (City, State) to the Census spelling and keep only the rows that matched a place
+    matched = matcher.match(frame)
+    return matched[matched['Match Method'].notna()].drop(columns='Match Method'), match_report(frame, matched)
+
+
+def merge_sources(events, states, places, airports, coordinates=None):
+    """Join events and airports to the Census places and states; return (merged frame, match report).
+
+    Event and airport locations are resolved through `CityMatcher`, so
+    spelling differences ("St." / "Saint", state abbreviations, punctuation)
+    no longer drop rows. Events without a matching place are dropped, and
+    cities without an airport keep a single row with empty airport columns.
+    Airports get their coordinates from `coordinates` (IATA, Airport
+    Latitude, Airport Longitude), when given.
+    """
+    matcher = CityMatcher(places)
+    events, report = _match_places(matcher, events.dropna(subset=['City', 'State']))
+    airports, airport_report = _match_places(matcher, airports)
+    if coordinates is None:
+        coordinates = pd.DataFrame(columns=['IATA', 'Airport Latitude', 'Airport Longitude'])
+    airports = airports.merge(coordinates, on='IATA', how='left')
+    report = {f'events_{name}': value for name, value in report.items()}
+    report.update({f'airports_{name}': value for name, value in airport_report.items()})
+
+    states = states.assign(State=states['State'].map(canonical_state).fillna(states['State']))
+    merged = events.merge(states, on='State')
+    merged = merged.merge(airports[AIRPORT_COLUMNS + ['City', 'State']], on=['City', 'State'], how='left')
+
+    # Number events in a stable order so Event Number does not depend on fetch order
+    event_ids = pd.Index(sorted(merged['Event ID'].unique()))
+    merged['Event Number'] = event_ids.get_indexer(merged['Event ID']) + 1
+    merged = merged.sort_values(['Event Number', 'IATA']).reset_index(drop=True)[OUTPUT_COLUMNS]
+    return merged, report
@@ -0,0 +1,51 @@
+"""OurAirports airport list (public domain), for the coordinates of the airports by IATA code."""
+import io
+
+import pandas as pd
+
+from event_analysis.ingest.engine import FetchEngine
+from event_analysis.ingest.transport import build_url, raise_for_status
+
+BASE_URL = 'https://davidmegginson.github.io/ourairports-data'
+SOURCE = 'ourairports'
+FILE_NAME = 'airports.csv'
+
+
+class OurAirportsSource:
+    """Fetch the OurAirports `airports.csv` with a conditional request.
+
+    The Wikipedia lists name the city an airport serves but not where the
+    airport is. This file has the coordinates of every airport; it is one
+    download of a few MB, revalidated with its ETag and Last-Modified like
+    the Wikipedia pages, so an unchanged file costs a 304 response.
+    """
+
+    def __init__(self, cache, base_url=BASE_URL, engine=None):
+        self.cache = cache
+        self.base_url = base_url
+        self.engine = engine or FetchEngine()
+
+    def refresh(self):
+        """Fetch the airport list unless the cached copy is current; return True when its content changed."""
+        url = build_url(self.base_url, FILE_NAME)
+        response = self.engine.fetch(url, headers=self.cache.conditional_headers(SOURCE, FILE_NAME))
+        raise_for_status(response, url)
+        if response.status == 304:
+            self.cache.touch(SOURCE, FILE_NAME)
+            return False
+        headers = {name.lower(): value for name, value in response.headers.items()}
+        self.cache.put(SOURCE, FILE_NAME, response.body, etag=headers.get('etag'),
+                       last_modified=headers.get('last-modified'))
+        return True
+
+    def coordinates(self):
+        """Return IATA, Airport Latitude and Airport Longitude of every cached airport with an IATA code."""
+        cached = self.cache.get(SOURCE, FILE_NAME)
+        if cached is None:
+            return pd.DataFrame(columns=['IATA', 'Airport Latitude', 'Airport Longitude'])
+        frame = pd.read_csv(io.BytesIO(cached[0]), usecols=['iata_code', 'latitude_deg', 'longitude_deg'],
+                            dtype={'iata_code': str}, keep_default_na=False, na_values=[''])
+        frame = frame.dropna().rename(columns={'iata_code': 'IATA', 'latitude_deg': 'Airport Latitude',
+                                               'longitude_deg': 'Airport Longitude'})
+        # A few closed airports share a code with an open one; the first listed is kept
+        return frame.drop_duplicates(subset='IATA').reset_index(drop=True)
@@ -0,0 +1,82 @@
+"""End-to-end refresh: fetch every source incrementally, merge, and rebuild the snapshot."""
+import argparse
+import datetime
+import os
+import time
+
+from event_analysis import snapshot
+from event_analysis.ingest.cache import RawCache
+from event_analysis.ingest.census import CensusSource
+from event_analysis.ingest.engine import FetchEngine
+from event_analysis.ingest.merge import merge_sources
+from event_analysis.ingest.ourairports import OurAirportsSource
+from event_analysis.ingest.ticketmaster import TicketmasterSource
+from event_analysis.ingest.wikipedia import WikipediaAirportsSource
+
+
+def run(output=snapshot.DATA_PATH, cache_dir='raw_cache', ticketmaster_key=None, census_key=None,
+        start=None, end=None, today=None, sources=None, build_snapshot=True):
+    """Refresh the sources, write the merged CSV to `output` and return a short report.
+
+    The event window defaults to the one described in the Data Overview tab:
+    six months back to one year ahead. `sources` may replace the default
+    source objects, e.g. ones pointed at a local test server; without an
+    'ourairports' source the airports get no coordinates.
+    """
+    today = today or datetime.date.today()
+    start = start or today - datetime.timedelta(days=182)
+    end = end or today + datetime.timedelta(days=365)
+
+    cache = RawCache(cache_dir)
+    # One engine for all sources, so they share connections and per-host rate limits
+    engine = FetchEngine()
+    sources = sources or {
+        'ticketmaster': TicketmasterSource(cache, ticketmaster_key or os.environ.get('TICKETMASTER_API_KEY'), engine=engine),
+        'census': CensusSource(cache, api_key=census_key or os.environ.get('CENSUS_API_KEY'), engine=engine),
+        'wikipedia': WikipediaAirportsSource(cache, engine=engine),
+        'ourairports': OurAirportsSource(cache, engine=engine),
+    }
+
+    # The engine's connections are closed even when a source or the merge fails
+    try:
+        started = time.perf_counter()
+        report = {
+            'event_windows_fetched': len(sources['ticketmaster'].refresh(start, end, today=today)),
+            'airport_pages_changed': len(sources['wikipedia'].refresh()),
+        }
+        if 'ourairports' in sources:
+            report['airport_coordinates_changed'] = sources['ourairports'].refresh()
+        sources['census'].refresh()
+        report['fetch_seconds'] = round(time.perf_counter() - started, 2)
+
+        coordinates = sources['ourairports'].coordinates() if 'ourairports' in sources else None
+        merged, match_report = merge_sources(sources['ticketmaster'].events(), sources['census'].states(),
+                                             sources['census'].places(), sources['wikipedia'].airports(), coordinates)
+    finally:
+        engine.close()
+    report.update(match_report)
+    merged.to_csv(output + '.tmp', index=False)
+    os.replace(output + '.tmp', output)
+    report.update(rows=len(merged), events=merged['Event Number'].nunique())
+
+    if build_snapshot:
+        snapshot.build_snapshot(output)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Refresh the music events dataset from its sources.')
+    parser.add_argument('--output', default=snapshot.DATA_PATH)
+    parser.add_argument('--cache-dir', default='raw_cache')
+    parser.add_argument('--start', type=datetime.date.fromisoformat)
+    parser.add_argument('--end', type=datetime.date.fromisoformat)
+    parser.add_argument('--no-snapshot', action='store_true', help='only write the CSV')
+    args = parser.parse_args(argv)
+
+    report = run(args.output, args.cache_dir, start=args.start, end=args.end, build_snapshot=not args.no_snapshot)
+    for name, value in report.items():
+        print(f'{name}: {value}')
+
+
+if __name__ == '__main__':
+    main()
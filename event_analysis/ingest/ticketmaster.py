@@ -0,0 +1,147 @@
+"""Ticketmaster Discovery API fetcher for U.S. music events."""
+import datetime
+import json
+import os
+
+import pandas as pd
+
+from event_analysis.ingest.engine import Checkpoint, FetchEngine
+from event_analysis.ingest.transport import build_url, raise_for_status
+
+BASE_URL = 'https://app.ticketmaster.com/discovery/v2'
+SOURCE = 'ticketmaster'
+
+# The Discovery API refuses to page beyond the 1000th result of a query
+MAX_RESULTS = 1000
+PAGE_SIZE = 200
+
+# Windows are laid on a fixed grid of `window_days` days from this Monday, so their keys do not move with
+# the refresh date
+EPOCH = datetime.date(2000, 1, 3)
+
+
+class TicketmasterSource:
+    """Fetch music events by date window and keep one cached response set per window.
+
+    Windows are aligned to a fixed grid, so the same window keeps the same
+    cache key from one daily refresh to the next. A window that ended before
+    the previous refresh started cannot gain new events, so it is never
+    requested again; windows that are still open (or in the future) are
+    re-fetched on every refresh, and cached windows that are no longer part of
+    the refreshed range are dropped. Windows with more results than the API
+    can page through are split in half until they fit.
+
+    Windows, and the result pages within a window, are fetched concurrently
+    through the shared `FetchEngine`. Finished pages are checkpointed, so an
+    interrupted refresh resumes without requesting them again.
+    """
+
+    def __init__(self, cache, api_key, base_url=BASE_URL, engine=None, window_days=7):
+        self.cache = cache
+        self.api_key = api_key
+        self.base_url = base_url
+        self.engine = engine or FetchEngine()
+        self.window_days = window_days
+        self.checkpoint = Checkpoint(os.path.join(cache.root, '_checkpoints', SOURCE + '.json'))
+
+    def _request(self, start, end, page):
+        params = {
+            'apikey': self.api_key,
+            'classificationName': 'music',
+            'countryCode': 'US',
+            'startDateTime': start.strftime('%Y-%m-%dT00:00:00Z'),
+            'endDateTime': end.strftime('%Y-%m-%dT00:00:00Z'),
+            'size': PAGE_SIZE,
+            'page': page,
+            'sort': 'date,asc',
+        }
+        url = build_url(self.base_url, 'events.json', params)
+        response = self.engine.fetch(url)
+        raise_for_status(response, url)
+        return json.loads(response.body)
+
+    def _fetch_window(self, start, end, window_key):
+        # Return the simplified events of [start, end), splitting windows that are too large to page through
+        first = self._request(start, end, 0)
+        total = first.get('page', {}).get('totalElements', 0)
+        if total > MAX_RESULTS and (end - start).days > 1:
+            middle = start + (end - start) / 2
+            return self._fetch_window(start, middle, window_key) + self._fetch_window(middle, end, window_key)
+
+        # The first response tells how many pages there are; fetch the rest concurrently
+        prefix = f'{window_key}:{start:%Y-%m-%d}_{end:%Y-%m-%d}'
+        pages = self.engine.map(lambda page: _parse_events(self._request(start, end, page)),
+                                range(1, first.get('page', {}).get('totalPages', 1)),
+                                checkpoint=self.checkpoint, key=lambda page: f'{prefix}:{page}')
+        return sum(pages, _parse_events(first))
+
+    def windows(self, start, end):
+        """Yield the (start, end) grid windows covering [start, end); the first and last may extend beyond it."""
+        step = datetime.timedelta(days=self.window_days)
+        start -= datetime.timedelta(days=(start - EPOCH).days % self.window_days)
+        while start < end:
+            yield start, start + step
+            start += step
+
+    def refresh(self, start, end, today=None):
+        """Fetch every window of [start, end) that is missing or may still change; return the keys fetched."""
+        today = today or datetime.date.today()
+        windows = list(self.windows(start, end))
+        keys = {f'{window_start:%Y-%m-%d}_{window_end:%Y-%m-%d}' for window_start, window_end in windows}
+        # Windows that fell out of the range (or were cut with another window size) would only add stale events
+        for key in set(self.cache.keys(SOURCE)) - keys:
+            self.cache.delete(SOURCE, key)
+
+        stale = []
+        for window_start, window_end in windows:
+            meta = self.cache.meta(SOURCE, f'{window_start:%Y-%m-%d}_{window_end:%Y-%m-%d}')
+            # Closed windows fetched after they ended are final
+            if meta is None or window_end > datetime.date.fromisoformat(meta['fetched_on']):
+                stale.append((window_start, window_end))
+
+        def fetch_window(window):
+            key = f'{window[0]:%Y-%m-%d}_{window[1]:%Y-%m-%d}'
+            events = self._fetch_window(*window, key)
+            self.cache.put(SOURCE, key, json.dumps(events).encode(), fetched_on=today.isoformat(), count=len(events))
+            # The window is saved, so its page checkpoints are no longer needed
+            self.checkpoint.clear(key + ':')
+            return key
+
+        return self.engine.map(fetch_window, stale)
+
+    def events(self):
+        """Return all cached events as a frame with Event ID, Event Date, venue coordinates, City and State columns."""
+        cached = [self.cache.get(SOURCE, key) for key in self.cache.keys(SOURCE)]
+        records = []
+        # Newest fetch first, so an event moved to another window keeps its latest details
+        for body, _ in sorted(cached, key=lambda item: item[1]['fetched_at'], reverse=True):
+            records += json.loads(body)
+        frame = pd.DataFrame(records, columns=['Event ID', 'Event Date', 'Venue Latitude', 'Venue Longitude',
+                                                'City', 'State'])
+        return frame.drop_duplicates(subset='Event ID').reset_index(drop=True)
+
+
+def _parse_events(payload):
+    # Keep the event id, date and the location and city/state of the first venue
+    events = []
+    for event in payload.get('_embedded', {}).get('events', []):
+        venues = event.get('_embedded', {}).get('venues') or [{}]
+        venue = venues[0]
+        location = venue.get('location') or {}
+        events.append({
+            'Event ID': event['id'],
+            'Event Date': event.get('dates', {}).get('start', {}).get('localDate'),
+            'Venue Latitude': _coordinate(location.get('latitude')),
+            'Venue Longitude': _coordinate(location.get('longitude')),
+            'City': venue.get('city', {}).get('name'),
+            'State': venue.get('state', {}).get('name'),
+        })
+    return events
+
+
+def _coordinate(value):
+    # The API sends coordinates as strings, and some venues have none
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,34 @@
+"""Minimal HTTP GET helper shared by the source fetchers."""
+import collections
+import urllib.error
+import urllib.parse
+import urllib.request
+
+Response = collections.namedtuple('Response', ['status', 'headers', 'body'])
+
+USER_AGENT = 'music-events-ingest/1.0 (DSCI 510 final project)'
+
+
+def build_url(base_url, path='', params=None):
+    """Join a base URL, a path and query parameters."""
+    url = base_url.rstrip('/') + '/' + path.lstrip('/') if path else base_url
+    if params:
+        url += ('&' if '?' in url else '?') + urllib.parse.urlencode(params)
+    return url
+
+
+def fetch(url, headers=None, timeout=30):
+    """GET `url` and return a Response; HTTP error statuses are returned, not raised."""
+    request = urllib.request.Request(url, headers=dict({'User-Agent': USER_AGENT}, **(headers or {})))
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return Response(response.status, dict(response.headers), response.read())
+    except urllib.error.HTTPError as error:
+        # 304 Not Modified and 4xx/5xx answers arrive as HTTPError
+        return Response(error.code, dict(error.headers or {}), error.read() or b'')
+
+
+def raise_for_status(response, url):
+    """Raise RuntimeError for any status other than 200 or 304."""
+    if response.status not in (200, 304):
+        raise RuntimeError(f'GET {url} failed with HTTP {response.status}')
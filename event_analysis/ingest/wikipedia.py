@@ -0,0 +1,111 @@
+"""Wikipedia "List of airports by IATA airport code" fetcher."""
+import html.parser
+import os
+import re
+import string
+
+import pandas as pd
+
+from event_analysis.ingest.engine import Checkpoint, FetchEngine
+from event_analysis.ingest.transport import build_url, raise_for_status
+
+BASE_URL = 'https://en.wikipedia.org/wiki'
+SOURCE = 'wikipedia'
+PAGE_TITLE = 'List_of_airports_by_IATA_airport_code:_{letter}'
+LETTERS = string.ascii_uppercase
+
+# Footnote markers such as "[1]" or "[a]" in cell text
+FOOTNOTE = re.compile(r'\[[^\]]*\]')
+
+
+class WikipediaAirportsSource:
+    """Fetch the 26 letter pages with conditional requests.
+
+    The ETag and Last-Modified headers of every cached page are sent back as
+    If-None-Match / If-Modified-Since, so an unchanged page costs a 304
+    response and is not downloaded or parsed again. The pages are requested
+    concurrently through the shared `FetchEngine`.
+    """
+
+    def __init__(self, cache, base_url=BASE_URL, engine=None, letters=LETTERS):
+        self.cache = cache
+        self.base_url = base_url
+        self.engine = engine or FetchEngine()
+        self.letters = letters
+        self.checkpoint = Checkpoint(os.path.join(cache.root, '_checkpoints', SOURCE + '.json'))
+
+    def refresh_page(self, letter):
+        """Fetch one letter page; return True when its content changed."""
+        url = build_url(self.base_url, PAGE_TITLE.format(letter=letter))
+        response = self.engine.fetch(url, headers=self.cache.conditional_headers(SOURCE, letter))
+        raise_for_status(response, url)
+        if response.status == 304:
+            self.cache.touch(SOURCE, letter)
+            return False
+        headers = {name.lower(): value for name, value in response.headers.items()}
+        self.cache.put(SOURCE, letter, response.body, etag=headers.get('etag'), last_modified=headers.get('last-modified'))
+        return True
+
+    def refresh(self):
+        """Refresh every letter page and return the letters whose content changed."""
+        # Letters finished by an interrupted run are not requested again
+        changed = self.engine.map(self.refresh_page, self.letters, checkpoint=self.checkpoint)
+        self.checkpoint.clear()
+        return [letter for letter, was_changed in zip(self.letters, changed) if was_changed]
+
+    def airports(self):
+        """Return IATA, ICAO, Airport Name, City and State of every U.S. airport in the cached pages."""
+        rows = []
+        for letter in self.letters:
+            cached = self.cache.get(SOURCE, letter)
+            if cached is not None:
+                rows += parse_airport_rows(cached[0].decode('utf-8'))
+        frame = pd.DataFrame(rows, columns=['IATA', 'ICAO', 'Airport Name', 'Location'])
+
+        # "Location served" reads e.g. "Anchorage, Alaska, United States"
+        parts = frame['Location'].str.rsplit(', ', n=2, expand=True).reindex(columns=[0, 1, 2])
+        us = parts[2] == 'United States'
+        frame = frame[us].assign(City=parts.loc[us, 0], State=parts.loc[us, 1])
+        return frame.drop(columns='Location').drop_duplicates(subset=['IATA', 'City', 'State']).reset_index(drop=True)
+
+
+class _TableParser(html.parser.HTMLParser):
+    # Collect the text of every cell, row by row, for tables with the "wikitable" class
+
+    def __init__(self):
+        super().__init__()
+        self.rows = []
+        self._depth = 0
+        self._row = None
+        self._cell = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'table':
+            if self._depth or 'wikitable' in (dict(attrs).get('class') or ''):
+                self._depth += 1
+        elif self._depth == 1 and tag == 'tr':
+            self._row = []
+        elif self._depth == 1 and tag in ('td', 'th') and self._row is not None:
+            self._cell = []
+
+    def handle_endtag(self, tag):
+        if tag == 'table' and self._depth:
+            self._depth -= 1
+        elif self._depth == 1 and tag in ('td', 'th') and self._cell is not None:
+            self._row.append(FOOTNOTE.sub('', ''.join(self._cell)).strip())
+            self._cell = None
+        elif self._depth == 1 and tag == 'tr' and self._row is not None:
+            self.rows.append(self._row)
+            self._row = None
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell.append(data)
+
+
+def parse_airport_rows(page_html):
+    """Return [IATA, ICAO, airport name, location served] for every airport row of a letter page."""
+    parser = _TableParser()
+    parser.feed(page_html)
+    # Header rows and the "-AA-" section separators do not have a three-letter code in the first cell
+    return [row[:4] for row in parser.rows if len(row) >= 4 and re.fullmatch(r'[A-Z0-9]{3}', row[0])]
@@ -0,0 +1,57 @@
+"""Prebuilt lookup index behind the Specific Search tab.
+
+The tab answers two questions on every widget interaction: which cities does
+a state have, and what are the metrics of one state or (City, State). The
+index answers both from plain dicts of tuples built once per dataset
+version, so a selectbox change is a hash lookup with no pandas work.
+"""
+import collections
+
+# Metrics shown for a state or a city, in the order the tab lists them
+Metrics = collections.namedtuple('Metrics', ['events', 'population', 'median_income', 'airports'])
+
+METRIC_LABELS = ['Total Number of Events', 'Population', 'Median Household Income', 'Number of Airports']
+
+
+def _records(frame, columns):
+    # Plain Python values, so neither lookups nor the table built from them touch numpy scalars
+    return [Metrics(*row) for row in zip(*(frame[column].tolist() for column in columns))]
+
+
+class SearchIndex:
+    """State -> sorted cities and state / (City, State) -> `Metrics` lookups.
+
+    Built from the state and city summary tables of `event_analysis.aggregates`.
+    """
+
+    def __init__(self, state_summary, city_summary):
+        states = [str(state) for state in state_summary['State'].tolist()]
+        self.states = tuple(states)
+        self._state_metrics = dict(zip(states, _records(
+            state_summary, ['Number of Events', 'Population_state', 'Median Household Income_state',
+                            'Number of Airports'])))
+
+        keys = list(zip(map(str, city_summary['City'].tolist()), map(str, city_summary['State'].tolist())))
+        self._city_metrics = dict(zip(keys, _records(
+            city_summary, ['Number of Events', 'Population_city', 'Median Household Income_city',
+                           'Number of Airports'])))
+
+        cities = collections.defaultdict(list)
+        for city, state in keys:
+            cities[state].append(city)
+        self._cities = {state: tuple(sorted(names)) for state, names in cities.items()}
+
+    def __len__(self):
+        return len(self._city_metrics)
+
+    def cities(self, state):
+        """Return the sorted city names of `state` (empty when the state is unknown)."""
+        return self._cities.get(state, ())
+
+    def state(self, state):
+        """Return the `Metrics` of `state`, or None when it is not in the dataset."""
+        return self._state_metrics.get(state)
+
+    def city(self, city, state):
+        """Return the `Metrics` of (`city`, `state`), or None when it is not in the dataset."""
+        return self._city_metrics.get((city, state))
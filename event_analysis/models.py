@@ -0,0 +1,385 @@
+"""Model options for the relationship charts: transforms, robust errors, Huber and count models.
+
+Events per city are heavy-tailed: a handful of cities such as Las Vegas hold
+most of the events, so they dominate a plain OLS fit on raw counts. The
+model-options panel of pages 2 and 3 (`sections.model_options`) fits the same
+relationships with `ModelOptions`:
+
+- transform: 'none', 'log' (rows with a value <= 0 are left out) or 'log1p'.
+  It applies to both axes of the linear fits. The count models keep the raw
+  event counts, because their log link already works on the log scale, so
+  only the predictor is transformed;
+- estimator:
+  - 'ols';
+  - 'huber': Huber M-estimation by IRLS, with the t=1.345 tuning constant
+    and a MAD scale, like statsmodels' `RLM`;
+  - 'poisson': Poisson GLM with a log link;
+  - 'negbin': negative binomial (NB2) GLM with a log link. Its dispersion
+    alpha is the Cameron-Trivedi moment estimate from the Poisson fit, held
+    fixed;
+- errors: 'classical' or 'hc3', heteroskedasticity-robust sandwich errors
+  with leverage correction. The Huber fit always reports Huber's H1
+  covariance, which already accounts for the downweighted rows.
+
+Every model has one predictor, like the charts, so the estimators below are
+closed-form weighted fits vectorized over all the predictors of a level, in
+the manner of `regression.batch_ols`. The predictor and response arrays of a
+(level, period) come from `design`, and their transforms from `matrices`. Both
+are cached for the dataset version, and so are the fits per `ModelOptions`.
+Toggling an option therefore never goes back to the summary frame, and a
+city-level fit takes milliseconds (see `python benchmarks/bench_models.py`).
+The default options are the OLS fits of `regression.get_fit`, so the default
+view is unchanged.
+"""
+import collections
+
+import numpy as np
+from scipy import stats
+
+from event_analysis import data_loader, regression, shared_store
+
+TRANSFORMS = ('none', 'log', 'log1p')
+ESTIMATORS = ('ols', 'huber', 'poisson', 'negbin')
+ERRORS = ('classical', 'hc3')
+COUNT_ESTIMATORS = ('poisson', 'negbin')
+
+# Names of the options in the model-options panel and the chart titles
+TRANSFORM_NAMES = {'none': 'None', 'log': 'log', 'log1p': 'log(1 + x)'}
+ESTIMATOR_NAMES = {'ols': 'OLS', 'huber': 'Huber robust regression', 'poisson': 'Poisson regression',
+                   'negbin': 'Negative binomial regression'}
+ERROR_NAMES = {'classical': 'Classical', 'hc3': 'HC3 robust'}
+TREND_NAMES = {'ols': 'OLS trendline', 'huber': 'Huber trendline', 'poisson': 'Poisson trend',
+               'negbin': 'Negative binomial trend'}
+
+ModelOptions = collections.namedtuple('ModelOptions', ['transform', 'estimator', 'errors'],
+                                      defaults=('none', 'ols', 'classical'))
+DEFAULT = ModelOptions()
+
+# Fields of `regression.OLSFit`, plus the negative binomial dispersion (NaN for the other models).
+# r_squared is the deviance pseudo R² of the count models.
+ModelFit = collections.namedtuple('ModelFit', regression.OLSFit._fields + ('alpha',))
+
+Design = collections.namedtuple('Design', ['predictors', 'x', 'y'])
+
+HUBER_T = 1.345
+# Consistency constant of the MAD scale for normal residuals (statsmodels' `robust.scale.mad`)
+MAD_CONSTANT = stats.norm.ppf(0.75)
+MAX_ITERATIONS = 100
+MAX_ETA = 50.0
+# Convergence of the GLM fits (relative change of the deviance) and of the Huber fit (statsmodels' RLM default)
+TOLERANCE = 1e-10
+HUBER_TOLERANCE = 1e-8
+
+
+def transform(values, name):
+    """Return `values` under transform `name` of `TRANSFORMS`; values outside its domain become NaN."""
+    values = np.asarray(values, dtype=float)
+    if name == 'none':
+        return values
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if name == 'log':
+            return np.where(values > 0, np.log(values), np.nan)
+        if name == 'log1p':
+            return np.where(values > -1, np.log1p(values), np.nan)
+    raise ValueError(f'Unknown transform {name!r}; expected one of {TRANSFORMS}')
+
+
+# The estimators below work on (predictor, row) arrays, so that every sum runs over contiguous memory,
+# and keep per-predictor statistics as (predictor, 1) columns that broadcast against them.
+# Rows a predictor's fit leaves out have a weight or mask of 0 and finite placeholder values.
+
+
+def _sum(values):
+    return values.sum(axis=1, keepdims=True)
+
+
+def _wls(x, y, w):
+    # Weighted fit of y ~ const + x per predictor, around the weighted mean of x
+    sw = _sum(w)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        x_mean = _sum(w * x) / sw
+        y_mean = _sum(w * y) / sw
+        dx = (x - x_mean) * (w > 0)
+        sxx = _sum(w * dx * dx)
+        slope = _sum(w * dx * y) / sxx
+    return y_mean - slope * x_mean, slope, sw, x_mean, dx, sxx
+
+
+def _hc3(w, residuals, sw, x_mean, dx, sxx):
+    # Sandwich standard errors with HC3 leverage correction; `residuals` are the working residuals
+    with np.errstate(invalid='ignore', divide='ignore'):
+        leverage = w * (1.0 / sw + dx * dx / sxx)
+        u = (w * residuals) ** 2 / (1.0 - leverage) ** 2 * (w > 0)
+        var_centered = _sum(u) / sw ** 2
+        covariance = _sum(u * dx) / (sw * sxx)
+        var_slope = _sum(u * dx * dx) / sxx ** 2
+        var_intercept = var_centered - 2 * x_mean * covariance + x_mean ** 2 * var_slope
+    return np.sqrt(var_slope), np.sqrt(var_intercept)
+
+
+def _unscaled(sw, x_mean, sxx, scale=1.0):
+    # Standard errors from scale * (X'WX)^-1
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.sqrt(scale / sxx), np.sqrt(scale * (1.0 / sw + x_mean ** 2 / sxx))
+
+
+def _mad(residuals, valid, n):
+    # Median absolute residual of each predictor's rows, from the order statistics the medians need
+    ordered = np.where(valid, np.abs(residuals), np.inf)
+    lower, upper = np.maximum((n - 1) // 2, 0), np.minimum(n // 2, ordered.shape[1] - 1)
+    ordered.partition(np.unique(np.concatenate([lower, upper]).ravel()), axis=1)
+    median = (np.take_along_axis(ordered, lower, 1) + np.take_along_axis(ordered, upper, 1)) / 2
+    return np.where(n > 0, median, np.nan) / MAD_CONSTANT
+
+
+def _ols(x, y, valid, errors):
+    w = valid.astype(float)
+    intercept, slope, sw, x_mean, dx, sxx = _wls(x, y, w)
+    residuals = (y - intercept - slope * x) * w
+    with np.errstate(invalid='ignore', divide='ignore'):
+        sst = _sum(((y - _sum(y * w) / sw) * w) ** 2)
+        sse = _sum(residuals ** 2)
+        if errors == 'hc3':
+            slope_se, intercept_se = _hc3(w, residuals, sw, x_mean, dx, sxx)
+            # Robust errors are tested against the normal distribution, as statsmodels does
+            p_value = 2.0 * stats.norm.sf(np.abs(slope / slope_se))
+        else:
+            slope_se, intercept_se = _unscaled(sw, x_mean, sxx, sse / (sw - 2))
+            p_value = 2.0 * stats.t.sf(np.abs(slope / slope_se), sw - 2)
+    return {'slope': slope, 'intercept': intercept, 'slope_se': slope_se, 'intercept_se': intercept_se,
+            'r_squared': 1.0 - sse / sst, 'p_value': p_value}
+
+
+def _huber(x, y, valid):
+    n = _sum(valid)
+    mask = valid.astype(float)
+    intercept, slope = _wls(x, y, mask)[:2]
+    residuals = y - intercept - slope * x
+    scale = _mad(residuals, valid, n)
+    previous = np.inf
+    for _ in range(MAX_ITERATIONS):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            w = np.minimum(1.0, HUBER_T * scale / np.abs(residuals)) * mask
+        intercept, slope = _wls(x, y, w)[:2]
+        residuals = y - intercept - slope * x
+        scale = _mad(residuals, valid, n)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            u = np.minimum(np.abs(residuals / scale), 1e300)
+        rho = np.where(u <= HUBER_T, 0.5 * u * u, HUBER_T * u - 0.5 * HUBER_T ** 2)
+        deviance = _sum(rho * mask)
+        # statsmodels' RLM criterion: the change of the objective
+        if not (np.abs(deviance - previous) > HUBER_TOLERANCE).any():
+            break
+        previous = deviance
+
+    # Huber's H1 covariance: k^2 * (sum psi^2 / (n - 2)) * scale^2 / mean(psi')^2 * (X'X)^-1
+    with np.errstate(invalid='ignore', divide='ignore'):
+        standardized = residuals / scale
+        psi = np.clip(standardized, -HUBER_T, HUBER_T) * mask
+        psi_deriv = (np.abs(standardized) <= HUBER_T) * mask
+        m = _sum(psi_deriv) / n
+        var_psi_deriv = _sum(((psi_deriv - m) * mask) ** 2) / n
+        k = 1 + 2 / n * var_psi_deriv / m ** 2
+        factor = k ** 2 * _sum(psi ** 2) / (n - 2) * scale ** 2 / m ** 2
+        _, _, sw, x_mean, _, sxx = _wls(x, y, mask)
+        slope_se, intercept_se = _unscaled(sw, x_mean, sxx, factor)
+        sst = _sum(((y - _sum(y * mask) / n) * mask) ** 2)
+        r_squared = 1.0 - _sum((residuals * mask) ** 2) / sst
+    return {'slope': slope, 'intercept': intercept, 'slope_se': slope_se, 'intercept_se': intercept_se,
+            'r_squared': r_squared, 'p_value': 2.0 * stats.norm.sf(np.abs(slope / slope_se))}
+
+
+def _variance(mu, alpha):
+    # Variance function of the Poisson (alpha = 0) and NB2 families
+    return mu + alpha * mu * mu
+
+
+def _deviance(y, mu, alpha, mask):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ratio = np.where(y > 0, y * np.log(y / mu), 0.0)
+        if not alpha.any():
+            unit = ratio - (y - mu)
+        else:
+            unit = ratio - (y + 1 / alpha) * np.log((1 + alpha * y) / (1 + alpha * mu))
+    return 2.0 * _sum(unit * mask)
+
+
+def _means(x, mask, intercept, slope):
+    # Fitted means of a log-link model; the linear predictor is bounded so raw-scale predictors cannot overflow,
+    # and rows outside a predictor's fit get a mean of 1
+    eta = np.clip(intercept + slope * x, -MAX_ETA, MAX_ETA) * mask
+    return eta, np.exp(eta)
+
+
+def _irls(x, y, mask, alpha, mu):
+    # Log-link GLM by Newton-Raphson from the fitted means `mu`, as reweighted least squares with the weights of
+    # the observed information (the expected ones of Fisher scoring only converge linearly for NB2)
+    eta = np.log(mu)
+    previous, params = np.inf, None
+    for _ in range(MAX_ITERATIONS):
+        w = mu * (1 + alpha * y) / (1 + alpha * mu) ** 2 * mask
+        intercept, slope = _wls(x, eta + (y - mu) / ((1 + alpha * mu) * np.where(mask > 0, w, 1.0)), w)[:2]
+        eta, mu = _means(x, mask, intercept, slope)
+        deviance = _deviance(y, mu, alpha, mask)
+        # Halve the step of the predictors whose deviance went up, as a Newton step can overshoot from far away
+        for _ in range(30 if params is not None else 0):
+            worse = deviance > previous + TOLERANCE * (1 + np.abs(previous))
+            if not worse.any():
+                break
+            intercept = np.where(worse, (intercept + params[0]) / 2, intercept)
+            slope = np.where(worse, (slope + params[1]) / 2, slope)
+            eta, mu = _means(x, mask, intercept, slope)
+            deviance = _deviance(y, mu, alpha, mask)
+        if not (np.abs(deviance - previous) > TOLERANCE * (1 + np.abs(deviance))).any():
+            break
+        previous, params = deviance, (intercept, slope)
+    # The standard errors use the expected information, like statsmodels' GLM
+    w = mu * mu / _variance(mu, alpha) * mask
+    return (intercept, slope) + _wls(x, eta, w)[2:], w, mu, deviance
+
+
+def _count(x, y, valid, estimator, errors):
+    mask = valid.astype(float)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        y_mean = _sum(y * mask) / _sum(mask)
+    # Start from the mean of each row and the predictor's mean (statsmodels' starting values)
+    start = np.where(valid, (y + y_mean) / 2, 1.0)
+    alpha = np.zeros((x.shape[0], 1))
+    fit, w, mu, deviance = _irls(x, y, mask, alpha, start)
+    if estimator == 'negbin':
+        # Moment estimate: regress ((y - mu)^2 - y) / mu on mu without a constant
+        with np.errstate(invalid='ignore', divide='ignore'):
+            alpha = _sum(((y - mu) ** 2 - y) * mask) / _sum(mu * mu * mask)
+        alpha = np.maximum(np.nan_to_num(alpha), 1e-8)
+        fit, w, mu, deviance = _irls(x, y, mask, alpha, mu)
+
+    intercept, slope, sw, x_mean, dx, sxx = fit
+    if errors == 'hc3':
+        slope_se, intercept_se = _hc3(w, (y - mu) / mu, sw, x_mean, dx, sxx)
+    else:
+        slope_se, intercept_se = _unscaled(sw, x_mean, sxx)
+    null = _deviance(y, np.where(valid, y_mean, 1.0), alpha, mask)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        r_squared = 1.0 - deviance / null
+    result = {'slope': slope, 'intercept': intercept, 'slope_se': slope_se, 'intercept_se': intercept_se,
+              'r_squared': r_squared, 'p_value': 2.0 * stats.norm.sf(np.abs(slope / slope_se))}
+    if estimator == 'negbin':
+        result['alpha'] = alpha
+    return result
+
+
+def fit_arrays(x, y, options=DEFAULT):
+    """Fit `y ~ x[:, j]` for every column j of `x` with `options` (already transformed); return a dict of length-k arrays.
+
+    The keys are the fields of `ModelFit`. Rows where either side is not
+    finite are left out of that column's fit. Degenerate columns (constant x
+    or fewer than 3 rows) get NaN.
+    """
+    x = np.array(np.asarray(x, dtype=float).T, order='C')
+    y = np.broadcast_to(np.asarray(y, dtype=float), x.shape)
+    valid = np.isfinite(x) & np.isfinite(y)
+    if options.estimator in COUNT_ESTIMATORS:
+        valid &= y >= 0
+    x, y = np.where(valid, x, 0.0), np.where(valid, y, 0.0)
+
+    if options.estimator == 'ols':
+        result = _ols(x, y, valid, options.errors)
+    elif options.estimator == 'huber':
+        result = _huber(x, y, valid)
+    elif options.estimator in COUNT_ESTIMATORS:
+        result = _count(x, y, valid, options.estimator, options.errors)
+    else:
+        raise ValueError(f'Unknown estimator {options.estimator!r}; expected one of {ESTIMATORS}')
+
+    n = valid.sum(axis=1)
+    degenerate = (n < 3) | ~(_wls(x, y, valid.astype(float))[5].ravel() > 0)
+    result = {name: np.where(degenerate, np.nan, result[name].ravel()) if name in result else np.full(len(n), np.nan)
+              for name in ModelFit._fields if name != 'n'}
+    result['n'] = n
+    return result
+
+
+def _design(level, period):
+    frame = data_loader.load_period_summary(regression.LEVEL_TABLES[level], period)
+    predictors = regression.available_predictors(level, frame)
+    return Design(predictors, frame[predictors].to_numpy(dtype=float), frame[regression.RESPONSE].to_numpy(dtype=float))
+
+
+def design(level, period=None):
+    """Return the `Design` (predictors, raw predictor matrix, raw event counts) of 'state' or 'city' level."""
+    return shared_store.shared_result('model_design', _design, level, period)
+
+
+def _matrices(level, name, count_model, period):
+    plain = design(level, period)
+    return transform(plain.x, name), plain.y if count_model else transform(plain.y, name)
+
+
+def matrices(level, options=DEFAULT, period=None):
+    """Return the (x, y) arrays of a level under the transform of `options`, computed once per transform."""
+    count_model = options.estimator in COUNT_ESTIMATORS
+    return shared_store.shared_result('model_matrices', _matrices, level, options.transform, count_model, period)
+
+
+def _fits(level, options, period):
+    x, y = matrices(level, options, period)
+    batch = fit_arrays(x, y, options)
+    return {predictor: ModelFit(**{name: (int if name == 'n' else float)(batch[name][j]) for name in ModelFit._fields})
+            for j, predictor in enumerate(design(level, period).predictors)}
+
+
+def get_fits(level, options=DEFAULT, period=None):
+    """Return {predictor: ModelFit} of every available predictor of the level, fitted once per dataset version and options."""
+    return shared_store.shared_result('model_fits', _fits, level, options, period)
+
+
+def get_fit(level, predictor, options=DEFAULT, period=None):
+    """Return the fit of the events on `predictor` with `options`; the default options give `regression.get_fit`."""
+    if options == DEFAULT:
+        return regression.get_fit(level, predictor, period=period)
+    return get_fits(level, options, period)[predictor]
+
+
+def is_count_model(options):
+    """Return True when `options` fit a log-link count model, whose trend is exp(intercept + slope * x)."""
+    return options.estimator in COUNT_ESTIMATORS
+
+
+def axis_label(label, options, response=False):
+    """Return the axis label of a column once the transform of `options` is applied to it."""
+    if options.transform == 'none' or (response and is_count_model(options)):
+        return label
+    return f'{options.transform}({label})'
+
+
+def trend_name(options):
+    """Return the name of the trend line of `options` in the charts."""
+    return TREND_NAMES[options.estimator]
+
+
+def short_name(options):
+    """Return a few words naming the model, for chart titles."""
+    parts = [ESTIMATOR_NAMES[options.estimator]]
+    if options.transform != 'none':
+        parts.append(options.transform)
+    if options.errors == 'hc3' and options.estimator != 'huber':
+        parts.append('HC3')
+    return ', '.join(parts)
+
+
+def describe(options, fit=None):
+    """Return a one-line description of the model behind the statistics, for the pages."""
+    parts = [ESTIMATOR_NAMES[options.estimator]]
+    if options.transform != 'none':
+        parts.append(f'{options.transform} of the predictor' + ('' if is_count_model(options) else ' and of the events'))
+    if options.estimator == 'huber':
+        parts.append('Huber (H1) standard errors')
+    else:
+        parts.append(('HC3 robust' if options.errors == 'hc3' else 'classical') + ' standard errors')
+    if is_count_model(options):
+        parts.append('R² is the deviance pseudo R²; the slope is the change in log events per unit of the predictor')
+    if fit is not None and options.estimator == 'negbin':
+        parts.append(f'dispersion alpha = {fit.alpha:.4g}')
+    if fit is not None:
+        parts.append(f'{fit.n:,} points')
+    return 'Model: ' + '; '.join(parts)
@@ -0,0 +1,239 @@
+"""Figures of the State-level and City-level Analysis pages, built without Streamlit.
+
+The builders used to live in the page scripts, where only a page run could
+call them. Here they are importable by `event_analysis.warmup` too, which
+builds every figure ahead of time in worker processes and publishes them
+under the same `figure_cache` keys the pages look up with `page_figure`.
+
+Every figure takes a `period` parameter: a (first day, last day) pair of ISO
+dates to count only the events of that range, or None for all events (the
+default view). The relationship scatters also take the `models.ModelOptions`
+of the model-options panel after it. The maps also take the state they are zoomed to, and are
+drawn from the geometry cache of `event_analysis.geo` (see `page_map`).
+"""
+import functools
+
+import numpy as np
+import plotly.express as px
+
+from event_analysis import analytics, charts, data_loader, figure_cache, geo, models, regression, shared_store, spatial
+
+# City ranking window shown before the user searches or pages: (search query, page, cities per page, period)
+CITY_EVENTS_DEFAULT = ('', 1, 25, None)
+
+# Scatter plot of each relationship section: (level, predictor, axis label, title)
+SCATTERS = {
+    'state_population': ('state', 'Population_state', 'State Population',
+                         'Relationship between State Population and Number of Music Events'),
+    'state_income': ('state', 'Median Household Income_state', 'Median Household Income',
+                     'Relationship between Median Household Income and Number of Music Events per State'),
+    'state_airports': ('state', 'Number of Airports', 'Number of Airports',
+                       'Relationship between Number of Airports and Number of Music Events per State'),
+    'city_population': ('city', 'Population_city', 'City Population',
+                        'Relationship between City Population and Number of Music Events'),
+    'city_income': ('city', 'Median Household Income_city', 'Median Household Income',
+                    'Relationship between Median Household Income and Number of Music Events per City'),
+    'city_airports': ('city', 'Number of Airports', 'Number of Airports',
+                      'Relationship between Number of Airports and Number of Music Events per City'),
+    # Only shown when the dataset has venue and airport coordinates (see `scatter_available`)
+    'city_airports_nearby': ('city', spatial.NEARBY, spatial.NEARBY,
+                             f'Relationship between {spatial.NEARBY} and Number of Music Events per City'),
+    'city_airport_distance': ('city', spatial.NEAREST, 'Distance to Nearest Airport (km)',
+                              'Relationship between Distance to the Nearest Airport and Number of Music Events per City'),
+}
+
+
+def _title(title, period):
+    # Name the date range in the title when the events are filtered
+    return title if period is None else f'{title} ({period[0]} to {period[1]})'
+
+
+def state_events(period=None):
+    """Return the horizontal bar chart of the number of events per state."""
+    # Number of unique events per state, sorted in descending order to display the states with the most events at the top
+    unique_events_per_state_sorted = analytics.events_per_state(data_loader.load_period_summary('state_summary', period))
+
+    # Create an interactive horizontal bar chart
+    fig = px.bar(unique_events_per_state_sorted, orientation='h',
+                 labels={'value': 'Number of Events', 'index': 'State'},
+                 title=_title('Number of Music Events per State', period),
+                 color_discrete_sequence=['lightcoral'])
+
+    # Update the layout to improve the visual presentation
+    fig.update_layout(
+        xaxis_title='Number of Events',
+        yaxis_title='State',
+        height=800,
+        width=800,
+        margin=dict(l=0, r=0, t=50, b=0),  # Adjust chart margins
+        yaxis={'categoryorder': 'total ascending', 'tickangle': 0},
+        showlegend=False
+    )
+    return fig
+
+
+def _city_ranking(query, period):
+    return analytics.events_per_city(data_loader.load_period_summary('city_summary', period), query)
+
+
+def city_ranking(query='', period=None):
+    """Return the cities matching `query` ranked by number of events, shared by all sessions."""
+    # Number of unique events in each city and state with a 'City, State' label for the Y-axis,
+    # sorted in descending order and keeping only the cities matching the search
+    return shared_store.shared_result('city_ranking', _city_ranking, query, period)
+
+
+def city_events(query, page, page_size, period=None):
+    """Return the bar chart of one page of the city ranking, with the remaining cities summed into one bar."""
+    # Keep only the cities of the selected page, with the remaining cities summed into one "Others" bar
+    window, rest = analytics.ranking_window(city_ranking(query, period), 'Number of Events', 'City_State', page, page_size,
+                                            others_label='Others ({count} cities)')
+
+    # Create an interactive horizontal bar chart
+    return charts.ranked_bar(window, 'Number of Events', 'City_State',
+                             labels={'Number of Events': 'Number of Events', 'City_State': 'City, State'},
+                             title=_title('Number of Music Events per City', period),
+                             has_others=rest > 0)
+
+
+def scatter_available(chart_id):
+    """Return True when the summary behind relationship section `chart_id` has its predictor column."""
+    level, predictor = SCATTERS[chart_id][:2]
+    return predictor in data_loader.load_period_summary(regression.LEVEL_TABLES[level]).columns
+
+
+def relationship(chart_id, period=None, options=models.DEFAULT):
+    """Return the scatter plot with its regression line of relationship section `chart_id` (see `SCATTERS`).
+
+    With `options` other than the default OLS, the points are drawn on the
+    scale the model is fitted on, with that model's trend.
+    """
+    level, predictor, label, title = SCATTERS[chart_id]
+    summary = data_loader.load_period_summary(regression.LEVEL_TABLES[level], period)
+
+    # Take the number of unique events and the predictor of each state or (City, State) from the summary
+    merged_data = analytics.predictor_table(summary, level, predictor)
+
+    # Reuse the fit cached for this dataset version and model options instead of refitting on every rerun
+    fit = models.get_fit(level, predictor, options, period)
+
+    if options != models.DEFAULT:
+        # Plot the values the model was fitted on, leaving out the points the transform is undefined for
+        merged_data = merged_data.assign(**{predictor: models.transform(merged_data[predictor], options.transform)})
+        if not models.is_count_model(options):
+            merged_data['Number of Events'] = models.transform(merged_data['Number of Events'], options.transform)
+        merged_data = merged_data.dropna(subset=[predictor, 'Number of Events'])
+        title = f'{title} ({models.short_name(options)})'
+
+    # Create a scatter plot with the regression line drawn from the fitted coefficients
+    labels = {predictor: models.axis_label(label, options),
+              'Number of Events': models.axis_label('Number of Music Events', options, response=True)}
+    fig = charts.regression_scatter(merged_data, x=predictor, fit=fit, labels=labels, title=_title(title, period),
+                                    log_link=models.is_count_model(options), name=models.trend_name(options))
+
+    # Update plot aesthetics
+    fig.update_traces(marker=dict(color='lightcoral'), selector=dict(mode='markers'))
+    fig.update_traces(line=dict(color='lightcoral'), selector=dict(type='scatter', mode='lines'))
+    return fig
+
+
+def _map_view(geometry, focus):
+    # Bounds of the whole layout or of one state (with a margin), the states drawn and their level of detail
+    bounds = geometry.bounds(None if focus is None else [focus])
+    margin = 0.05 * max(bounds[2] - bounds[0], bounds[3] - bounds[1])
+    bounds = (bounds[0] - margin, bounds[1] - margin, bounds[2] + margin, bounds[3] + margin)
+    return bounds, geometry.states_in(bounds), geometry.level_for(bounds)
+
+
+def _map_title(title, focus, period):
+    return _title(title if focus is None else f'{title}: {focus}', period)
+
+
+def state_map(geometry_version, focus=None, period=None):
+    """Return the choropleth of the number of events per state, zoomed to state `focus` (None for all).
+
+    `geometry_version` (see `geo.Geometry.version`) only keys the caches.
+    """
+    geometry = geo.load_geometry()
+    bounds, states, level = _map_view(geometry, focus)
+    summary = data_loader.load_period_summary('state_summary', period).set_index('State').reindex(states)
+    outlines = [geometry.outline(state, level) for state in states]
+
+    # Hover text and a hover point (the mean of the outline's points) per state
+    points = [np.nanmean(outline, axis=0) for outline in outlines]
+    hover = [f'<b>{state}</b><br>Number of Events: {row["Number of Events"]:,.0f}<br>'
+             f'Number of Airports: {row["Number of Airports"]:,.0f}'
+             for state, row in summary.fillna(0).iterrows()]
+    return charts.outline_choropleth(outlines, points, summary['Number of Events'].fillna(0), hover,
+                                     _map_title('Map of Music Events per State', focus, period), bounds,
+                                     colorbar_title='Number of Events')
+
+
+def _city_points(geometry_version, period):
+    # Every city with events in the period and its layout coordinates (NaN when no Census place matches)
+    summary = data_loader.load_period_summary('city_summary', period)
+    summary = summary[summary['Number of Events'] > 0]
+    x, y = geo.load_geometry().locate(summary[['City', 'State']])
+    return summary.assign(x=x, y=y)
+
+
+def city_map(geometry_version, focus=None, period=None):
+    """Return the bubble map of the number of events per city, zoomed to state `focus` (None for all)."""
+    geometry = geo.load_geometry()
+    bounds, states, level = _map_view(geometry, focus)
+    cities = shared_store.shared_result('city_points', _city_points, geometry_version, period)
+    if focus is not None:
+        cities = cities[cities['State'] == focus]
+    located = cities[cities['x'].notna()]
+    outlines = np.concatenate([geometry.outline(state, level) for state in states]) if states else np.empty((0, 2))
+
+    hover = ('<b>' + located['City'].astype(str) + ', ' + located['State'].astype(str) + '</b><br>Number of Events: '
+             + located['Number of Events'].map('{:,}'.format) + '<br>Number of Airports: '
+             + located['Number of Airports'].map('{:,}'.format))
+    missing = len(cities) - len(located)
+    return charts.bubble_map(outlines, located['x'], located['y'], located['Number of Events'], hover,
+                             _map_title('Map of Music Events per City', focus, period), bounds,
+                             note=f'{missing:,} of {len(cities):,} cities have no coordinates and are not shown'
+                             if missing else None)
+
+
+# Map figures, built from the geometry cache (see `page_map`)
+MAPS = {'state_map': state_map, 'city_map': city_map}
+
+
+def build(chart_id, *params):
+    """Return the Plotly figure `chart_id` of the pages for `params`."""
+    if chart_id == 'state_events':
+        return state_events(*params)
+    if chart_id == 'city_events':
+        return city_events(*params)
+    if chart_id in MAPS:
+        return MAPS[chart_id](*params)
+    return relationship(chart_id, *params)
+
+
+# Every figure the pages can show on first view, with its parameters
+DEFAULT_FIGURES = ([('state_events', (None,)), ('city_events', CITY_EVENTS_DEFAULT)]
+                   + [(chart_id, (None, models.DEFAULT)) for chart_id in SCATTERS])
+
+
+def default_figures():
+    """Return the `DEFAULT_FIGURES` the current dataset has the data for."""
+    return [(chart_id, params) for chart_id, params in DEFAULT_FIGURES
+            if chart_id not in SCATTERS or scatter_available(chart_id)]
+
+
+def page_figure(chart_id, *params):
+    """Return figure `chart_id` as a dict, cached for the current dataset version."""
+    return figure_cache.cached_figure(chart_id, functools.partial(build, chart_id), *params)
+
+
+def page_map(chart_id, focus=None, period=None):
+    """Return map `chart_id` ('state_map' or 'city_map') as a dict, or None while the geometry cache is not built.
+
+    The version of the geometry file is part of the cache key, so rebuilding it redraws the maps.
+    """
+    geometry = geo.load_geometry()
+    if geometry is None:
+        return None
+    return page_figure(chart_id, geometry.version, focus, period)
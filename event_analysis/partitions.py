@@ -0,0 +1,178 @@
+"""Daily event counts per city, stored as month partitions, for date-range queries.
+
+Every count on the pages used to be all-time, and refreshing the data meant
+recomputing everything. With event dates in the dataset, `daily_counts`
+reduces the events to one row per (day, city) and `write_partitions`
+stores those rows as one Feather file per month under
+`data_snapshot/partitions/`, next to a manifest holding each month's
+fingerprint. A snapshot rebuild rewrites only the months whose counts
+changed, so a new day of events costs one partition, not the whole history.
+
+`Partitions` holds the months in date order; a range query sums the daily
+counts of the days in range (one binary search into the sorted days, then a
+bincount per city), so it never rescans the raw events. An event has one
+date and one city, so the daily counts add up to distinct event counts per
+city and per state for any range.
+"""
+import datetime
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from event_analysis.schema import city_keys
+
+DATE_COLUMN = 'Event Date'
+RESPONSE = 'Number of Events'
+COLUMNS = [DATE_COLUMN, 'City', 'State', RESPONSE]
+
+PARTITION_DIR = 'partitions'
+MANIFEST_FILE = 'partitions.json'
+
+
+def daily_counts(tables):
+    """Return the number of events per (Event Date, City, State), or None when the events have no dates."""
+    events = tables['events']
+    if DATE_COLUMN not in events.columns:
+        return None
+    dated = events[[DATE_COLUMN, 'city_id']].dropna(subset=[DATE_COLUMN])
+    counts = dated.groupby([DATE_COLUMN, 'city_id']).size().rename(RESPONSE).reset_index()
+    counts = counts.merge(city_keys(tables)[['city_id', 'City', 'State']], on='city_id')
+    return sort_counts(counts[COLUMNS])
+
+
+def sort_counts(counts):
+    """Return daily counts with the stored column types, sorted by date, then State and City."""
+    counts = counts.astype({DATE_COLUMN: 'datetime64[s]', 'City': str, 'State': str, RESPONSE: 'int64'})
+    return counts.sort_values([DATE_COLUMN, 'State', 'City'], kind='stable').reset_index(drop=True)
+
+
+def split_months(counts):
+    """Split daily counts into {'YYYY-MM': rows of that month} (None stays None)."""
+    if counts is None:
+        return None
+    dates = counts[DATE_COLUMN].dt
+    months = dates.year * 100 + dates.month
+    return {f'{month // 100:04d}-{month % 100:02d}': part.reset_index(drop=True)
+            for month, part in counts.groupby(months.to_numpy(), sort=True)}
+
+
+def fingerprint(part):
+    """Return a digest of one partition's rows, stable across runs."""
+    hashes = pd.util.hash_pandas_object(part[COLUMNS], index=False).to_numpy()
+    return hashlib.sha1(hashes.tobytes()).hexdigest()
+
+
+def _read_manifest(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST_FILE)) as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return None
+
+
+def write_partitions(counts, directory):
+    """Write the month partitions of `counts`, rewriting only months that changed; return a report dict.
+
+    The report lists the months `written`, `kept` (same fingerprint as on
+    disk) and `removed` (no longer in the data). With `counts` None (a
+    dataset without event dates) the directory is removed.
+    """
+    import pyarrow.feather as feather
+
+    if counts is None:
+        shutil.rmtree(directory, ignore_errors=True)
+        return {'written': [], 'kept': [], 'removed': []}
+
+    months = split_months(counts)
+    previous = (_read_manifest(directory) or {}).get('months', {})
+    os.makedirs(directory, exist_ok=True)
+    manifest, written, kept = {}, [], []
+    for month, part in months.items():
+        digest = fingerprint(part)
+        target = os.path.join(directory, month + '.feather')
+        if previous.get(month, {}).get('fingerprint') == digest and os.path.exists(target):
+            kept.append(month)
+        else:
+            # Write to a temporary name and rename so readers never see a half-written file
+            feather.write_feather(part, target + '.tmp', compression='uncompressed')
+            os.replace(target + '.tmp', target)
+            written.append(month)
+        manifest[month] = {'fingerprint': digest, 'rows': len(part), 'events': int(part[RESPONSE].sum())}
+
+    removed = sorted(set(previous) - set(months))
+    for month in removed:
+        try:
+            os.remove(os.path.join(directory, month + '.feather'))
+        except FileNotFoundError:
+            pass
+    with open(os.path.join(directory, MANIFEST_FILE + '.tmp'), 'w') as handle:
+        json.dump({'months': manifest}, handle, indent=2)
+    os.replace(os.path.join(directory, MANIFEST_FILE + '.tmp'), os.path.join(directory, MANIFEST_FILE))
+    return {'written': written, 'kept': kept, 'removed': removed}
+
+
+def read_partitions(directory):
+    """Memory-map every month partition listed in the manifest; return {month: rows}, or None when there are none."""
+    import pyarrow.feather as feather
+
+    manifest = _read_manifest(directory)
+    if not manifest or not manifest['months']:
+        return None
+    return {month: feather.read_table(os.path.join(directory, month + '.feather'), memory_map=True).to_pandas()
+            for month in sorted(manifest['months'])}
+
+
+class Partitions:
+    """Month partitions of daily event counts, answering per-city and per-state sums over date ranges."""
+
+    def __init__(self, months):
+        self.months = tuple(sorted(months))
+        # Months are in date order and each is sorted by date, so the days of the concatenation are sorted
+        counts = pd.concat([months[month] for month in self.months], ignore_index=True)
+        self._days = counts[DATE_COLUMN].to_numpy().astype('datetime64[D]')
+        self._counts = counts[RESPONSE].to_numpy()
+        self._codes, cities = pd.factorize(pd.MultiIndex.from_frame(counts[['City', 'State']]))
+        self._cities = cities.set_names(['City', 'State'])
+
+    @property
+    def first(self):
+        """The first day with events, as a `datetime.date`."""
+        return self._days[0].astype(datetime.date)
+
+    @property
+    def last(self):
+        """The last day with events, as a `datetime.date`."""
+        return self._days[-1].astype(datetime.date)
+
+    def city_counts(self, start, end):
+        """Return the number of events from `start` to `end` (inclusive ISO dates) per (City, State)."""
+        first = np.searchsorted(self._days, np.datetime64(start, 'D'), side='left')
+        last = np.searchsorted(self._days, np.datetime64(end, 'D'), side='right')
+        totals = np.bincount(self._codes[first:last], weights=self._counts[first:last], minlength=len(self._cities))
+        return pd.Series(totals.astype('int64'), index=self._cities, name=RESPONSE)
+
+    def summary(self, summary, start, end):
+        """Return a state or city summary with its event counts replaced by those from `start` to `end`.
+
+        Rows without events in the range get a count of 0; every other column is kept as is.
+        """
+        counts = self.city_counts(start, end)
+        keys = ['City', 'State'] if 'City' in summary.columns else ['State']
+        if keys == ['State']:
+            counts = counts.groupby(level='State').sum()
+        filtered = summary.drop(columns=RESPONSE).join(counts, on=keys)
+        filtered[RESPONSE] = filtered[RESPONSE].fillna(0).astype('int64')
+        return filtered[list(summary.columns)]
+
+
+def load(directory=None, tables=None):
+    """Return `Partitions` read from `directory` or, without one, built from the normalized `tables`.
+
+    Returns None when the dataset has no event dates.
+    """
+    months = read_partitions(directory) if directory is not None else split_months(daily_counts(tables))
+    return Partitions(months) if months else None
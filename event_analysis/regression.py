@@ -0,0 +1,213 @@
+"""Cached OLS fits behind the relationship charts.
+
+Each chart regresses the number of events on one predictor at state or city
+level. All predictors of a level are fitted together in one vectorized pass
+of closed-form sums (`batch_ols`), and the results only depend on the
+dataset version and the date range the events are counted over, so they are
+computed once per (dataset version, level, period) and reused by every rerun; the charts draw their trendline from the cached
+coefficients instead of letting Plotly fit the model again.
+
+`multiple_ols` fits events on several predictors at once and returns the
+same statistics statsmodels reports for that model.
+"""
+import collections
+import threading
+
+import numpy as np
+from scipy import stats
+
+from event_analysis import data_loader, shared_store, spatial
+
+RESPONSE = 'Number of Events'
+
+# Predictors offered at each level, in the order the pages show them; the airport proximity
+# predictors only exist when the dataset has venue and airport coordinates (see `available_predictors`)
+PREDICTORS = {
+    'state': ['Population_state', 'Median Household Income_state', 'Number of Airports'],
+    'city': ['Population_city', 'Median Household Income_city', 'Number of Airports'] + spatial.FEATURES,
+}
+
+# Summary table each level is fitted on (see `data_loader.load_period_summary`)
+LEVEL_TABLES = {'state': 'state_summary', 'city': 'city_summary'}
+
+OLSFit = collections.namedtuple(
+    'OLSFit', ['r_squared', 'slope', 'intercept', 'slope_se', 'intercept_se', 'p_value', 'n'])
+
+MultipleOLSFit = collections.namedtuple(
+    'MultipleOLSFit', ['params', 'bse', 'pvalues', 'r_squared', 'adj_r_squared', 'n'])
+
+_cache = {}
+_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+_flights = shared_store.SingleFlight()
+
+
+def batch_ols(x, y):
+    """Fit `y ~ const + x[:, j]` for every column j of `x` in one vectorized pass.
+
+    `x` is an (n, k) array of predictors and `y` an (n,) response or an
+    (n, k) array of per-column responses. Rows where either side is not
+    finite are left out of that column's fit, like statsmodels'
+    `missing='drop'`. Returns a dict of length-k arrays: slope, intercept,
+    slope_se, intercept_se, r_squared, p_value (two-sided t-test of the
+    slope) and n. Degenerate columns (constant x or fewer than 3 rows) get NaN.
+    """
+    x = np.asarray(x, dtype=float)
+    if x.ndim == 1:
+        x = x[:, None]
+    y = np.asarray(y, dtype=float)
+    y = np.broadcast_to(y[:, None] if y.ndim == 1 else y, x.shape)
+
+    valid = np.isfinite(x) & np.isfinite(y)
+    n = valid.sum(axis=0)
+    x = np.where(valid, x, 0.0)
+    y = np.where(valid, y, 0.0)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        x_mean = x.sum(axis=0) / n
+        y_mean = y.sum(axis=0) / n
+        # Centered sums keep the normal equations well conditioned for large-valued predictors
+        dx = np.where(valid, x - x_mean, 0.0)
+        dy = np.where(valid, y - y_mean, 0.0)
+        sxx = (dx * dx).sum(axis=0)
+        sxy = (dx * dy).sum(axis=0)
+        syy = (dy * dy).sum(axis=0)
+
+        slope = sxy / sxx
+        intercept = y_mean - slope * x_mean
+        sse = np.maximum(syy - slope * sxy, 0.0)
+        df_resid = n - 2
+        sigma2 = sse / df_resid
+        slope_se = np.sqrt(sigma2 / sxx)
+        intercept_se = np.sqrt(sigma2 * (1.0 / n + x_mean ** 2 / sxx))
+        r_squared = 1.0 - sse / syy
+        p_value = 2.0 * stats.t.sf(np.abs(slope / slope_se), df_resid)
+
+    degenerate = (sxx <= 0) | (df_resid < 1)
+    result = {'slope': slope, 'intercept': intercept, 'slope_se': slope_se, 'intercept_se': intercept_se,
+              'r_squared': r_squared, 'p_value': p_value}
+    for values in result.values():
+        values[degenerate] = np.nan
+    result['n'] = n
+    return result
+
+
+def multiple_ols(frame, predictors, response=RESPONSE):
+    """Fit `response ~ const + predictors...` on `frame`, dropping rows with missing values."""
+    data = frame[list(predictors) + [response]].to_numpy(dtype=float)
+    data = data[np.isfinite(data).all(axis=1)]
+    n, k = len(data), len(predictors)
+
+    X = np.column_stack([np.ones(n), data[:, :k]])
+    y = data[:, k]
+    # One QR factorization gives both the coefficients and (X'X)^-1 = R^-1 R^-T
+    # without squaring the condition number of X
+    q, r = np.linalg.qr(X)
+    r_inverse = np.linalg.pinv(r)
+    params = r_inverse @ (q.T @ y)
+    residuals = y - X @ params
+
+    df_resid = n - np.linalg.matrix_rank(r)
+    sse = residuals @ residuals
+    sst = ((y - y.mean()) ** 2).sum()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        covariance = sse / df_resid * (r_inverse @ r_inverse.T)
+        bse = np.sqrt(np.diag(covariance))
+        pvalues = 2.0 * stats.t.sf(np.abs(params / bse), df_resid)
+        r_squared = 1.0 - sse / sst
+        adj_r_squared = 1.0 - (1.0 - r_squared) * (n - 1) / df_resid
+
+    names = ['const'] + list(predictors)
+    return MultipleOLSFit(params=dict(zip(names, params.tolist())), bse=dict(zip(names, bse.tolist())),
+                          pvalues=dict(zip(names, pvalues.tolist())), r_squared=float(r_squared),
+                          adj_r_squared=float(adj_r_squared), n=n)
+
+
+def fit_level(frame, predictors, response=RESPONSE):
+    """Return {predictor: OLSFit} of `response` on each predictor, fitted in one batch."""
+    batch = batch_ols(frame[predictors].to_numpy(dtype=float), frame[response].to_numpy(dtype=float))
+    return {
+        predictor: OLSFit(r_squared=float(batch['r_squared'][j]), slope=float(batch['slope'][j]),
+                          intercept=float(batch['intercept'][j]), slope_se=float(batch['slope_se'][j]),
+                          intercept_se=float(batch['intercept_se'][j]), p_value=float(batch['p_value'][j]),
+                          n=int(batch['n'][j]))
+        for j, predictor in enumerate(predictors)
+    }
+
+
+def available_predictors(level, frame):
+    """Return the predictors of 'state' or 'city' level that are columns of `frame`, in `PREDICTORS` order."""
+    return [predictor for predictor in PREDICTORS[level] if predictor in frame.columns]
+
+
+def _cached(key, build):
+    """Return the cached value for `key` (whose first element is the dataset version), building it on a miss."""
+    with _lock:
+        if key in _cache:
+            _stats['hits'] += 1
+            return _cache[key]
+    # Concurrent sessions missing the same key wait for one fit instead of each running it
+    return _flights.run(key, lambda: _store(key, build(), miss=True))
+
+
+def _store(key, value, miss=False):
+    with _lock:
+        _stats['misses'] += miss
+        # Keep only fits of the current dataset version
+        for stale in [k for k in _cache if k[0] != key[0]]:
+            del _cache[stale]
+        _cache[key] = value
+    return value
+
+
+def _level_table(level, period):
+    return data_loader.load_period_summary(LEVEL_TABLES[level], period)
+
+
+def _fit_level(level, period, response):
+    frame = _level_table(level, period)
+    return fit_level(frame, available_predictors(level, frame), response)
+
+
+def _fit_multiple(level, period, response):
+    frame = _level_table(level, period)
+    return multiple_ols(frame, available_predictors(level, frame), response)
+
+
+def get_fits(level, response=RESPONSE, period=None):
+    """Return {predictor: OLSFit} for every available predictor of 'state' or 'city' level, fitted at most once per dataset version.
+
+    With `period` (a pair of ISO dates), events are only counted from its first to its last day.
+    """
+    key = data_loader.dataset_version(), 'simple', level, response, period
+    return _cached(key, lambda: _fit_level(level, period, response))
+
+
+def get_fit(level, predictor, response=RESPONSE, period=None):
+    """Return the cached OLS fit of `response` on `predictor` at 'state' or 'city' level."""
+    return get_fits(level, response, period)[predictor]
+
+
+def get_multiple_fit(level, response=RESPONSE, period=None):
+    """Return the cached OLS fit of `response` on all available predictors of the level together."""
+    key = data_loader.dataset_version(), 'multiple', level, response, period
+    return _cached(key, lambda: _fit_multiple(level, period, response))
+
+
+def put_fits(version, level, fits, response=RESPONSE):
+    """Store `fits` ({predictor: OLSFit}, computed elsewhere) as the all-time fits of `level` for dataset `version`."""
+    _store((version, 'simple', level, response, None), fits)
+
+
+def cache_info():
+    """Return hit/miss counters, the callers that waited on an in-flight fit and the number of cached fits."""
+    with _lock:
+        return dict(_stats, waits=_flights.waits, entries=len(_cache))
+
+
+def clear_cache():
+    """Forget every cached fit and reset the counters."""
+    with _lock:
+        _cache.clear()
+        _stats.update(hits=0, misses=0)
+        _flights.waits = 0
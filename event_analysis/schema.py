@@ -0,0 +1,112 @@
+"""Normalized (star-schema) storage for the merged dataset.
+
+The merged CSV repeats every event once per airport serving its city, and
+repeats the census figures on every row. `normalize` splits it into four
+tables linked by integer surrogate keys:
+
+- states:   state_id, State, state-level census columns
+- cities:   city_id, City, state_id, city-level census columns
+- events:   event_id, Event Number, Event Date and venue coordinates (when the
+  dataset has them), city_id (one row per event and city)
+- airports: airport_id, IATA, city_id, airport columns, including coordinates
+  when present (one row per airport and the city it serves; airport_id
+  identifies the IATA code)
+
+The keys come from dictionary-encoding State, City and IATA into integer
+codes once, so no step of the split groups or deduplicates strings.
+`fact_view` joins them back into the flat layout when a caller needs it.
+"""
+import numpy as np
+import pandas as pd
+
+TABLES = ['states', 'cities', 'events', 'airports']
+
+# Columns whose level is known; any other CSV column is placed by `_column_level`
+KNOWN_COLUMNS = {
+    'State': 'states', 'Population_state': 'states', 'Median Household Income_state': 'states',
+    'City': 'cities', 'Population_city': 'cities', 'Median Household Income_city': 'cities',
+    'Event Number': 'events', 'Event Date': 'events', 'Venue Latitude': 'events', 'Venue Longitude': 'events',
+    'IATA': 'airports', 'ICAO': 'airports', 'Airport Name': 'airports',
+    'Airport Latitude': 'airports', 'Airport Longitude': 'airports',
+}
+
+
+def _column_level(values, keys):
+    # Put an unknown column in the coarsest table where it has a single value per key (integer codes, -1 if missing)
+    for table in ['states', 'cities', 'airports']:
+        present = keys[table] >= 0
+        if values[present].groupby(keys[table][present]).nunique(dropna=False).max() <= 1:
+            return table
+    return 'events'
+
+
+def _surrogate(frame, name):
+    # Number the rows 0..n-1 as int32, the type of the foreign keys that refer to them in the other tables
+    frame.insert(0, name, np.arange(len(frame), dtype='int32'))
+    return frame
+
+
+def _first_rows(codes):
+    # Row of the first occurrence of each code, in code order
+    return np.unique(codes, return_index=True)[1]
+
+
+def normalize(data):
+    """Split the flat merged frame into the states, cities, events and airports tables.
+
+    State, City and IATA are dictionary-encoded once into integer codes in
+    sorted order, and every (City, State) pair is packed into one integer,
+    so the groupings and deduplications below never hash strings. Every
+    row needs a City and a State.
+    """
+    state_codes, state_names = pd.factorize(data['State'], sort=True)
+    city_codes, city_names = pd.factorize(data['City'], sort=True)
+    if (state_codes < 0).any() or (city_codes < 0).any():
+        raise ValueError('Every row of the dataset needs a City and a State')
+    iata_codes = pd.factorize(data['IATA'], sort=True)[0]
+    # (State, City) packed into one integer that sorts like the pair; its rank is the city_id
+    packed = state_codes.astype(np.int64) * len(city_names) + city_codes
+    row_city_ids = np.unique(packed, return_inverse=True)[1]
+    row_city_ids = row_city_ids.astype('int32')
+
+    keys = {'states': state_codes, 'cities': packed, 'airports': iata_codes}
+    levels = {column: KNOWN_COLUMNS.get(column) or _column_level(data[column], keys) for column in data.columns}
+    columns = {table: [column for column in data.columns if levels[column] == table] for table in TABLES}
+
+    states = data[columns['states']].iloc[_first_rows(state_codes)].reset_index(drop=True)
+    states['State'] = states['State'].astype(str)
+    states = _surrogate(states, 'state_id')
+
+    city_rows = _first_rows(packed)
+    cities = data[columns['cities']].iloc[city_rows].reset_index(drop=True)
+    cities['City'] = cities['City'].astype(str)
+    # The state codes are the state_ids: both number the sorted state names
+    cities.insert(1, 'state_id', state_codes[city_rows].astype('int32'))
+    cities = _surrogate(cities, 'city_id')
+
+    has_event = data['Event Number'].notna().to_numpy()
+    events = data.loc[has_event, columns['events']].assign(city_id=row_city_ids[has_event])
+    events = events[~events.duplicated(subset=['Event Number', 'city_id'])]
+    events = _surrogate(events.reset_index(drop=True), 'event_id')
+
+    # The IATA codes number the sorted codes, so they are the airport_ids
+    has_airport = iata_codes >= 0
+    airports = data.loc[has_airport, columns['airports']].assign(city_id=row_city_ids[has_airport])
+    airports.insert(0, 'airport_id', iata_codes[has_airport].astype('int32'))
+    airports = airports[~airports.duplicated(subset=['airport_id', 'city_id'])]
+    airports = airports.sort_values(['airport_id', 'city_id']).reset_index(drop=True).astype({'IATA': str})
+
+    return {'states': states, 'cities': cities, 'events': events, 'airports': airports}
+
+
+def fact_view(tables):
+    """Join the normalized tables back into the flat one-row-per-event-and-airport layout."""
+    cities = tables['cities'].merge(tables['states'], on='state_id')
+    view = tables['events'].merge(cities, on='city_id')
+    view = view.merge(tables['airports'], on='city_id', how='left')
+    return view.drop(columns=['event_id', 'city_id', 'state_id', 'airport_id'])
+
+
+def city_keys(tables):
+    """Return the cities table with its State name joined on, keyed by city_id."""
+    return tables['cities'].merge(tables['states'][['state_id', 'State']], on='state_id')
@@ -0,0 +1,84 @@
+"""Lazily computed page sections.
+
+A page section (a chart plus its statistics) is shown behind a "Click to
+view" toggle. Unlike the body of an `st.expander`, which Streamlit runs on
+every rerun even while collapsed, the section's computation only runs once
+the toggle is switched on, and its result is shared by every session for the
+current dataset version (see `event_analysis.shared_store`), so reruns
+caused by other widgets, and other viewers, reuse it.
+
+`date_filter` renders the event date range picker the sections share,
+`map_focus` the state a map section is zoomed to and `model_options` the
+regression model of the relationship sections (see `event_analysis.models`);
+`correlation_strength` and `is_significant` word their analysis texts.
+"""
+import streamlit as st
+
+from event_analysis import data_loader, geo, models
+
+
+def open_section(key, label='Click to view'):
+    """Render the section's toggle and return True while the user has it open."""
+    return st.toggle(label, key=f'section_{key}')
+
+
+def date_filter(label='Event dates'):
+    """Render a date range picker when the events have dates; return the selected period.
+
+    The period is a (first day, last day) pair of ISO dates, or None for all
+    events: without dates, while only the first day is picked, or when the
+    whole range is selected (so the default view matches the prebuilt figures).
+    """
+    bounds = data_loader.load_date_range()
+    if bounds is None:
+        return None
+    selected = st.date_input(label, value=bounds, min_value=bounds[0], max_value=bounds[1], key='event_dates')
+    if len(selected) != 2 or tuple(selected) == bounds:
+        return None
+    return selected[0].isoformat(), selected[1].isoformat()
+
+
+def map_focus(key, label='Zoom to'):
+    """Render the zoom selector of map section `key`; return the selected state, or None for the whole country."""
+    geometry = geo.load_geometry()
+    if geometry is None:
+        return None
+    choice = st.selectbox(label, ('United States',) + geometry.states, key=f'{key}_focus')
+    return None if choice == 'United States' else choice
+
+
+def model_options(key, label='Regression model options'):
+    """Render the model-options panel of a page's relationship sections; return the selected `models.ModelOptions`.
+
+    The panel starts collapsed on the default, OLS on the raw counts, which
+    the prebuilt figures and fits are drawn with.
+    """
+    with st.expander(label):
+        transform = st.selectbox('Transform', models.TRANSFORMS, format_func=models.TRANSFORM_NAMES.get,
+                                 key=f'{key}_transform')
+        estimator = st.selectbox('Estimator', models.ESTIMATORS, format_func=models.ESTIMATOR_NAMES.get,
+                                 key=f'{key}_estimator')
+        # The Huber fit reports its own robust (H1) errors
+        errors = st.radio('Standard errors', models.ERRORS, format_func=models.ERROR_NAMES.get, horizontal=True,
+                          disabled=estimator == 'huber', key=f'{key}_errors')
+    return models.ModelOptions(transform, estimator, 'classical' if estimator == 'huber' else errors)
+
+
+def correlation_strength(r_squared):
+    """Return the word the analysis texts use for the strength of a fit's correlation."""
+    if r_squared < 0.05:
+        return 'very weak'
+    if r_squared < 0.25:
+        return 'weak'
+    return 'moderate' if r_squared < 0.5 else 'strong'
+
+
+def is_significant(fit, level=0.05):
+    """Return True when the fit's slope is statistically significant at `level`."""
+    return fit.p_value < level
+
+
+def model_note(options, fit):
+    """Name the model behind a section's statistics when it is not the default OLS fit."""
+    if options != models.DEFAULT:
+        st.caption(models.describe(options, fit))
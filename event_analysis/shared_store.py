@@ -0,0 +1,131 @@
+"""Results shared by every session of the server process.
+
+Streamlit runs each viewer's page script in its own thread, so N viewers
+opening the same section asked for the same aggregate, fit or figure N
+times, and on a cold cache all N computed it at once. `SharedStore` keeps
+computed results process-wide for the current dataset version, and
+`SingleFlight` collapses concurrent builds of one key into a single
+computation that the other callers wait for, so a burst of viewers costs
+one build instead of a stampede. The figure cache and the regression fits
+use `SingleFlight` for their misses as well.
+"""
+import collections
+import threading
+
+from event_analysis import data_loader
+
+
+class _Call:
+    # One in-flight build: its waiters block on `done`
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+    def result(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+class SingleFlight:
+    """Run at most one `build` per key at a time; concurrent callers of that key share its result.
+
+    `build` should also publish its result wherever later callers look first
+    (a cache), since the key is released as soon as it returns. A failing
+    build raises its exception in every waiting caller, and the next call
+    tries again.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.waits = 0
+
+    def run(self, key, build):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.waits += 1
+        if not leader:
+            return call.result()
+
+        try:
+            call.value = build()
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value
+
+
+class SharedStore:
+    """LRU of computed results keyed by hashable keys, scoped to one dataset version.
+
+    A new version drops every entry of the old one; builds still running for
+    an old version return their result to their callers without storing it.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()
+        self._version = None
+        self._flights = SingleFlight()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def get(self, version, key, build):
+        """Return the value stored for `key`, calling `build()` once across all concurrent callers on a miss."""
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._stats['hits'] += 1
+                return self._entries[key]
+        return self._flights.run((version, key), lambda: self._build(version, key, build))
+
+    def _build(self, version, key, build):
+        value = build()
+        with self._lock:
+            self._stats['misses'] += 1
+            if version == self._version:
+                self._entries[key] = value
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self._stats['evictions'] += 1
+        return value
+
+    def info(self):
+        """Return hit/miss/eviction counters, the callers that waited on an in-flight build and the entry count."""
+        with self._lock:
+            return dict(self._stats, waits=self._flights.waits, entries=len(self._entries))
+
+    def clear(self):
+        """Forget every entry and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._version = None
+            self._stats.update(hits=0, misses=0, evictions=0)
+            self._flights.waits = 0
+
+
+store = SharedStore()
+
+
+def shared_result(key, build, *args):
+    """Return `build(*args)`, computed at most once per dataset version and arguments across all sessions."""
+    return store.get(data_loader.dataset_version(), (key, args), lambda: build(*args))
+
+
+def cache_info():
+    """Return the statistics of the process-wide store (see `SharedStore.info`)."""
+    return store.info()
@@ -0,0 +1,144 @@
+"""Typed columnar snapshot of the merged dataset.
+
+The CSV stores income as strings such as "$71,234" and populations with
+thousands separators, so every page used to clean types after parsing the
+text. `build_snapshot` does that cleaning once, splits the result into the
+normalized tables of `event_analysis.schema` and writes each one as an
+uncompressed Feather (Arrow IPC) file that the loader memory-maps on startup,
+together with the state and city summary tables from
+`event_analysis.aggregates`. When the events have dates, their daily counts
+per city are written as month partitions (see `event_analysis.partitions`);
+a rebuild only rewrites the months that changed.
+
+Usage (from the app root):
+
+    python -m event_analysis.snapshot [csv_path] [snapshot_dir]
+"""
+import json
+import os
+import sys
+
+import pandas as pd
+
+from event_analysis import partitions
+from event_analysis.aggregates import build_summaries
+from event_analysis.schema import TABLES, normalize
+
+DATA_PATH = 'WANG_QING_final_data.csv'
+SNAPSHOT_DIR = 'data_snapshot'
+MANIFEST_FILE = 'manifest.json'
+
+# Columns stored as dictionary-encoded categoricals
+CATEGORICAL_COLUMNS = ['State', 'City', 'IATA', 'ICAO', 'Airport Name']
+
+# Columns stored as integers; currency symbols and thousands separators are stripped first
+INTEGER_COLUMNS = ['Event Number', 'Population_state', 'Median Household Income_state',
+                   'Population_city', 'Median Household Income_city']
+
+# Columns stored as dates; unparseable values become missing
+DATE_COLUMNS = ['Event Date']
+
+
+def _to_int(series):
+    # Strip "$" and "," from text columns before converting them
+    if not pd.api.types.is_numeric_dtype(series):
+        series = pd.to_numeric(series.astype(str).str.replace(r'[\$,]', '', regex=True).replace({'nan': None, '': None}))
+    # Keep plain int64 when possible and fall back to the nullable type for missing values
+    if series.isna().any():
+        return series.astype('Int64')
+    return series.astype('int64')
+
+
+def clean_types(frame):
+    """Return a copy of the raw CSV frame with integer numerics, dates and categorical keys."""
+    frame = frame.copy()
+    for column in INTEGER_COLUMNS:
+        if column in frame.columns:
+            frame[column] = _to_int(frame[column])
+    for column in DATE_COLUMNS:
+        if column in frame.columns:
+            frame[column] = pd.to_datetime(frame[column], errors='coerce', format='%Y-%m-%d').astype('datetime64[s]')
+    for column in CATEGORICAL_COLUMNS:
+        if column in frame.columns:
+            frame[column] = frame[column].astype('category')
+    return frame
+
+
+def read_csv(csv_path=DATA_PATH):
+    """Parse the CSV and clean its types (the slow path used when no snapshot exists)."""
+    return clean_types(pd.read_csv(csv_path))
+
+
+def _read_manifest(snapshot_dir):
+    try:
+        with open(os.path.join(snapshot_dir, MANIFEST_FILE)) as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return None
+
+
+def is_fresh(csv_path=DATA_PATH, snapshot_dir=SNAPSHOT_DIR):
+    """Return True when the snapshot exists and was built from the current CSV."""
+    manifest = _read_manifest(snapshot_dir)
+    if manifest is None or not all(has_table(name, snapshot_dir) for name in TABLES):
+        return False
+    # A snapshot shipped without its source CSV is still usable
+    if not os.path.exists(csv_path):
+        return True
+    stat = os.stat(csv_path)
+    return manifest['source_mtime_ns'] == stat.st_mtime_ns and manifest['source_size'] == stat.st_size
+
+
+def build_snapshot(csv_path=DATA_PATH, snapshot_dir=SNAPSHOT_DIR):
+    """Convert the CSV into typed, normalized Feather tables and return the manifest."""
+    import pyarrow.feather as feather
+
+    frame = read_csv(csv_path)
+    os.makedirs(snapshot_dir, exist_ok=True)
+
+    # Write to a temporary name and rename so readers never see a half-written file
+    tables = normalize(frame)
+    tables.update(build_summaries(tables))
+    for name, table in tables.items():
+        target = os.path.join(snapshot_dir, name + '.feather')
+        feather.write_feather(table, target + '.tmp', compression='uncompressed')
+        os.replace(target + '.tmp', target)
+    partition_report = partitions.write_partitions(partitions.daily_counts(tables),
+                                                   os.path.join(snapshot_dir, partitions.PARTITION_DIR))
+
+    stat = os.stat(csv_path)
+    manifest = {
+        'source': os.path.abspath(csv_path),
+        'source_mtime_ns': stat.st_mtime_ns,
+        'source_size': stat.st_size,
+        'rows': len(frame),
+        'tables': {name: len(table) for name, table in tables.items()},
+        'partitions': {name: len(months) for name, months in partition_report.items()},
+    }
+    with open(os.path.join(snapshot_dir, MANIFEST_FILE + '.tmp'), 'w') as handle:
+        json.dump(manifest, handle, indent=2)
+    os.replace(os.path.join(snapshot_dir, MANIFEST_FILE + '.tmp'), os.path.join(snapshot_dir, MANIFEST_FILE))
+    return manifest
+
+
+def has_table(name, snapshot_dir=SNAPSHOT_DIR):
+    """Return True when the snapshot directory contains the named table."""
+    return os.path.exists(os.path.join(snapshot_dir, name + '.feather'))
+
+
+def read_snapshot(name, snapshot_dir=SNAPSHOT_DIR):
+    """Memory-map one table of the snapshot and return it as a DataFrame."""
+    import pyarrow.feather as feather
+
+    table = feather.read_table(os.path.join(snapshot_dir, name + '.feather'), memory_map=True)
+    return table.to_pandas()
+
+
+def read_tables(snapshot_dir=SNAPSHOT_DIR):
+    """Return the normalized states, cities, events and airports tables of the snapshot."""
+    return {name: read_snapshot(name, snapshot_dir) for name in TABLES}
+
+
+if __name__ == '__main__':
+    manifest = build_snapshot(*sys.argv[1:3])
+    print(f"Wrote {manifest['rows']} rows from {manifest['source']}")
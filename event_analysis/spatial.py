@@ -0,0 +1,116 @@
+"""Airport proximity of every city, from a k-d tree over the airport coordinates.
+
+The Number of Airports of a city only counts the airports whose "served
+city" is spelled exactly like the city of its events, so the events of a
+suburb next to a hub get no airport at all. When the dataset has venue and
+airport coordinates (see `event_analysis.ingest`), `city_features` places
+every city at the median of its venues and gives it two predictors that do
+not depend on names:
+
+- Airports within 50 km: the airports within `RADIUS_KM` km, great-circle,
+  whatever city they are listed under;
+- Distance to Nearest Airport (km).
+
+`AirportIndex` keeps the airports in a `scipy.spatial.cKDTree` over points
+on a sphere of the Earth's radius. The straight-line (chord) distance
+between two such points grows with their great-circle distance, so radius
+and nearest-neighbour queries on the tree are exact once the radius is
+converted to a chord. A lookup for one point takes microseconds; see
+`python benchmarks/bench_spatial.py`.
+"""
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+EARTH_RADIUS_KM = 6371.0
+
+RADIUS_KM = 50
+NEARBY = f'Airports within {RADIUS_KM} km'
+NEAREST = 'Distance to Nearest Airport (km)'
+FEATURES = [NEARBY, NEAREST]
+
+VENUE_COLUMNS = ['Venue Latitude', 'Venue Longitude']
+AIRPORT_COLUMNS = ['Airport Latitude', 'Airport Longitude']
+
+
+def sphere_points(lat, lon):
+    """Return the (n, 3) points of latitudes and longitudes (degrees) on a sphere of the Earth's radius."""
+    lat = np.radians(np.atleast_1d(np.asarray(lat, dtype=float)))
+    lon = np.radians(np.atleast_1d(np.asarray(lon, dtype=float)))
+    return EARTH_RADIUS_KM * np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+def chord_km(distance_km):
+    """Return the straight-line distance between two points `distance_km` apart along the Earth's surface."""
+    return 2 * EARTH_RADIUS_KM * np.sin(np.minimum(distance_km, np.pi * EARTH_RADIUS_KM) / (2 * EARTH_RADIUS_KM))
+
+
+def arc_km(chord):
+    """Return the great-circle distance of a straight-line distance `chord` (the inverse of `chord_km`)."""
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.asarray(chord) / (2 * EARTH_RADIUS_KM), 0, 1))
+
+
+class AirportIndex:
+    """Airport coordinates in a k-d tree, answering radius counts and nearest-airport queries in great-circle km."""
+
+    def __init__(self, iata, lat, lon):
+        self.iata = np.asarray(iata)
+        self._tree = cKDTree(sphere_points(lat, lon))
+
+    def __len__(self):
+        return len(self.iata)
+
+    def within(self, lat, lon, radius_km=RADIUS_KM):
+        """Return the number of airports within `radius_km` of each point."""
+        return self._tree.query_ball_point(sphere_points(lat, lon), chord_km(radius_km), return_length=True)
+
+    def nearest(self, lat, lon):
+        """Return the distance in km to the nearest airport of each point and that airport's IATA code."""
+        chord, index = self._tree.query(sphere_points(lat, lon))
+        return arc_km(chord), self.iata[index]
+
+    def features(self, lat, lon):
+        """Return the `FEATURES` of each point as a frame; points without coordinates get NaN."""
+        lat, lon = np.atleast_1d(np.asarray(lat, dtype=float)), np.atleast_1d(np.asarray(lon, dtype=float))
+        located = np.isfinite(lat) & np.isfinite(lon)
+        nearby, nearest = np.full(len(lat), np.nan), np.full(len(lat), np.nan)
+        if located.any():
+            nearby[located] = self.within(lat[located], lon[located])
+            nearest[located] = self.nearest(lat[located], lon[located])[0]
+        return pd.DataFrame({NEARBY: nearby, NEAREST: nearest})
+
+
+def airport_index(airports):
+    """Return an `AirportIndex` of the airports table (one point per IATA code), or None without coordinates."""
+    if not set(AIRPORT_COLUMNS) <= set(airports.columns):
+        return None
+    located = airports.dropna(subset=AIRPORT_COLUMNS).drop_duplicates(subset='IATA')
+    if located.empty:
+        return None
+    return AirportIndex(located['IATA'].astype(str).to_numpy(), *located[AIRPORT_COLUMNS].to_numpy().T)
+
+
+def city_locations(events):
+    """Return the median venue latitude and longitude of each city_id, or None without venue coordinates."""
+    if not set(VENUE_COLUMNS) <= set(events.columns):
+        return None
+    located = events[['city_id'] + VENUE_COLUMNS].dropna()
+    if located.empty:
+        return None
+    # The median keeps one mislocated venue from moving the whole city
+    return located.groupby('city_id')[VENUE_COLUMNS].median()
+
+
+def city_features(tables):
+    """Return the `FEATURES` of every located city, indexed by city_id, or None without coordinates.
+
+    Only the events' city_id and venue columns and the airports' IATA and
+    coordinate columns are used, so `tables` may hold just those.
+    """
+    index = airport_index(tables['airports'])
+    locations = city_locations(tables['events'])
+    if index is None or locations is None:
+        return None
+    features = index.features(*locations[VENUE_COLUMNS].to_numpy().T)
+    features.index = locations.index
+    return features
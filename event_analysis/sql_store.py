@@ -0,0 +1,311 @@
+"""SQLite storage and queries behind the dashboards.
+
+An alternative to the in-memory pandas tables: the dataset is loaded into a
+file-backed SQLite database (standard library, no server) with the same
+star schema as `event_analysis.schema`, and the summaries (which are also
+the regression inputs) and Specific Search lookups come from parameterized
+SQL queries, so the distinct counts and joins run inside the engine on
+indexed tables and the app process only holds query results. The airport proximity of each city
+(`event_analysis.spatial`) needs a k-d tree, so it is computed once while
+the database is built and stored in a `city_features` table.
+
+Select it with `EVENT_DATA_BACKEND=sqlite`; `data_loader` then builds
+`data_snapshot/events.sqlite` from the CSV when it is missing or stale.
+It can also be built ahead of time (from the app root):
+
+    python -m event_analysis.sql_store [csv_path] [db_path]
+"""
+import json
+import os
+import sqlite3
+import sys
+import threading
+
+import pandas as pd
+
+from event_analysis import lookup, partitions, snapshot, spatial
+
+DB_FILE = 'events.sqlite'
+DB_PATH = os.path.join(snapshot.SNAPSHOT_DIR, DB_FILE)
+BACKEND_ENV = 'EVENT_DATA_BACKEND'
+BACKENDS = ['pandas', 'sqlite']
+
+SCHEMA = '''
+CREATE TABLE states (
+    state_id INTEGER PRIMARY KEY,
+    state TEXT NOT NULL,
+    population INTEGER,
+    median_income INTEGER
+);
+CREATE TABLE cities (
+    city_id INTEGER PRIMARY KEY,
+    city TEXT NOT NULL,
+    state_id INTEGER NOT NULL REFERENCES states,
+    population INTEGER,
+    median_income INTEGER
+);
+CREATE TABLE events (
+    event_number INTEGER NOT NULL,
+    city_id INTEGER NOT NULL REFERENCES cities,
+    event_date TEXT,
+    venue_latitude REAL,
+    venue_longitude REAL,
+    PRIMARY KEY (event_number, city_id)
+) WITHOUT ROWID;
+CREATE TABLE airports (
+    iata TEXT NOT NULL,
+    city_id INTEGER NOT NULL REFERENCES cities,
+    icao TEXT,
+    airport_name TEXT,
+    latitude REAL,
+    longitude REAL,
+    PRIMARY KEY (iata, city_id)
+) WITHOUT ROWID;
+CREATE TABLE city_features (
+    city_id INTEGER PRIMARY KEY REFERENCES cities,
+    airports_nearby REAL,
+    nearest_airport_km REAL
+);
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE UNIQUE INDEX states_state ON states (state);
+CREATE UNIQUE INDEX cities_city_state ON cities (city, state_id);
+CREATE TEMP TABLE raw (
+    event_number INTEGER, event_date TEXT, venue_latitude REAL, venue_longitude REAL, city TEXT, state TEXT,
+    population_state INTEGER, median_income_state INTEGER, population_city INTEGER, median_income_city INTEGER,
+    iata TEXT, icao TEXT, airport_name TEXT, airport_latitude REAL, airport_longitude REAL
+);
+'''
+
+# Created after loading: covering indexes for the per-city and per-state distinct counts
+INDEXES = '''
+CREATE INDEX cities_state ON cities (state_id, city_id);
+CREATE INDEX events_city ON events (city_id, event_number);
+CREATE INDEX airports_city ON airports (city_id, iata);
+ANALYZE;
+'''
+
+# CSV columns in the order of the `raw` staging table
+RAW_COLUMNS = ['Event Number', 'Event Date', 'Venue Latitude', 'Venue Longitude', 'City', 'State', 'Population_state',
+               'Median Household Income_state', 'Population_city', 'Median Household Income_city', 'IATA', 'ICAO',
+               'Airport Name', 'Airport Latitude', 'Airport Longitude']
+
+# Fold one staged chunk into the normalized tables; the unique keys make repeated rows no-ops
+LOAD_CHUNK = '''
+INSERT OR IGNORE INTO states (state, population, median_income)
+    SELECT state, population_state, median_income_state FROM raw GROUP BY state;
+INSERT OR IGNORE INTO cities (city, state_id, population, median_income)
+    SELECT r.city, s.state_id, r.population_city, r.median_income_city
+    FROM raw r JOIN states s ON s.state = r.state GROUP BY r.city, r.state;
+INSERT OR IGNORE INTO events (event_number, city_id, event_date, venue_latitude, venue_longitude)
+    SELECT DISTINCT r.event_number, c.city_id, r.event_date, r.venue_latitude, r.venue_longitude
+    FROM raw r JOIN states s ON s.state = r.state JOIN cities c ON c.city = r.city AND c.state_id = s.state_id
+    WHERE r.event_number IS NOT NULL;
+INSERT OR IGNORE INTO airports (iata, city_id, icao, airport_name, latitude, longitude)
+    SELECT r.iata, c.city_id, r.icao, r.airport_name, r.airport_latitude, r.airport_longitude
+    FROM raw r JOIN states s ON s.state = r.state JOIN cities c ON c.city = r.city AND c.state_id = s.state_id
+    WHERE r.iata IS NOT NULL;
+DELETE FROM raw;
+'''
+
+STATE_SUMMARY_SQL = '''
+SELECT s.state AS "State",
+       (SELECT COUNT(DISTINCT e.event_number) FROM cities c JOIN events e ON e.city_id = c.city_id
+        WHERE c.state_id = s.state_id) AS "Number of Events",
+       (SELECT COUNT(DISTINCT a.iata) FROM cities c JOIN airports a ON a.city_id = c.city_id
+        WHERE c.state_id = s.state_id) AS "Number of Airports",
+       s.population AS "Population_state",
+       s.median_income AS "Median Household Income_state"
+FROM states s
+'''
+
+CITY_SUMMARY_SQL = '''
+SELECT c.city AS "City",
+       s.state AS "State",
+       (SELECT COUNT(DISTINCT e.event_number) FROM events e WHERE e.city_id = c.city_id) AS "Number of Events",
+       (SELECT COUNT(DISTINCT a.iata) FROM airports a WHERE a.city_id = c.city_id) AS "Number of Airports",
+       c.population AS "Population_city",
+       c.median_income AS "Median Household Income_city"
+FROM cities c JOIN states s ON s.state_id = c.state_id
+'''
+
+# Inputs of `spatial.city_features`, with the column names of the normalized tables
+VENUES_SQL = '''
+SELECT city_id, venue_latitude AS "Venue Latitude", venue_longitude AS "Venue Longitude"
+FROM events WHERE venue_latitude IS NOT NULL AND venue_longitude IS NOT NULL
+'''
+AIRPORT_LOCATIONS_SQL = '''
+SELECT DISTINCT iata AS "IATA", latitude AS "Airport Latitude", longitude AS "Airport Longitude"
+FROM airports WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+'''
+
+CITY_FEATURES_SQL = f'''
+SELECT c.city AS "City", s.state AS "State",
+       f.airports_nearby AS "{spatial.NEARBY}", f.nearest_airport_km AS "{spatial.NEAREST}"
+FROM city_features f JOIN cities c ON c.city_id = f.city_id JOIN states s ON s.state_id = c.state_id
+'''
+
+DAILY_COUNTS_SQL = '''
+SELECT e.event_date AS "Event Date", c.city AS "City", s.state AS "State", COUNT(*) AS "Number of Events"
+FROM events e JOIN cities c ON c.city_id = e.city_id JOIN states s ON s.state_id = c.state_id
+WHERE e.event_date IS NOT NULL
+GROUP BY e.event_date, c.city_id
+'''
+
+
+def _source_meta(csv_path):
+    stat = os.stat(csv_path)
+    return {'source': os.path.abspath(csv_path), 'source_mtime_ns': stat.st_mtime_ns, 'source_size': stat.st_size}
+
+
+def is_fresh(csv_path=snapshot.DATA_PATH, db_path=DB_PATH):
+    """Return True when the database exists and was built from the current CSV."""
+    if not os.path.exists(db_path):
+        return False
+    # A database shipped without its source CSV is still usable
+    if not os.path.exists(csv_path):
+        return True
+    try:
+        with sqlite3.connect(f'file:{db_path}?mode=ro', uri=True) as connection:
+            stored = json.loads(connection.execute("SELECT value FROM meta WHERE key = 'source'").fetchone()[0])
+    except (sqlite3.Error, TypeError, ValueError):
+        return False
+    current = _source_meta(csv_path)
+    return all(stored.get(key) == current[key] for key in ['source_mtime_ns', 'source_size'])
+
+
+def build_database(csv_path=snapshot.DATA_PATH, db_path=DB_PATH, chunksize=250000):
+    """Load the CSV into a new SQLite database at `db_path`, `chunksize` rows at a time.
+
+    The database is written to a temporary file and moved into place, so
+    readers never see a partial build. Returns the row counts per table.
+    """
+    os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+    tmp_path = db_path + '.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    connection = sqlite3.connect(tmp_path)
+    try:
+        connection.executescript('PRAGMA journal_mode = OFF; PRAGMA synchronous = OFF;' + SCHEMA)
+        placeholders = ', '.join('?' * len(RAW_COLUMNS))
+        rows = 0
+        for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+            chunk = snapshot.clean_types(chunk.reindex(columns=RAW_COLUMNS))
+            # Dates are stored as ISO text, which sorts and compares like the dates
+            chunk['Event Date'] = chunk['Event Date'].dt.strftime('%Y-%m-%d')
+            chunk = chunk.astype(object)
+            chunk = chunk.where(chunk.notna(), None)
+            connection.executemany(f'INSERT INTO raw VALUES ({placeholders})', chunk.itertuples(index=False, name=None))
+            connection.executescript(LOAD_CHUNK)
+            rows += len(chunk)
+        connection.executescript(INDEXES)
+        _store_city_features(connection)
+
+        counts = {table: connection.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+                  for table in ['states', 'cities', 'events', 'airports', 'city_features']}
+        meta = dict(_source_meta(csv_path), rows=rows, tables=counts)
+        connection.execute("INSERT INTO meta VALUES ('source', ?)", (json.dumps(meta),))
+        connection.commit()
+    finally:
+        connection.close()
+    os.replace(tmp_path, db_path)
+    return meta
+
+
+def _store_city_features(connection):
+    # Fill city_features from the venue and airport coordinates; it stays empty without them
+    features = spatial.city_features({'events': pd.read_sql_query(VENUES_SQL, connection),
+                                      'airports': pd.read_sql_query(AIRPORT_LOCATIONS_SQL, connection)})
+    if features is not None:
+        connection.executemany('INSERT INTO city_features VALUES (?, ?, ?)',
+                               features[spatial.FEATURES].itertuples(index=True, name=None))
+
+
+class SQLStore:
+    """Read-only queries against a database built by `build_database`.
+
+    Also serves the Specific Search tab: it has the same `states`,
+    `cities()`, `state()` and `city()` interface as `lookup.SearchIndex`,
+    answered by indexed, parameterized queries.
+    """
+
+    def __init__(self, db_path=DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        self.states = tuple(row[0] for row in self._query('SELECT state FROM states ORDER BY state'))
+        # Empty without coordinates, and missing from databases built before airport proximity was added
+        tables = {row[0] for row in self._query("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        self.has_city_features = 'city_features' in tables and bool(self._query('SELECT 1 FROM city_features LIMIT 1'))
+
+    def _connection(self):
+        # One read-only connection per thread: Streamlit runs each session's script in its own thread
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = sqlite3.connect(f'file:{self.db_path}?mode=ro', uri=True)
+        return connection
+
+    def _query(self, sql, parameters=()):
+        return self._connection().execute(sql, parameters).fetchall()
+
+    def _frame(self, sql, parameters=()):
+        return pd.read_sql_query(sql, self._connection(), params=parameters)
+
+    def state_summary(self):
+        """Return the per-state summary (see `aggregates.build_state_summary`)."""
+        return self._frame(STATE_SUMMARY_SQL + ' ORDER BY "State"')
+
+    def city_summary(self):
+        """Return the per-(City, State) summary (see `aggregates.build_city_summary`)."""
+        summary = self._frame(CITY_SUMMARY_SQL + ' ORDER BY "City", "State"')
+        if self.has_city_features:
+            summary = summary.merge(self._frame(CITY_FEATURES_SQL), on=['City', 'State'], how='left')
+        return summary
+
+    def daily_counts(self):
+        """Return the number of events per (Event Date, City, State), or None when the events have no dates."""
+        # A database built before event dates were loaded has no event_date column
+        if 'event_date' not in {row[1] for row in self._query('PRAGMA table_info(events)')}:
+            return None
+        counts = self._frame(DAILY_COUNTS_SQL)
+        return partitions.sort_counts(counts.assign(**{'Event Date': pd.to_datetime(counts['Event Date'])}))
+
+    def overview_counts(self):
+        """Return the headline counts shown in the Data Overview tab."""
+        # SELECT DISTINCT walks the primary keys in order; COUNT(DISTINCT ...) would sort into a temp b-tree
+        states, cities, events, airports = self._query(
+            'SELECT (SELECT COUNT(*) FROM states), (SELECT COUNT(*) FROM cities), '
+            '(SELECT COUNT(*) FROM (SELECT DISTINCT event_number FROM events)), '
+            '(SELECT COUNT(*) FROM (SELECT DISTINCT iata FROM airports))')[0]
+        return {'states': states, 'cities': cities, 'events': events, 'airports': airports}
+
+    def cities(self, state):
+        """Return the sorted city names of `state` (empty when the state is unknown)."""
+        return tuple(row[0] for row in self._query(
+            'SELECT c.city FROM cities c JOIN states s ON s.state_id = c.state_id WHERE s.state = ? ORDER BY c.city',
+            (state,)))
+
+    def state(self, state):
+        """Return the `lookup.Metrics` of `state`, or None when it is not in the dataset."""
+        rows = self._query(STATE_SUMMARY_SQL + ' WHERE s.state = ?', (state,))
+        return lookup.Metrics(rows[0][1], rows[0][3], rows[0][4], rows[0][2]) if rows else None
+
+    def city(self, city, state):
+        """Return the `lookup.Metrics` of (`city`, `state`), or None when it is not in the dataset."""
+        rows = self._query(CITY_SUMMARY_SQL + ' WHERE c.city = ? AND s.state = ?', (city, state))
+        return lookup.Metrics(rows[0][2], rows[0][4], rows[0][5], rows[0][3]) if rows else None
+
+
+_build_lock = threading.Lock()
+
+
+def open_store(csv_path=snapshot.DATA_PATH, db_path=DB_PATH):
+    """Return a `SQLStore` on `db_path`, (re)building the database first when it is missing or stale."""
+    with _build_lock:
+        if not is_fresh(csv_path, db_path):
+            build_database(csv_path, db_path)
+    return SQLStore(db_path)
+
+
+if __name__ == '__main__':
+    meta = build_database(*sys.argv[1:3])
+    print(f"Wrote {meta['rows']} rows from {meta['source']}: {meta['tables']}")
@@ -0,0 +1,289 @@
+"""Chunked aggregation of the merged CSV for datasets larger than memory.
+
+`stream_summaries` reads the CSV `chunksize` rows at a time and keeps only
+incremental distinct-count state per state and per city, so peak memory is
+bounded by one chunk plus that state instead of by the whole fact table. It
+returns the same state and city summary tables as
+`aggregates.build_summaries`, without the airport proximity columns of
+`event_analysis.spatial`.
+
+Two counting modes are available:
+
+- 'exact' keeps the distinct (group, event) pairs as packed 64-bit integers,
+  deduplicated chunk by chunk (8 bytes per distinct pair);
+- 'hll' keeps one HyperLogLog sketch of 2**precision one-byte registers per
+  city and per state, so memory no longer grows with the number of events,
+  at a relative standard error of about 1.04 / sqrt(2**precision).
+
+Airport counts are always exact: there are only a few thousand airports.
+
+Usage (from the app root):
+
+    python -m event_analysis.streaming [csv_path] [--hll] [--chunksize N]
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from event_analysis import snapshot
+from event_analysis.aggregates import CITY_SUMMARY_COLUMNS, STATE_SUMMARY_COLUMNS
+
+STATE_COLUMNS = ['Population_state', 'Median Household Income_state']
+CITY_COLUMNS = ['Population_city', 'Median Household Income_city']
+USED_COLUMNS = ['Event Number', 'City', 'State', 'IATA'] + STATE_COLUMNS + CITY_COLUMNS
+
+MODES = ['exact', 'hll']
+
+
+def _sorted_unique(values):
+    values = np.sort(values)
+    keep = np.empty(len(values), dtype=bool)
+    keep[:1] = True
+    np.not_equal(values[1:], values[:-1], out=keep[1:])
+    return values[keep]
+
+
+class ExactDistinct:
+    """Exact distinct counts of non-negative values below 2**32 per integer group."""
+
+    def __init__(self):
+        self._pairs = np.empty(0, dtype=np.uint64)
+        self._pending = []
+        self._pending_size = 0
+
+    def add(self, groups, values):
+        if len(values) and values.max() >= 2 ** 32:
+            raise ValueError('ExactDistinct only counts values below 2**32')
+        pairs = _sorted_unique((groups.astype(np.uint64) << np.uint64(32)) | values.astype(np.uint64))
+        self._pending.append(pairs)
+        self._pending_size += len(pairs)
+        # Merge once the buffered pairs outgrow the merged set, so memory stays within ~2x the distinct pairs
+        if self._pending_size > max(len(self._pairs), 1 << 20):
+            self._merge()
+
+    def _merge(self):
+        self._pairs = _sorted_unique(np.concatenate([self._pairs] + self._pending))
+        self._pending, self._pending_size = [], 0
+
+    def counts(self, groups):
+        """Return the number of distinct values of groups 0..groups-1."""
+        self._merge()
+        return np.bincount((self._pairs >> np.uint64(32)).astype(np.int64), minlength=groups).astype(np.int64)
+
+    @property
+    def nbytes(self):
+        return self._pairs.nbytes + sum(pending.nbytes for pending in self._pending)
+
+
+def _mix64(values):
+    # splitmix64 finalizer: spreads consecutive event numbers over the whole 64-bit range
+    x = values.astype(np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def _bit_length(values):
+    length = np.zeros(values.shape, dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        big = values >= (np.uint64(1) << np.uint64(shift))
+        length += big * shift
+        values = np.where(big, values >> np.uint64(shift), values)
+    return length + (values > 0)
+
+
+def _sigma(x):
+    # sigma(x) = x + sum_k x^(2^k) 2^(k-1), infinite for x == 1 (an empty sketch)
+    total, power, weight = x.copy(), x.copy(), 1.0
+    for _ in range(64):
+        power = power * power
+        total += power * weight
+        weight += weight
+    total[x >= 1.0] = np.inf
+    return total
+
+
+def _tau(x):
+    # tau(x) = (1 - x - sum_k (1 - x^(2^-k))^2 2^-k) / 3, zero at x == 0 and x == 1
+    total, root, weight = 1.0 - x, x.copy(), 1.0
+    for _ in range(64):
+        root = np.sqrt(root)
+        weight *= 0.5
+        total -= (1.0 - root) ** 2 * weight
+    total[(x <= 0.0) | (x >= 1.0)] = 0.0
+    return total / 3.0
+
+
+class HyperLogLogDistinct:
+    """Approximate distinct counts per integer group with one HyperLogLog sketch per group."""
+
+    def __init__(self, precision=11):
+        self.precision = precision
+        self._size = 1 << precision
+        self._registers = np.zeros(0, dtype=np.uint8)
+
+    def add(self, groups, values):
+        if not len(values):
+            return
+        needed = (int(groups.max()) + 1) * self._size
+        if needed > len(self._registers):
+            # Grow geometrically as new groups show up
+            grown = np.zeros(max(needed, 2 * len(self._registers)), dtype=np.uint8)
+            grown[:len(self._registers)] = self._registers
+            self._registers = grown
+
+        hashed = _mix64(values)
+        bits = 64 - self.precision
+        index = (hashed >> np.uint64(bits)).astype(np.int64)
+        rest = hashed & np.uint64((1 << bits) - 1)
+        rank = (bits - _bit_length(rest) + 1).astype(np.uint8)
+        np.maximum.at(self._registers, groups.astype(np.int64) * self._size + index, rank)
+
+    def counts(self, groups):
+        """Return the estimated number of distinct values of groups 0..groups-1."""
+        size, bits = self._size, 64 - self.precision
+        # Histogram of register values per group, in blocks of groups to keep temporaries small
+        histogram = np.zeros((groups, bits + 2), dtype=np.float64)
+        block = max(1, (1 << 20) // size)
+        used = min(groups, len(self._registers) // size)
+        for first in range(0, used, block):
+            registers = self._registers[first * size:min(first + block, used) * size].reshape(-1, size)
+            offsets = np.arange(len(registers))[:, None] * (bits + 2)
+            histogram[first:first + len(registers)] = np.bincount(
+                (offsets + registers).ravel(), minlength=len(registers) * (bits + 2)).reshape(-1, bits + 2)
+        # Groups never seen have empty sketches
+        histogram[used:, 0] = size
+
+        # Ertl's improved estimator ("New cardinality estimation algorithms for HyperLogLog sketches", 2017):
+        # unbiased over the whole range without the empirical bias tables of HyperLogLog++
+        z = size * _tau(1.0 - histogram[:, bits + 1] / size)
+        for value in range(bits, 0, -1):
+            z = 0.5 * (z + histogram[:, value])
+        z = z + size * _sigma(histogram[:, 0] / size)
+        with np.errstate(divide='ignore'):
+            estimate = size * size / (2 * np.log(2) * z)
+        return np.rint(estimate).astype(np.int64)
+
+    @property
+    def nbytes(self):
+        return self._registers.nbytes
+
+
+class _Codes:
+    # Dense integer codes for the keys seen so far, plus the census columns of their first row
+    def __init__(self):
+        self.codes = {}
+        self.rows = []
+
+    def lookup(self, keys, first_rows=None):
+        codes = np.empty(len(keys), dtype=np.int64)
+        new = []
+        for position, key in enumerate(keys):
+            code = self.codes.get(key)
+            if code is None:
+                code = self.codes[key] = len(self.codes)
+                new.append(position)
+            codes[position] = code
+        if first_rows is not None and new:
+            self.rows.append(first_rows.iloc[new])
+        return codes
+
+    def __len__(self):
+        return len(self.codes)
+
+
+class StreamingAggregator:
+    """Incremental state and city summaries over chunks of the merged CSV."""
+
+    def __init__(self, mode='exact', precision=11):
+        if mode not in MODES:
+            raise ValueError(f'mode must be one of {MODES}, not {mode!r}')
+        self.mode = mode
+        counter = ExactDistinct if mode == 'exact' else (lambda: HyperLogLogDistinct(precision))
+        self.city_events, self.state_events = counter(), counter()
+        self.city_airports, self.state_airports = ExactDistinct(), ExactDistinct()
+        self.states, self.cities, self.airports = _Codes(), _Codes(), _Codes()
+        self._city_state = np.empty(0, dtype=np.int64)
+        self.rows = 0
+
+    def add(self, chunk):
+        """Fold one chunk of raw CSV rows into the running counts."""
+        self.rows += len(chunk)
+        keys = ['City', 'State']
+        city_rows = chunk.groupby(keys, sort=False, dropna=False).ngroup().to_numpy()
+        firsts = snapshot.clean_types(chunk.drop_duplicates(subset=keys)[keys + STATE_COLUMNS + CITY_COLUMNS])
+        city_keys = list(zip(firsts['City'].astype(str), firsts['State'].astype(str)))
+
+        new_cities = len(self.cities)
+        city_codes = self.cities.lookup(city_keys, firsts[keys + CITY_COLUMNS])
+        state_codes = self.states.lookup([state for _, state in city_keys], firsts[['State'] + STATE_COLUMNS])
+        if len(self.cities) > new_cities:
+            self._city_state = np.concatenate([self._city_state, state_codes[city_codes >= new_cities]])
+
+        city = city_codes[city_rows]
+        state = self._city_state[city]
+
+        events = pd.to_numeric(chunk['Event Number'], errors='coerce').to_numpy(dtype=np.float64)
+        has_event = ~np.isnan(events)
+        events = events[has_event].astype(np.int64)
+        self.city_events.add(city[has_event], events)
+        self.state_events.add(state[has_event], events)
+
+        iata_rows, iata_keys = pd.factorize(chunk['IATA'])
+        has_airport = iata_rows >= 0
+        airports = self.airports.lookup([str(code) for code in iata_keys])[iata_rows[has_airport]]
+        self.city_airports.add(city[has_airport], airports)
+        self.state_airports.add(state[has_airport], airports)
+
+    def _summary(self, codes, events, airports, columns, sort_by):
+        summary = pd.concat(codes.rows, ignore_index=True) if codes.rows else pd.DataFrame(columns=columns)
+        summary['Number of Events'] = events.counts(len(codes))
+        summary['Number of Airports'] = airports.counts(len(codes))
+        return summary.astype({column: str for column in sort_by}).sort_values(sort_by).reset_index(drop=True)[columns]
+
+    def summaries(self):
+        """Return {'state_summary', 'city_summary'} in the layout of `aggregates.build_summaries`."""
+        return {
+            'state_summary': self._summary(self.states, self.state_events, self.state_airports,
+                                           STATE_SUMMARY_COLUMNS, ['State']),
+            'city_summary': self._summary(self.cities, self.city_events, self.city_airports,
+                                          CITY_SUMMARY_COLUMNS, ['City', 'State']),
+        }
+
+    @property
+    def state_nbytes(self):
+        """Bytes held by the distinct-count state."""
+        return sum(counter.nbytes for counter in
+                   [self.city_events, self.state_events, self.city_airports, self.state_airports])
+
+
+def stream_summaries(csv_path=snapshot.DATA_PATH, chunksize=250000, mode='exact', precision=11):
+    """Return the state and city summary tables of the CSV, reading it `chunksize` rows at a time."""
+    aggregator = StreamingAggregator(mode, precision)
+    reader = pd.read_csv(csv_path, usecols=lambda column: column in USED_COLUMNS, chunksize=chunksize,
+                         dtype={'City': str, 'State': str, 'IATA': str})
+    for chunk in reader:
+        aggregator.add(chunk)
+    return aggregator.summaries()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compute the state and city summaries of a CSV in chunks.')
+    parser.add_argument('csv_path', nargs='?', default=snapshot.DATA_PATH)
+    parser.add_argument('--chunksize', type=int, default=250000)
+    parser.add_argument('--hll', action='store_true', help='approximate distinct event counts with HyperLogLog')
+    parser.add_argument('--precision', type=int, default=11)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    summaries = stream_summaries(args.csv_path, args.chunksize, 'hll' if args.hll else 'exact', args.precision)
+    for name, summary in summaries.items():
+        print(f'{name}: {len(summary)} rows')
+        print(summary.sort_values('Number of Events', ascending=False).head(10).to_string(index=False), end='\n\n')
+    print(f'{time.perf_counter() - start:.2f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,214 @@
+"""Synthetic datasets in the layout of WANG_QING_final_data.csv, for scale testing.
+
+The generated file has the same columns and text formats as the real one
+("3,100,000", "$66,000"), with one row per (event, airport of the event's
+city) and a single row with empty airport columns for cities without an
+airport. Events per city follow a Zipf law, so a few cities hold most of the
+events the way Las Vegas does in the real data, and the number of airports
+per city varies from none to several, growing with city population. Event
+dates are spread uniformly over a window of `days` days from `first_date`
+(by default the six months back to one year ahead of the real data).
+
+Cities lie around a random center of their state, airports within a few tens
+of km of the city they serve and venues within a few km of their city, so
+neighbouring cities share airports the way suburbs of a hub do.
+
+Output is written in chunks, so millions of events never have to fit in
+memory as one frame, and a fixed seed makes every run reproducible.
+
+Usage (from the app root):
+
+    python -m event_analysis.synthetic OUTPUT --events 1000000 [--cities N] [--seed 0] [--snapshot DIR]
+
+To load-test the pages, write OUTPUT as WANG_QING_final_data.csv into an
+empty directory and start `streamlit run <app root>/Homepage.py` from there.
+"""
+import argparse
+import os
+import string
+
+import numpy as np
+import pandas as pd
+
+from event_analysis.ingest.matching import STATE_ABBREVIATIONS
+
+# Column order of WANG_QING_final_data.csv
+COLUMNS = ['Event Number', 'Event Date', 'Venue Latitude', 'Venue Longitude', 'City', 'State', 'Population_state',
+           'Median Household Income_state', 'Population_city', 'Median Household Income_city', 'IATA', 'ICAO',
+           'Airport Name', 'Airport Latitude', 'Airport Longitude']
+AIRPORT_COLUMNS = ['IATA', 'ICAO', 'Airport Name', 'Airport Latitude', 'Airport Longitude']
+
+STATE_NAMES = sorted(set(STATE_ABBREVIATIONS.values()))
+
+
+def _codes(count, width):
+    # Distinct upper-case codes "AAA", "AAB", ... of the given width
+    letters = np.array(list(string.ascii_uppercase))
+    index = np.arange(count)
+    digits = [(index // 26 ** position) % 26 for position in reversed(range(width))]
+    return [''.join(chars) for chars in zip(*(letters[digit] for digit in digits))]
+
+
+def _thousands(values, prefix=''):
+    return np.array([f'{prefix}{value:,}' for value in values.tolist()], dtype=object)
+
+
+def generate_places(cities, states=None, seed=0):
+    """Return (states, cities, airports) frames of a synthetic geography.
+
+    `cities` rows are ranked by event popularity (row 0 is the busiest city);
+    airports carry the index of their city in `city`. Coordinates are in
+    degrees, within the latitudes and longitudes of the contiguous states.
+    """
+    rng = np.random.default_rng(seed)
+    states = states or min(cities, len(STATE_NAMES))
+    state_names = STATE_NAMES[:states] + [f'State {index}' for index in range(len(STATE_NAMES), states)]
+    state_frame = pd.DataFrame({
+        'State': state_names,
+        'Population_state': (rng.lognormal(15.2, 1.0, states)).astype(np.int64) + 500000,
+        'Median Household Income_state': rng.normal(72000, 11000, states).clip(45000, 110000).astype(np.int64),
+    })
+
+    # Big states get more cities
+    state_weights = state_frame['Population_state'].to_numpy() / state_frame['Population_state'].sum()
+    city_state = rng.choice(states, size=cities, p=state_weights)
+    # Every state gets at least one city (as long as there are enough cities)
+    first = min(states, cities)
+    city_state[:first] = rng.permutation(states)[:first]
+    population = np.sort(rng.lognormal(11.5, 1.3, cities).astype(np.int64) + 5000)[::-1]
+    city_frame = pd.DataFrame({
+        'City': [f'City {index}' for index in range(cities)],
+        'state': city_state,
+        'Population_city': population,
+        'Median Household Income_city': rng.normal(68000, 17000, cities).clip(30000, 180000).astype(np.int64),
+    })
+
+    # Airport fan-out: Poisson around a rate growing with log population, so many small cities have none
+    rate = 0.25 + 0.45 * np.log10(population / population.min() + 1)
+    fan_out = rng.poisson(rate).clip(max=8)
+    airport_city = np.repeat(np.arange(cities), fan_out)
+    width = 3 if len(airport_city) <= 26 ** 3 else 4
+    iata = _codes(len(airport_city), width)
+    airport_frame = pd.DataFrame({
+        'city': airport_city,
+        'IATA': iata,
+        'ICAO': ['K' + code for code in iata],
+        'Airport Name': [f'{city} Airport {code}' for city, code in zip(city_frame['City'].to_numpy()[airport_city], iata)],
+    })
+
+    # Coordinates come from their own stream, so the rest of the geography is the same as without them
+    rng = np.random.default_rng([seed, 4])
+    state_lat, state_lon = rng.uniform(30, 46, states), rng.uniform(-120, -72, states)
+    city_frame['lat'] = state_lat[city_state] + rng.normal(0, 1.5, cities)
+    city_frame['lon'] = state_lon[city_state] + rng.normal(0, 2.0, cities)
+    airport_frame['Airport Latitude'] = (city_frame['lat'].to_numpy()[airport_city]
+                                         + rng.normal(0, 0.15, len(iata))).round(4)
+    airport_frame['Airport Longitude'] = (city_frame['lon'].to_numpy()[airport_city]
+                                          + rng.normal(0, 0.2, len(iata))).round(4)
+    return state_frame, city_frame, airport_frame
+
+
+def event_cities(events, cities, skew=1.1, seed=0):
+    """Return the city index of every event: Zipf-distributed over the city popularity ranks."""
+    rng = np.random.default_rng([seed, 1])
+    weights = 1.0 / np.arange(1, cities + 1) ** skew
+    return rng.choice(cities, size=events, p=weights / weights.sum()).astype(np.int32)
+
+
+def event_dates(events, first_date='2024-01-01', days=548, seed=0):
+    """Return the date of every event as ISO strings, uniform over `days` days from `first_date`."""
+    rng = np.random.default_rng([seed, 2])
+    dates = np.datetime64(first_date, 'D') + rng.integers(0, days, size=events)
+    return np.datetime_as_string(dates, unit='D').astype(object)
+
+
+def venue_locations(located, city_frame, seed=0):
+    """Return the venue latitude and longitude of every event, a few km around the center of its city."""
+    rng = np.random.default_rng([seed, 3])
+    lat = city_frame['lat'].to_numpy()[located] + rng.normal(0, 0.03, len(located))
+    lon = city_frame['lon'].to_numpy()[located] + rng.normal(0, 0.04, len(located))
+    return lat.round(5), lon.round(5)
+
+
+def _city_rows(state_frame, city_frame, airport_frame):
+    # One output row per (city, airport), formatted once, indexed by city through `start`/`count`
+    city_columns = pd.DataFrame({
+        'City': city_frame['City'].to_numpy(),
+        'State': state_frame['State'].to_numpy()[city_frame['state']],
+        'Population_state': _thousands(state_frame['Population_state'].to_numpy())[city_frame['state']],
+        'Median Household Income_state':
+            _thousands(state_frame['Median Household Income_state'].to_numpy(), '$')[city_frame['state']],
+        'Population_city': city_frame['Population_city'].to_numpy(),
+        'Median Household Income_city': _thousands(city_frame['Median Household Income_city'].to_numpy(), '$'),
+    })
+    airports = airport_frame.sort_values('city', kind='stable')
+    count = np.bincount(airports['city'], minlength=len(city_frame))
+    # Cities without an airport keep one row with empty airport columns
+    empty = np.flatnonzero(count == 0)
+    airports = pd.concat([airports, pd.DataFrame({'city': empty})]).sort_values('city', kind='stable')
+    rows = city_columns.iloc[airports['city'].to_numpy()].reset_index(drop=True)
+    rows[AIRPORT_COLUMNS] = airports[AIRPORT_COLUMNS].to_numpy()
+    count = np.maximum(count, 1)
+    start = np.concatenate([[0], np.cumsum(count)[:-1]])
+    return rows, start, count
+
+
+def generate(path, events, cities=None, states=None, seed=0, chunk_size=200000, skew=1.1,
+             first_date='2024-01-01', days=548):
+    """Write a synthetic dataset with `events` events to `path` and return a summary dict.
+
+    `cities` defaults to one city per 200 events (at least 50); `chunk_size`
+    bounds the number of events formatted and written at a time.
+    """
+    cities = cities or max(50, events // 200)
+    state_frame, city_frame, airport_frame = generate_places(cities, states, seed)
+    rows, start, count = _city_rows(state_frame, city_frame, airport_frame)
+    located = event_cities(events, cities, skew, seed)
+    dates = event_dates(events, first_date, days, seed)
+    venue_lat, venue_lon = venue_locations(located, city_frame, seed)
+
+    written = 0
+    with open(path + '.tmp', 'w', newline='') as handle:
+        for first in range(0, events, chunk_size):
+            chunk = located[first:first + chunk_size]
+            # Expand every event into the rows of its city's airports
+            repeats = count[chunk]
+            offsets = np.arange(repeats.sum()) - np.repeat(np.cumsum(repeats) - repeats, repeats)
+            frame = rows.iloc[np.repeat(start[chunk], repeats) + offsets].reset_index(drop=True)
+            frame.insert(0, 'Event Number', np.repeat(np.arange(first + 1, first + len(chunk) + 1), repeats))
+            frame.insert(1, 'Event Date', np.repeat(dates[first:first + chunk_size], repeats))
+            frame.insert(2, 'Venue Latitude', np.repeat(venue_lat[first:first + chunk_size], repeats))
+            frame.insert(3, 'Venue Longitude', np.repeat(venue_lon[first:first + chunk_size], repeats))
+            frame[COLUMNS].to_csv(handle, header=first == 0, index=False)
+            written += len(frame)
+    os.replace(path + '.tmp', path)
+
+    return {'events': events, 'rows': written, 'cities': cities, 'states': len(state_frame),
+            'airports': len(airport_frame), 'busiest_city_events': int(np.bincount(located).max())}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Write a synthetic music events dataset for scale testing.')
+    parser.add_argument('output')
+    parser.add_argument('--events', type=int, default=1000000)
+    parser.add_argument('--cities', type=int)
+    parser.add_argument('--states', type=int)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--chunk-size', type=int, default=200000)
+    parser.add_argument('--skew', type=float, default=1.1, help='Zipf exponent of events per city')
+    parser.add_argument('--first-date', default='2024-01-01', help='first possible event date (ISO)')
+    parser.add_argument('--days', type=int, default=548, help='number of days the event dates are spread over')
+    parser.add_argument('--snapshot', metavar='DIR', help='also build a typed snapshot of the output in DIR')
+    args = parser.parse_args(argv)
+
+    summary = generate(args.output, args.events, args.cities, args.states, args.seed, args.chunk_size, args.skew,
+                       args.first_date, args.days)
+    if args.snapshot:
+        from event_analysis import snapshot
+        snapshot.build_snapshot(args.output, args.snapshot)
+    for name, value in summary.items():
+        print(f'{name}: {value}')
+
+
+if __name__ == '__main__':
+    main()
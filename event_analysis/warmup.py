@@ -0,0 +1,227 @@
+"""Precompute every artifact of pages 1-3 in a process pool when the app starts or the dataset changes.
+
+Without it, the first visitor of each page section paid for aggregating,
+fitting and building its figure. The page scripts call `ensure_started` on
+every run (a no-op once the current dataset version is done, or while there
+is no dataset yet; a failed warm-up is tried again after `RETRY_SECONDS`). It
+only looks up the dataset version and starts a background thread, which runs
+this module as a helper process; the helper loads the state and city
+summaries once, ships them to a pool of worker processes
+and builds there, in parallel:
+
+- the default view of both bar charts and the six relationship scatters
+  (`page_figures.default_figures`), as figure JSON;
+- the six OLS fits, one batch per level;
+- the Specific Search index.
+
+The helper writes them as one bundle, tagged with the dataset version, to a
+temporary file moved into place (`data_snapshot/warmup.pickle`). Once it is
+there, the app process publishes the whole bundle into the figure,
+regression and table caches at once, where the pages' ordinary lookups find
+it, but only if the dataset did not change meanwhile. A restarted server
+publishes an up-to-date bundle without rebuilding it. Page 1's overview
+counts and the summaries are loaded in the app process while the helper runs.
+
+The pool lives in a separate helper process because Streamlit installs the
+running page as the `__main__` module, which spawned workers would re-run.
+
+Set `WARMUP_WORKERS` to the number of worker processes (default: one per
+CPU, at most one per artifact), or to 0 to disable the warm-up. Usage (from
+the app root), to build the bundle ahead of time:
+
+    python -m event_analysis.warmup [--workers N] [--output PATH]
+"""
+import argparse
+import concurrent.futures
+import multiprocessing
+import os
+import pickle
+import subprocess
+import sys
+import threading
+import time
+
+from event_analysis import data_loader, figure_cache, page_figures, regression, snapshot
+
+WORKERS_ENV = 'WARMUP_WORKERS'
+BUNDLE_PATH = os.path.join(snapshot.SNAPSHOT_DIR, 'warmup.pickle')
+
+SUMMARIES = {'state_summary': data_loader.load_state_summary, 'city_summary': data_loader.load_city_summary}
+
+# Directory holding the `event_analysis` package, for the helper's import path
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# A warm-up that failed for a dataset version is tried again after this many seconds, not on every rerun
+RETRY_SECONDS = 300
+
+_lock = threading.Lock()
+_state = {'version': None, 'thread': None, 'report': None, 'failed_at': None}
+
+
+def tasks():
+    """Return the artifacts built by the workers, as (kind, *key) tuples."""
+    figures = [('figure', chart_id, params) for chart_id, params in page_figures.default_figures()]
+    fits = [('fits', level) for level in regression.PREDICTORS]
+    # The SQLite backend answers searches with queries on its own connection: nothing to prebuild
+    index = [('search_index',)] if data_loader.BACKEND == 'pandas' else []
+    return figures + fits + index
+
+
+def default_workers():
+    """Return the worker count from `WARMUP_WORKERS`, defaulting to one per CPU (at most one per artifact)."""
+    workers = os.environ.get(WORKERS_ENV)
+    return int(workers) if workers else min(os.cpu_count() or 1, len(tasks()))
+
+
+def _init_worker(version, summaries):
+    # Workers start from the summaries loaded once by the helper instead of each reloading the dataset
+    for name, summary in summaries.items():
+        data_loader.put(name, summary, version)
+
+
+def _build(task):
+    # Runs in a worker process
+    kind = task[0]
+    if kind == 'figure':
+        return page_figures.build(task[1], *task[2]).to_json()
+    if kind == 'fits':
+        return regression.get_fits(task[1])
+    return data_loader.load_search_index()
+
+
+def build_artifacts(workers=None):
+    """Build every artifact in a pool of `workers` processes; return (dataset version, {task: result})."""
+    version = data_loader.dataset_version()
+    summaries = {name: load() for name, load in SUMMARIES.items()}
+    todo = tasks()
+    with concurrent.futures.ProcessPoolExecutor(min(workers or default_workers(), len(todo)),
+                                                mp_context=multiprocessing.get_context('spawn'),
+                                                initializer=_init_worker, initargs=(version, summaries)) as pool:
+        futures = {task: pool.submit(_build, task) for task in todo}
+        return version, {task: future.result() for task, future in futures.items()}
+
+
+def write_bundle(path=BUNDLE_PATH, workers=None):
+    """Build every artifact and write them, with their dataset version, to `path`; return the number built."""
+    version, results = build_artifacts(workers)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path + '.tmp', 'wb') as handle:
+        pickle.dump({'version': version, 'results': results}, handle, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(path + '.tmp', path)
+    return len(results)
+
+
+def read_bundle(path=BUNDLE_PATH):
+    """Return the (version, results) of the bundle at `path`, or None when there is none or it is unreadable."""
+    try:
+        with open(path, 'rb') as handle:
+            bundle = pickle.load(handle)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+        return None
+    return bundle['version'], bundle['results']
+
+
+def publish(version, results):
+    """Put every result into the app's caches; return False without publishing if the dataset is not `version`."""
+    if data_loader.dataset_version() != version:
+        return False
+    for task, value in results.items():
+        if task[0] == 'figure':
+            figure_cache.figures.put(version, task[1], task[2], value)
+        elif task[0] == 'fits':
+            regression.put_fits(version, task[1], value)
+        elif data_loader.BACKEND == 'pandas':
+            data_loader.put('search_index', value, version)
+    return True
+
+
+def warm_up(workers=None, bundle_path=BUNDLE_PATH):
+    """Publish an up-to-date bundle, building it in a helper process first when needed; return a report dict.
+
+    The report has the dataset `version`, the number of `artifacts`, whether
+    the bundle was `built` or reused, the wall time in `seconds` and whether
+    it was `published` (False when the dataset changed while it was built).
+    """
+    start = time.perf_counter()
+    version = data_loader.dataset_version()
+    bundle = read_bundle(bundle_path)
+    built = bundle is None or bundle[0] != version
+    if built:
+        env = dict(os.environ, PYTHONPATH=APP_ROOT + os.pathsep + os.environ.get('PYTHONPATH', ''))
+        helper = subprocess.Popen([sys.executable, '-m', 'event_analysis.warmup', '--output', bundle_path,
+                                   '--workers', str(workers or default_workers())], env=env)
+        # Meanwhile, what the pages load in this process anyway
+        for load in list(SUMMARIES.values()) + [data_loader.load_overview_counts]:
+            load()
+        if helper.wait():
+            raise RuntimeError(f'The warm-up helper exited with status {helper.returncode}')
+        bundle = read_bundle(bundle_path)
+
+    if data_loader.BACKEND != 'pandas':
+        data_loader.load_search_index()
+    return {'version': bundle[0], 'artifacts': len(bundle[1]), 'built': built,
+            'seconds': time.perf_counter() - start, 'published': publish(*bundle)}
+
+
+def _run(workers, version):
+    try:
+        # The default worker count loads the summaries, so it is worked out here rather than on the page run
+        report = warm_up(workers or default_workers())
+    except Exception as error:
+        report = {'error': repr(error)}
+        print(f'Warm-up failed: {error!r}', file=sys.stderr)
+    with _lock:
+        _state['report'] = report
+        if _state['version'] == version:
+            _state['failed_at'] = time.monotonic() if 'error' in report else None
+
+
+def ensure_started(workers=None):
+    """Start a background warm-up unless one ran, or is running, for the current dataset version.
+
+    Returns True when a warm-up was started. Cheap enough to call on every page run, also before the
+    dataset exists (nothing is started then): the dataset is only touched in the background thread. A
+    warm-up that failed is tried again once `RETRY_SECONDS` have passed, or as soon as the dataset changes.
+    """
+    if workers is None and os.environ.get(WORKERS_ENV):
+        workers = int(os.environ[WORKERS_ENV])
+    if workers is not None and workers < 1:
+        return False
+    try:
+        version = data_loader.dataset_version()
+    except FileNotFoundError:
+        return False
+    with _lock:
+        failed_at = _state['failed_at']
+        if _state['version'] == version and (failed_at is None or time.monotonic() - failed_at < RETRY_SECONDS):
+            return False
+        _state.update(version=version, failed_at=None)
+        thread = _state['thread'] = threading.Thread(target=_run, args=(workers, version), name='warmup',
+                                                     daemon=True)
+    thread.start()
+    return True
+
+
+def wait(timeout=None):
+    """Wait for the running warm-up, if any, and return the report of the last one (None if none finished)."""
+    with _lock:
+        thread = _state['thread']
+    if thread is not None:
+        thread.join(timeout)
+    with _lock:
+        return _state['report']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build every page artifact in a process pool and write the bundle.')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--output', default=BUNDLE_PATH)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    count = write_bundle(args.output, args.workers)
+    print(f'Wrote {count} artifacts to {args.output} in {time.perf_counter() - start:.2f}s')
+
+
+if __name__ == '__main__':
+    main()
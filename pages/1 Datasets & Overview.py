@@ -1,9 +1,16 @@
 import streamlit as st
 import pandas as pd
 
+from event_analysis.data_loader import load_overview_counts, load_search_index
+from event_analysis.lookup import METRIC_LABELS
+from event_analysis.warmup import ensure_started
+
 # Add the page title
 st.title('Datasets & Overview')
 
+# Start precomputing every chart, fit and the search index in worker processes (once per dataset version)
+ensure_started()
+
 # Create 2 tabs for Description & Overview
 tabs = st.tabs(['Datasets Description','Data Overview','Specific Search'])
 
@@ -49,16 +56,12 @@ with tabs[0]:
 with tabs[1]:
     st.header('Data Overview')
 
-    # Load data
-    data = pd.read_csv('WANG_QING_final_data.csv')
-
-    # Calculate the number of unique states and cities
-    unique_states = data['State'].nunique()
-    unique_cities = data.groupby('State')['City'].nunique().sum()
-    
-    # Calculate the number of unique events and airports
-    unique_events = data['Event Number'].nunique() 
-    unique_airports = data['IATA'].nunique()  
+    # Load the number of unique states, cities, events and airports (cached; recomputed only when the file changes)
+    counts = load_overview_counts()
+    unique_states = counts['states']
+    unique_cities = counts['cities']
+    unique_events = counts['events']
+    unique_airports = counts['airports']
 
     # Add text message to display an overview of the data collected and import the above variables into the text
     st.markdown(f'''
@@ -128,21 +131,8 @@ with tabs[2]:
     
     # The following code creates an interactive tool that allows users to quickly access data for a specific state or city
 
-    # Calculate the number of unique events and airports per state
-    state_events = data.drop_duplicates(subset=['Event Number', 'State']).groupby('State').size()
-    state_airports = data.drop_duplicates(subset=['IATA', 'State']).groupby('State').size()
-
-    # Calculate the number of unique events and airports per city
-    city_events = data.drop_duplicates(subset=['Event Number', 'City', 'State']).groupby(['City', 'State']).size()
-    city_airports = data.drop_duplicates(subset=['IATA', 'City', 'State']).groupby(['City', 'State']).size()
-
-    # Clean up income data and convert it to integer format
-    data['Median Household Income_city'] = data['Median Household Income_city'].replace('[\$,]', '', regex=True).astype(int)
-    data['Median Household Income_state'] = data['Median Household Income_state'].replace('[\$,]', '', regex=True).astype(int)
-
-    # Update DataFrame storing economic indicators for states and cities
-    state_pop_income = data.drop_duplicates(subset='State').set_index('State')[['Population_state', 'Median Household Income_state']]
-    city_pop_income = data.drop_duplicates(subset=['City', 'State']).set_index(['City', 'State'])[['Population_city', 'Median Household Income_city']]
+    # Load the prebuilt search index (state -> sorted cities, state and (city, state) -> metrics), built once per dataset version
+    index = load_search_index()
 
 
     # add st.radio for users to selects analysis level: State or City
@@ -150,39 +140,25 @@ with tabs[2]:
 
     if level == 'State':
         # Add a dropdown menu for users to select a state
-        state = st.selectbox('Select a State:', sorted(data['State'].unique()))
-        # Retrieve the number of unique events for the selected state, defaulting to 0 if the state is not found
-        events_count_state = state_events.get(state, 0)
-        # Retrieve the number of unique airports for the selected state, defaulting to 0 if the state is not found
-        airports_count_state = state_airports.get(state, 0)
-        # Access the population and median household income for the selected state from the state_pop_income DataFrame
-        population_state, median_income_state = state_pop_income.loc[state]
+        state = st.selectbox('Select a State:', index.states)
+        # Look up the number of unique events and airports, population and median household income of the selected state
+        metrics = index.state(state)
 
         # Create a DataFrame to store and display the data
-        df = pd.DataFrame({
-            "Metric": ["Total Number of Events", "Population", "Median Household Income", "Number of Airports"],
-            "Value": [events_count_state, population_state, median_income_state, airports_count_state]
-        })
+        df = pd.DataFrame({"Metric": METRIC_LABELS, "Value": list(metrics)})
         # Display the table
         st.table(df.set_index('Metric'))
 
     elif level == 'City':
         # Add a dropdown menu to select a state, sorting the unique states alphabetically
-        state = st.selectbox('Select a State for City:', sorted(data['State'].unique()))
-        # Once a state is selected, provide a second dropdown to select a city from the selected state
-        city = st.selectbox('Select a City:', sorted(data[data['State'] == state]['City'].unique()))
-        # Retrieve the count of unique events for the selected city and state, defaulting to 0 if not found
-        events_count_city = city_events.get((city, state), 0)
-        # Retrieve the count of unique airports for the selected city and state, defaulting to 0 if not found
-        airports_count_city = city_airports.get((city, state), 0)
-        # Access the population and median household income for the selected city and state from the DataFrame
-        population_city, median_income_city = city_pop_income.loc[(city, state)]
+        state = st.selectbox('Select a State for City:', index.states)
+        # Once a state is selected, provide a second dropdown to select a city from the selected state (already sorted in the index)
+        city = st.selectbox('Select a City:', index.cities(state))
+        # Look up the number of unique events and airports, population and median household income of the selected city
+        metrics = index.city(city, state)
 
         # Create a DataFrame to store and display the data
-        df = pd.DataFrame({
-            "Metric": ["Total Number of Events", "Population", "Median Household Income", "Number of Airports"],
-            "Value": [events_count_city, population_city, median_income_city, airports_count_city]
-        })
+        df = pd.DataFrame({"Metric": METRIC_LABELS, "Value": list(metrics)})
         # Display the table
         st.table(df.set_index('Metric'))
 
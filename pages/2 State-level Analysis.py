@@ -1,7 +1,10 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import statsmodels.api as sm
+
+from event_analysis.page_figures import page_figure, page_map
+from event_analysis.models import get_fit
+from event_analysis.sections import (correlation_strength, date_filter, is_significant, map_focus, model_note,
+                                     model_options, open_section)
+from event_analysis.warmup import ensure_started
 
 # Add the page title
 st.title('State-level Analysis')
@@ -9,14 +12,21 @@ st.title('State-level Analysis')
 # Add the page intro using markdown
 st.markdown('''
             This page contains comprehensive examination of the factors influencing the distribution of music events across different states in the United States. 
-            <br> Four detailed **interactive visualizations** are featured in this page: **1 bar chart** illustrating the number of music events per state and **3 scatter plots with regression lines** analyzing the relationships between **state population**, **median household income**, **number of airports**, and **the number of music events**. 
+            <br> Five detailed **interactive visualizations** are featured in this page: **1 bar chart** illustrating the number of music events per state, **1 map** coloring each state by its number of music events and **3 scatter plots with regression lines** analyzing the relationships between **state population**, **median household income**, **number of airports**, and **the number of music events**. 
             <br> Each chart is paired with key statistics and thoughtful analyses to enhance the understanding of how various elements affect the music event landscape at the state level. Dive into the data to explore how demographics and infrastructure correlate with entertainment offerings across the states.
             ''', unsafe_allow_html=True)
 
 
 
-# load data file
-data = pd.read_csv('WANG_QING_final_data.csv')
+# Start precomputing every chart in worker processes (once per dataset version), so the sections open instantly
+ensure_started()
+
+# Add a date range filter (shown when the dataset has event dates); every chart below counts only the events in the range
+period = date_filter()
+
+# Add the model options of the relationship sections below (OLS on the raw counts by default); toggling them
+# refits from the cached design matrices, and every model is fitted once per dataset version
+options = model_options('state')
 
 
 
@@ -26,31 +36,12 @@ st.markdown("""
 #### **Bar Chart for Number of Music Events per State**
 """, unsafe_allow_html=True)
 
-# Create an expander, which users can click to view its contents
-expander1 = st.expander("Click to view")
-with expander1:
-    # Remove duplicate events to ensure each event is counted only once per state
-    unique_events_per_state = data.drop_duplicates(subset=['Event Number', 'State']).groupby('State').size()
-
-    # Sort the results in descending order to display the states with the most events at the top
-    unique_events_per_state_sorted = unique_events_per_state.sort_values(ascending=False)
-
-    # Create an interactive horizontal bar chart
-    fig = px.bar(unique_events_per_state_sorted, orientation='h',
-                 labels={'value': 'Number of Events', 'index': 'State'},
-                 title='Number of Music Events per State',
-                 color_discrete_sequence=['lightcoral'])
-
-    # Update the layout to improve the visual presentation
-    fig.update_layout(
-        xaxis_title='Number of Events',
-        yaxis_title='State',
-        height=800,  
-        width=800,   
-        margin=dict(l=0, r=0, t=50, b=0),  # Adjust chart margins
-        yaxis={'categoryorder': 'total ascending', 'tickangle': 0},
-        showlegend = False
-    )
+# Create a toggle, which users can click to view its contents;
+# the section is only computed once opened, and its figure is then reused until the dataset or the date range changes
+if open_section('state_events'):
+    # Reuse the figure cached for this dataset version (prebuilt by the start-up warm-up, or built on the first view)
+    fig = page_figure('state_events', period)
+
     # Plot the chart
     st.plotly_chart(fig, use_container_width=True)
 
@@ -83,42 +74,63 @@ with expander1:
 
 
 
-# Code for creating charts and analysis of the relationship between state population and number of events
+# Code for creating a map of the number of events of each state
 # Insert a Markdown header
 st.markdown("""
-#### **Relationship between State Population and Number of Music Events**
+#### **Map of Music Events per State**
 """, unsafe_allow_html=True)
 
-# Create an expander, which users can click to view its contents
-expander2 = st.expander("Click to view")
-with expander2:
-    # Remove duplicate events to ensure each event is counted only once per state
-    data_unique_events = data.drop_duplicates(subset=['Event Number', 'State'])
+# Create a toggle, which users can click to view its contents;
+# the section is only computed once opened, and its figure is then reused until the dataset or the date range changes
+if open_section('state_map'):
+    # Add a selector to zoom the map to one state, which is then drawn with more detailed outlines
+    focus = map_focus('state_map')
+
+    # Reuse the map cached for this dataset version, drawn from the local geometry cache (no map tiles are downloaded)
+    fig = page_map('state_map', focus, period)
+
+    if fig is None:
+        # Without the geometry cache, explain how to build it instead of drawing an empty map
+        st.info('The map needs the geometry cache. Build it from the Census state boundary and Gazetteer place files '
+                'with `python -m event_analysis.geo STATES PLACES` (see the README).')
+    else:
+        # Plot the map
+        st.plotly_chart(fig, use_container_width=True)
+
+        # Add the interactive instruction, styling for smaller, italic font in a specific color
+        st.markdown('''
+                    <style>
+                    .small-font {
+                        font-size: 14px;
+                        font-style: italic;
+                        color: lightcoral
+                    }
+                    </style>
+                    <div class="small-font">
+                    Hover over a state to view its number of events and airports. Use the zoom selector to view one state in more detail.
+                    </div>
+                    &nbsp;
+                    ''', unsafe_allow_html=True)
+
 
-    # Count the number of events per state
-    events_per_state = data_unique_events.groupby('State').size().reset_index(name='Number of Events')
 
-    # Ensure the population data is in integer format
-    if data['Population_state'].dtype == 'O':  # Object type, typically used for strings
-        data['Population_state'] = data['Population_state'].str.replace(',', '').astype(int)
-    elif data['Population_state'].dtype != 'int':
-        data['Population_state'] = data['Population_state'].astype(int)
 
-    # Obtain population data for each state, ensuring no duplicate state data
-    state_population = data.drop_duplicates(subset='State')[['State', 'Population_state']]
 
-    # Merge event data with population data
-    merged_data = pd.merge(events_per_state, state_population, on='State')
 
-    # Create a scatter plot with a regression line
-    fig = px.scatter(merged_data, x='Population_state', y='Number of Events', 
-                     trendline="ols", 
-                     labels={"Population_state": "State Population", "Number of Events": "Number of Music Events"},
-                     title="Relationship between State Population and Number of Music Events")
 
-    # Update plot aesthetics
-    fig.update_traces(marker=dict(color='lightcoral'), selector=dict(mode='markers'))
-    fig.update_traces(line=dict(color='lightcoral'), selector=dict(type='scatter', mode='lines'))
+
+# Code for creating charts and analysis of the relationship between state population and number of events
+# Insert a Markdown header
+st.markdown("""
+#### **Relationship between State Population and Number of Music Events**
+""", unsafe_allow_html=True)
+
+# Create a toggle, which users can click to view its contents;
+# the section is only computed once opened, and its figure is then reused until the dataset or the date range changes
+if open_section('state_population'):
+    # Reuse the figure cached for this dataset version (prebuilt by the start-up warm-up), and the cached fit for the statistics below
+    fig = page_figure('state_population', period, options)
+    fit = get_fit('state', 'Population_state', options, period)
 
     # Display the plot
     st.plotly_chart(fig, use_container_width=True)
@@ -138,18 +150,11 @@ with expander2:
                 &nbsp;
                 ''', unsafe_allow_html=True)
 
-    # Perform regression analysis using statsmodels to obtain detailed statistics
-    X = sm.add_constant(merged_data['Population_state'])  # Add a constant term
-    model = sm.OLS(merged_data['Number of Events'], X)
-    results = model.fit()
-
-    # Extract key statistical data
-    r_squared = results.rsquared
-    params = results.params
-    p_values = results.pvalues
-    slope = params['Population_state']
-    intercept = params['const']
-    p_value_slope = p_values['Population_state']
+    # Extract key statistical data from the cached fit
+    r_squared = fit.r_squared
+    slope = fit.slope
+    intercept = fit.intercept
+    p_value_slope = fit.p_value
 
     # Display key statistical data
     st.markdown(f'''
@@ -158,14 +163,18 @@ with expander2:
                 - Slope (coefficient for State Population): {slope:.10f}
                 - Intercept: {intercept:.3f}
                 - p-value for Slope: {p_value_slope:.10f}''')
+
+    # Name the model behind the statistics when it is not the default OLS fit
+    model_note(options, fit)
     
-    # Add analysis text
-    st.markdown('''
+    # Add analysis text, worded from the fit so it follows the key statistics above
+    direction = 'positive' if slope > 0 else 'negative'
+    st.markdown(f'''
                 ##### Analysis:
-                - The scatter plot, with a slope of 0.0001072983, indicates a **positive correlation** between state population and the number of music events
-                - The R² value of 0.436 suggests that approximately **44%** of the variability in the number of music events is explained by population size, highlighting a **moderate correlation**
-                - The extremely low p-value (0.0000002487) confirms that this relationship is **statistically significant** 
-                - Overall, this analysis indicates that state population size is a significant predictor of the number of music events, but there could be other substantial factors influencing the distribution of music events
+                - The scatter plot, with a slope of {slope:.10f}, indicates a **{direction} correlation** between state population and the number of music events
+                - The R² value of {r_squared:.3f} suggests that approximately **{r_squared:.0%}** of the variability in the number of music events is explained by population size, highlighting a **{correlation_strength(r_squared)} correlation**
+                - The p-value ({p_value_slope:.10f}) {'confirms that this relationship is **statistically significant**' if is_significant(fit) else 'shows that this relationship is **not statistically significant**'}
+                - Overall, this analysis indicates that state population size is {'a significant' if is_significant(fit) else 'not a significant'} predictor of the number of music events, but there could be other substantial factors influencing the distribution of music events
                 ''')
 
 
@@ -182,30 +191,12 @@ st.markdown("""
 #### **Relationship between Median Household Income and Number of Music Events per State**
 """, unsafe_allow_html=True)
 
-# Create an expander, which users can click to view its contents
-expander3 = st.expander("Click to view")
-with expander3:
-    # Ensure median household income data is in integer format and handle possible formatting issues
-    if data['Median Household Income_state'].dtype == 'O':  # Object type
-        data['Median Household Income_state'] = data['Median Household Income_state'].str.replace(',', '').str.replace('$', '').astype(int)
-    elif data['Median Household Income_state'].dtype != 'int':
-        data['Median Household Income_state'] = data['Median Household Income_state'].astype(int)
-
-    # Obtain median household income data for each state, ensuring no duplicate state data
-    state_income = data.drop_duplicates(subset='State')[['State', 'Median Household Income_state']]
-
-    # Merge event data with income data
-    merged_data = pd.merge(events_per_state, state_income, on='State')
-
-    # Create a scatter plot with a regression line
-    fig = px.scatter(merged_data, x='Median Household Income_state', y='Number of Events', 
-                     trendline="ols", 
-                     labels={"Median Household Income_state": "Median Household Income", "Number of Events": "Number of Music Events"},
-                     title="Relationship between Median Household Income and Number of Music Events per State")
-
-    # Update plot aesthetics
-    fig.update_traces(marker=dict(color='lightcoral'), selector=dict(mode='markers'))
-    fig.update_traces(line=dict(color='lightcoral'), selector=dict(type='scatter', mode='lines'))
+# Create a toggle, which users can click to view its contents;
+# the section is only computed once opened, and its figure is then reused until the dataset or the date range changes
+if open_section('state_income'):
+    # Reuse the figure cached for this dataset version (prebuilt by the start-up warm-up), and the cached fit for the statistics below
+    fig = page_figure('state_income', period, options)
+    fit = get_fit('state', 'Median Household Income_state', options, period)
 
     # Display the plot
     st.plotly_chart(fig, use_container_width=True)
@@ -225,18 +216,11 @@ with expander3:
                 &nbsp;
                 ''', unsafe_allow_html=True)
 
-    # Perform regression analysis using statsmodels to obtain detailed statistics
-    X = sm.add_constant(merged_data['Median Household Income_state'])  # add constant term
-    model = sm.OLS(merged_data['Number of Events'], X)
-    results = model.fit()
-
-    # Extract key statistical data
-    r_squared = results.rsquared
-    params = results.params
-    p_values = results.pvalues
-    slope = params['Median Household Income_state']
-    intercept = params['const']
-    p_value_slope = p_values['Median Household Income_state']
+    # Extract key statistical data from the cached fit
+    r_squared = fit.r_squared
+    slope = fit.slope
+    intercept = fit.intercept
+    p_value_slope = fit.p_value
 
     # Display key statistical data
     st.markdown(f'''
@@ -245,14 +229,18 @@ with expander3:
                 - Slope (coefficient for State Median Household Income): {slope:.10f}
                 - Intercept: {intercept:.3f}
                 - p-value for Slope: {p_value_slope:.10f}''')
+
+    # Name the model behind the statistics when it is not the default OLS fit
+    model_note(options, fit)
     
-    # Add analysis text
-    st.markdown('''
+    # Add analysis text, worded from the fit so it follows the key statistics above
+    direction = 'positive' if slope > 0 else 'negative'
+    st.markdown(f'''
                 ##### Analysis:
-                - The scatter plot shows a very slight positive slope (0.0177235229), suggesting a **weak positive correlation** where higher median incomes are associated with a slight increase in the number of music events
-                - The R² value of 0.029 indicates that only about **2.9%** of the variability in the number of music events can be explained by differences in median household income. This low percentage points to a **very weak correlation**
-                - Additionally, the p-value for the slope is 0.2405559097, which is **not statistically significant**
-                - Overall, this analysis suggests that state median household income is not a strong predictor of the number of music events
+                - The scatter plot shows a {direction} slope ({slope:.10f}), suggesting a **{correlation_strength(r_squared)} {direction} correlation** where higher median incomes are associated with {'an increase' if slope > 0 else 'a decrease'} in the number of music events
+                - The R² value of {r_squared:.3f} indicates that about **{r_squared:.1%}** of the variability in the number of music events can be explained by differences in median household income. This points to a **{correlation_strength(r_squared)} correlation**
+                - Additionally, the p-value for the slope is {p_value_slope:.10f}, which is **{'statistically significant' if is_significant(fit) else 'not statistically significant'}**
+                - Overall, this analysis suggests that state median household income is {'a significant' if is_significant(fit) else 'not a strong'} predictor of the number of music events
                 ''')
 
 
@@ -268,27 +256,12 @@ st.markdown("""
 #### **Relationship between Number of Airports and Number of Music Events per State**
 """, unsafe_allow_html=True)
 
-# Create an expander, which users can click to view its contents
-expander4 = st.expander("Click to view")
-with expander4:
-    # Remove duplicate airport data to ensure that each airport is only counted once
-    data_unique_airports = data.drop_duplicates(subset=['IATA', 'State'])
-
-    # Count the number of airports in each state
-    airports_per_state = data_unique_airports.groupby('State').size().reset_index(name='Number of Airports')
-
-    # Merge event data and airport data
-    merged_data = pd.merge(events_per_state, airports_per_state, on='State')
-
-    # Create a scatter plot with a regression line
-    fig = px.scatter(merged_data, x='Number of Airports', y='Number of Events', 
-                     trendline="ols", 
-                     labels={"Number of Airports": "Number of Airports", "Number of Events": "Number of Music Events"},
-                     title="Relationship between Number of Airports and Number of Music Events per State")
-
-    # Update plot aesthetics
-    fig.update_traces(marker=dict(color='lightcoral'), selector=dict(mode='markers'))
-    fig.update_traces(line=dict(color='lightcoral'), selector=dict(type='scatter', mode='lines'))
+# Create a toggle, which users can click to view its contents;
+# the section is only computed once opened, and its figure is then reused until the dataset or the date range changes
+if open_section('state_airports'):
+    # Reuse the figure cached for this dataset version (prebuilt by the start-up warm-up), and the cached fit for the statistics below
+    fig = page_figure('state_airports', period, options)
+    fit = get_fit('state', 'Number of Airports', options, period)
 
     # Display the plot
     st.plotly_chart(fig, use_container_width=True)
@@ -308,18 +281,11 @@ with expander4:
                 &nbsp;
                 ''', unsafe_allow_html=True)
 
-    # Perform regression analysis using statsmodels to obtain detailed statistics
-    X = sm.add_constant(merged_data['Number of Airports'])  # add constant term
-    model = sm.OLS(merged_data['Number of Events'], X)
-    results = model.fit()
-
-    # Extract key statistical data
-    r_squared = results.rsquared
-    params = results.params
-    p_values = results.pvalues
-    slope = params['Number of Airports']
-    intercept = params['const']
-    p_value_slope = p_values['Number of Airports']
+    # Extract key statistical data from the cached fit
+    r_squared = fit.r_squared
+    slope = fit.slope
+    intercept = fit.intercept
+    p_value_slope = fit.p_value
 
     # Display key statistical data
     st.markdown(f'''
@@ -328,12 +294,16 @@ with expander4:
                 - Slope (coefficient for Number of Airports in a State): {slope:.10f}
                 - Intercept: {intercept:.3f}
                 - p-value for Slope: {p_value_slope:.10f}''')
+
+    # Name the model behind the statistics when it is not the default OLS fit
+    model_note(options, fit)
     
-    # Add analysis text
-    st.markdown('''
+    # Add analysis text, worded from the fit so it follows the key statistics above
+    direction = 'positive' if slope > 0 else 'negative'
+    st.markdown(f'''
                 ##### Analysis:
-                - The scatter plot displays a strong positive slope (85.2325497393), indicating a **positive correlation** where states with more airports host a notably higher number of music events
-                - The R² value of 0.430 implies that approximately **43%** of the variability in the number of music events can be explained by the number of airports in a state, highlighting a **moderate correlation**
-                - The p-value for the slope is extremely low (0.0000003114), confirming that the correlation is **statistically significant**
-                - Overall, this analysis suggests that the number of airports in a state is a clear predictor of the number of music events, but there could be other substantial factors as well
+                - The scatter plot displays a {direction} slope ({slope:.10f}), indicating a **{direction} correlation** where states with more airports host {'a higher' if slope > 0 else 'a lower'} number of music events
+                - The R² value of {r_squared:.3f} implies that approximately **{r_squared:.0%}** of the variability in the number of music events can be explained by the number of airports in a state, highlighting a **{correlation_strength(r_squared)} correlation**
+                - The p-value for the slope ({p_value_slope:.10f}) {'confirms that the correlation is **statistically significant**' if is_significant(fit) else 'shows that the correlation is **not statistically significant**'}
+                - Overall, this analysis suggests that the number of airports in a state is {'a significant' if is_significant(fit) else 'not a significant'} predictor of the number of music events, but there could be other substantial factors as well
                 ''')
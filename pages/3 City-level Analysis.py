@@ -1,7 +1,10 @@
-import pandas as pd
-import plotly.express as px
 import streamlit as st
-import statsmodels.api as sm
+
+from event_analysis.page_figures import city_ranking, page_figure, page_map, scatter_available
+from event_analysis.models import get_fit
+from event_analysis.sections import (correlation_strength, date_filter, is_significant, map_focus, model_note,
+                                     model_options, open_section)
+from event_analysis.warmup import ensure_started
 
 # Add the page title
 st.title('City-level Analysis')
@@ -9,14 +12,21 @@ st.title('City-level Analysis')
 # Add the page intro using markdown
 st.markdown('''
             Similar to the State-level Analysis, this page offers an in-depth analysis at the factors that influence the distribution of music events across various cities in the United States. 
-            <br> This page features four **interactive visualizations** as well: **1 bar chart** illustrating the number of music events per city and **3 scatter plots with regression lines**. These plots also examine the relationships between **city population**, **median household income**, **the number of airports**, and **the number of music events**. 
+            <br> This page features five **interactive visualizations** as well: **1 bar chart** illustrating the number of music events per city, **1 map** placing each city as a bubble sized by its number of music events and **3 scatter plots with regression lines**. These plots also examine the relationships between **city population**, **median household income**, **the number of airports**, and **the number of music events**. When the dataset has venue and airport coordinates, **2 more scatter plots** relate the number of music events to the **airports within 50 km** of a city and its **distance to the nearest airport**, which count airports by location rather than by the name of the city they serve. 
             <br> Each chart is equipped with key statistics and comprehensive analyses to enhance the understanding of how various elements affect the urban music event landscape. Explore the data to see how demographics and city infrastructure correlate with entertainment offerings across cities.
             ''', unsafe_allow_html=True)
 
 
 
-## load data file
-data = pd.read_csv('WANG_QING_final_data.csv')
+# Start precomputing every chart in worker processes (once per dataset version), so the sections open instantly
+ensure_started()
+
+# Add a date range filter (shown when the dataset has event dates); every chart below counts only the events in the range
+period = date_filter()
+
+# Add the model options of the relationship sections below (OLS on the raw counts by default); toggling them
+# refits from the cached design matrices, and every model is fitted once per dataset version
+options = model_options('city')
 
 
 
@@ -27,34 +37,21 @@ st.markdown("""
 #### **Bar Chart for Number of Music Events per City**
 """, unsafe_allow_html=True)
 
-# Create an expander, which users can click to view its contents
-expander1 = st.expander("Click to view")
-with expander1:
-    # Remove duplicate activities to ensure each event is only counted once in its corresponding city and state
-    unique_events_per_city = data.drop_duplicates(subset=['Event Number', 'City', 'State']).groupby(['City', 'State']).size().reset_index(name='Number of Events')
-
-    # Sort the results in descending order
-    unique_events_per_city_sorted = unique_events_per_city.sort_values(by='Number of Events', ascending=False)
-
-    # Create a new column for the Y-axis labels of the chart, including city and state names
-    unique_events_per_city_sorted['City_State'] = unique_events_per_city_sorted['City'] + ', ' + unique_events_per_city_sorted['State']
-
-    # Create an interactive horizontal bar chart
-    fig = px.bar(unique_events_per_city_sorted, x='Number of Events', y='City_State', orientation='h',
-                 labels={'Number of Events': 'Number of Events', 'City_State': 'City, State'},
-                 title='Number of Music Events per City',
-                 color_discrete_sequence=['lightcoral'])
-
-    # Update the layout to improve the visual presentation
-    fig.update_layout(
-        xaxis_title='Number of Events',
-        yaxis_title='City, State',
-        height=1200,  
-        width=800,
-        margin=dict(l=0, r=0, t=50, b=0),
-        yaxis={'categoryorder': 'total ascending', 'tickangle': 0},
-        showlegend=False
-    )
+# Create a toggle, which users can click to view its contents;
+# the section is only computed once opened, and its figure is then reused until the dataset or the date range changes
+if open_section('city_events'):
+    # Add a search box and a page size selector, so only a window of the ranking is drawn
+    search_col, size_col = st.columns([3, 1])
+    query = search_col.text_input('Search for a city or state')
+    page_size = size_col.selectbox('Cities per page', [25, 50, 100])
+
+    # Add a page selector when the ranking does not fit on one page
+    page_count = max(1, -(-len(city_ranking(query, period)) // page_size))
+    page = st.number_input(f'Page (of {page_count})', min_value=1, max_value=page_count, value=1) if page_count > 1 else 1
+
+    # Reuse the figure cached for this dataset version (prebuilt by the start-up warm-up, or built on the first view)
+    fig = page_figure('city_events', query, page, page_size, period)
+
     # Plot the chart
     st.plotly_chart(fig, use_container_width=True)
 
@@ -69,7 +66,7 @@ with expander1:
                 }
                 </style>
                 <div class="small-font">
-                Hover over the bar to view specific data for each city.
+                Hover over the bar to view specific data for each city. Use the search box and page selector to browse all cities.
                 </div>
                 &nbsp;
                 ''', unsafe_allow_html=True)
@@ -87,33 +84,63 @@ with expander1:
 
 
 
-# Code for creating charts and analysis of the relationship between city population and number of events
+# Code for creating a map of the number of events of each city
 # Insert a Markdown header
 st.markdown("""
-#### **Relationship between City Population and Number of Music Events**
+#### **Map of Music Events per City**
 """, unsafe_allow_html=True)
 
-# Create an expander, which users can click to view its contents
-expander2 = st.expander("Click to view")
-with expander2:
-    # Remove duplicate events to ensure each event is counted only once per city
-    unique_events_per_city = data.drop_duplicates(subset=['Event Number', 'City']).groupby('City').size().reset_index(name='Number of Events')
-    
-    # Get population data for each city (make sure there are no duplicate city data)
-    city_population = data.drop_duplicates(subset='City')[['City', 'Population_city']]
+# Create a toggle, which users can click to view its contents;
+# the section is only computed once opened, and its figure is then reused until the dataset or the date range changes
+if open_section('city_map'):
+    # Add a selector to zoom the map to one state, which is then drawn with more detailed outlines
+    focus = map_focus('city_map')
+
+    # Reuse the map cached for this dataset version, drawn from the local geometry cache (no map tiles are downloaded)
+    fig = page_map('city_map', focus, period)
+
+    if fig is None:
+        # Without the geometry cache, explain how to build it instead of drawing an empty map
+        st.info('The map needs the geometry cache. Build it from the Census state boundary and Gazetteer place files '
+                'with `python -m event_analysis.geo STATES PLACES` (see the README).')
+    else:
+        # Plot the map
+        st.plotly_chart(fig, use_container_width=True)
+
+        # Add the interactive instruction, styling for smaller, italic font in a specific color
+        st.markdown('''
+                    <style>
+                    .small-font {
+                        font-size: 14px;
+                        font-style: italic;
+                        color: lightcoral
+                    }
+                    </style>
+                    <div class="small-font">
+                    Hover over a bubble to view specific data for each city; bubble areas are proportional to the number of events. Use the zoom selector to view the cities of one state.
+                    </div>
+                    &nbsp;
+                    ''', unsafe_allow_html=True)
+
 
-    # Merge event data with population data
-    merged_data = pd.merge(unique_events_per_city, city_population, on='City')
 
-    # Create a scatter plot with a regression line
-    fig = px.scatter(merged_data, x='Population_city', y='Number of Events',
-                     trendline="ols",
-                     labels={"Population_city": "City Population", "Number of Events": "Number of Music Events"},
-                     title="Relationship between City Population and Number of Music Events")
 
-    # Update plot aesthetics
-    fig.update_traces(marker=dict(color='lightcoral'), selector=dict(mode='markers'))
-    fig.update_traces(line=dict(color='lightcoral'), selector=dict(type='scatter', mode='lines'))
+
+
+
+
+# Code for creating charts and analysis of the relationship between city population and number of events
+# Insert a Markdown header
+st.markdown("""
+#### **Relationship between City Population and Number of Music Events**
+""", unsafe_allow_html=True)
+
+# Create a toggle, which users can click to view its contents;
+# the section is only computed once opened, and its figure is then reused until the dataset or the date range changes
+if open_section('city_population'):
+    # Reuse the figure cached for this dataset version (prebuilt by the start-up warm-up), and the cached fit for the statistics below
+    fig = page_figure('city_population', period, options)
+    fit = get_fit('city', 'Population_city', options, period)
 
     # Display the plot
     st.plotly_chart(fig, use_container_width=True)
@@ -133,18 +160,11 @@ with expander2:
                 &nbsp;
                 ''', unsafe_allow_html=True)
 
-    # Perform regression analysis using statsmodels to obtain detailed statistics
-    X = sm.add_constant(merged_data['Population_city'])  # add constant term
-    model = sm.OLS(merged_data['Number of Events'], X)
-    results = model.fit()
-
-    # Extract key statistical data
-    r_squared = results.rsquared
-    params = results.params
-    p_values = results.pvalues
-    slope = params['Population_city']
-    intercept = params['const']
-    p_value_slope = p_values['Population_city']
+    # Extract key statistical data from the cached fit
+    r_squared = fit.r_squared
+    slope = fit.slope
+    intercept = fit.intercept
+    p_value_slope = fit.p_value
 
     # Display key statistical data
     st.markdown(f'''
@@ -153,14 +173,18 @@ with expander2:
                 - Slope (coefficient for City Population): {slope:.10f}
                 - Intercept: {intercept:.3f}
                 - p-value for Slope: {p_value_slope:.10f}''')
+
+    # Name the model behind the statistics when it is not the default OLS fit
+    model_note(options, fit)
     
-    # Add analysis text
-    st.markdown('''
+    # Add analysis text, worded from the fit so it follows the key statistics above
+    direction = 'positive' if slope > 0 else 'negative'
+    st.markdown(f'''
                 ##### Analysis
-                - The scatter plot reveals a positive slope (0.001), showing a **positive correlation** where cities with greater populations tend to have more music events
-                - The R² value of 0.318 indicates that about **32%** of the variation in music event numbers is accounted for by the size of the city population, which points to a **moderate correlation**
-                - The p-value for the slope, being extremely low (0.0000000000), verifies that this correlation is **statistically significant**
-                - Overall, this analysis indicates that the city population is a significant predictor of its music event frequency, though other important factors might also influence this outcome
+                - The scatter plot reveals a {direction} slope ({slope:.3f}), showing a **{direction} correlation** where cities with greater populations tend to have {'more' if slope > 0 else 'fewer'} music events
+                - The R² value of {r_squared:.3f} indicates that about **{r_squared:.0%}** of the variation in music event numbers is accounted for by the size of the city population, which points to a **{correlation_strength(r_squared)} correlation**
+                - The p-value for the slope ({p_value_slope:.10f}) {'verifies that this correlation is **statistically significant**' if is_significant(fit) else 'shows that this correlation is **not statistically significant**'}
+                - Overall, this analysis indicates that the city population is {'a significant' if is_significant(fit) else 'not a significant'} predictor of its music event frequency, though other important factors might also influence this outcome
                 ''')
 
 
@@ -176,27 +200,12 @@ st.markdown("""
 #### **Relationship between Median Household Income and Number of Music Events per City**
 """, unsafe_allow_html=True)
 
-# Create an expander, which users can click to view its contents
-expander3 = st.expander("Click to view")
-with expander3:
-    # Clean data: remove currency symbols and commas, and convert to numeric type
-    data['Median Household Income_city'] = pd.to_numeric(data['Median Household Income_city'].replace('[\$,]', '', regex=True))
-
-    # Obtain median household income data for each state, ensuring no duplicate state data
-    city_income = data.drop_duplicates(subset='City')[['City', 'Median Household Income_city']]
-
-    # Merge event data with income data
-    merged_data = pd.merge(unique_events_per_city, city_income, on='City')
-
-    # Create a scatter plot with a regression line
-    fig = px.scatter(merged_data, x='Median Household Income_city', y='Number of Events',
-                     trendline="ols",
-                     labels={"Median Household Income_city": "Median Household Income", "Number of Events": "Number of Music Events"},
-                     title="Relationship between Median Household Income and Number of Music Events per City")
-
-    # Update plot aesthetics
-    fig.update_traces(marker=dict(color='lightcoral'), selector=dict(mode='markers'))
-    fig.update_traces(line=dict(color='lightcoral'), selector=dict(type='scatter', mode='lines'))
+# Create a toggle, which users can click to view its contents;
+# the section is only computed once opened, and its figure is then reused until the dataset or the date range changes
+if open_section('city_income'):
+    # Reuse the figure cached for this dataset version (prebuilt by the start-up warm-up), and the cached fit for the statistics below
+    fig = page_figure('city_income', period, options)
+    fit = get_fit('city', 'Median Household Income_city', options, period)
 
     # Display the plot
     st.plotly_chart(fig, use_container_width=True)
@@ -216,18 +225,11 @@ with expander3:
                 &nbsp;
                 ''', unsafe_allow_html=True)
     
-    # Perform regression analysis using statsmodels to obtain detailed statistics
-    X = sm.add_constant(merged_data['Median Household Income_city'])  # add constant term
-    model = sm.OLS(merged_data['Number of Events'], X)
-    results = model.fit()
-
-    # Extract key statistical data
-    r_squared = results.rsquared
-    params = results.params
-    p_values = results.pvalues
-    slope = params['Median Household Income_city']
-    intercept = params['const']
-    p_value_slope = p_values['Median Household Income_city']
+    # Extract key statistical data from the cached fit
+    r_squared = fit.r_squared
+    slope = fit.slope
+    intercept = fit.intercept
+    p_value_slope = fit.p_value
 
     # Display key statistical data
     st.markdown(f'''
@@ -236,14 +238,18 @@ with expander3:
                 - Slope (coefficient for City Median Household Income): {slope:.10f}
                 - Intercept: {intercept:.3f}
                 - p-value for Slope: {p_value_slope:.10f}''')
+
+    # Name the model behind the statistics when it is not the default OLS fit
+    model_note(options, fit)
     
-    # Add analysis text
-    st.markdown('''
+    # Add analysis text, worded from the fit so it follows the key statistics above
+    direction = 'positive' if slope > 0 else 'negative'
+    st.markdown(f'''
                 ##### Analysis
-                - The scatter plot reveals a slight positive slope (0.004), indicating a **weak positive correlation** where cities with higher median household incomes tend to have slightly more music events
-                - The R² value of 0.029 indicates that only about **2.9%** of the variation in the number of music events can be explained by median household income, pointing to a very **weak correlation**
-                - The p-value for the slope is 0.0027506150, suggesting that while the correlation is **statistically significant**
-                - Overall, this analysis implies that median household income has little influence on the number of music events in a city, it is not a strong predictor compared to other potential influences
+                - The scatter plot reveals a {direction} slope ({slope:.3f}), indicating a **{direction} correlation** where cities with higher median household incomes tend to have {'more' if slope > 0 else 'fewer'} music events
+                - The R² value of {r_squared:.3f} indicates that only about **{r_squared:.1%}** of the variation in the number of music events can be explained by median household income, pointing to a **{correlation_strength(r_squared)} correlation**
+                - The p-value for the slope is {p_value_slope:.10f}, suggesting that the correlation is {'**statistically significant**' if is_significant(fit) else '**not statistically significant**'}
+                - Overall, this analysis implies that median household income {'has some' if is_significant(fit) else 'has little'} influence on the number of music events in a city, and with a {correlation_strength(r_squared)} correlation it should be weighed against other potential influences
                 ''')
 
 
@@ -257,25 +263,12 @@ st.markdown("""
 #### **Relationship between Number of Airports and Number of Music Events per City**
 """, unsafe_allow_html=True)
 
-# Create an expander, which users can click to view its contents
-expander4 = st.expander("Click to view")
-with expander4:
-    # Remove duplicate airport data to ensure that each airport is only counted once
-    unique_airports_per_city = data.drop_duplicates(subset=['IATA', 'City']).groupby('City').size().reset_index(name='Number of Airports')
-
-    # Count the number of airports in each state
-    merged_data = pd.merge(unique_events_per_city, unique_airports_per_city, on='City', how='left')
-    merged_data['Number of Airports'] = merged_data['Number of Airports'].fillna(0)  # 处理没有机场的城市
-
-    # Create a scatter plot with a regression line
-    fig = px.scatter(merged_data, x='Number of Airports', y='Number of Events',
-                     trendline="ols",
-                     labels={"Number of Airports": "Number of Airports", "Number of Events": "Number of Music Events"},
-                     title="Relationship between Number of Airports and Number of Music Events per City")
-
-    # Update plot aesthetics
-    fig.update_traces(marker=dict(color='lightcoral'), selector=dict(mode='markers'))
-    fig.update_traces(line=dict(color='lightcoral'), selector=dict(type='scatter', mode='lines'))
+# Create a toggle, which users can click to view its contents;
+# the section is only computed once opened, and its figure is then reused until the dataset or the date range changes
+if open_section('city_airports'):
+    # Reuse the figure cached for this dataset version (prebuilt by the start-up warm-up), and the cached fit for the statistics below
+    fig = page_figure('city_airports', period, options)
+    fit = get_fit('city', 'Number of Airports', options, period)
 
     # Display the plot
     st.plotly_chart(fig, use_container_width=True)
@@ -295,18 +288,11 @@ with expander4:
                 &nbsp;
                 ''', unsafe_allow_html=True)
     
-    # Perform regression analysis using statsmodels to obtain detailed statistics
-    X = sm.add_constant(merged_data['Number of Airports'])  # add constant term
-    model = sm.OLS(merged_data['Number of Events'], X)
-    results = model.fit()
-
-    # Extract key statistical data
-    r_squared = results.rsquared
-    params = results.params
-    p_values = results.pvalues
-    slope = params['Number of Airports']
-    intercept = params['const']
-    p_value_slope = p_values['Number of Airports']
+    # Extract key statistical data from the cached fit
+    r_squared = fit.r_squared
+    slope = fit.slope
+    intercept = fit.intercept
+    p_value_slope = fit.p_value
 
     # Display key statistical data
     st.markdown(f'''
@@ -316,11 +302,131 @@ with expander4:
             - Intercept: {intercept:.3f}
             - p-value for Slope: {p_value_slope:.10f}''')
 
-    # Add analysis text
-    st.markdown('''
+    # Name the model behind the statistics when it is not the default OLS fit
+    model_note(options, fit)
+
+    # Add analysis text, worded from the fit so it follows the key statistics above
+    direction = 'positive' if slope > 0 else 'negative'
+    st.markdown(f'''
                 ##### Analysis
-                - The scatter plot displays a positive slope (205.3603729343), suggesting a **positive correlation** where cities with a greater number of airports tend to host more music events
-                - The R² value of 0.187 indicates that approximately **18.7%** of the variability in the number of music events can be explained by the number of airports in a city, pointing to a **weak correlation**
-                - The p-value for the slope is extremely low (0.0000000000), confirming that this correlation is **statistically significant**
-                - Overall, this analysis suggests that the presence of airports in a city has a certain impact on the number of music events, although it accounts for less than a fifth of the variation in event frequency. This implies that other factors also play significant roles in determining the distribution of music events in cities
-                ''')
\ No newline at end of file
+                - The scatter plot displays a {direction} slope ({slope:.10f}), suggesting a **{direction} correlation** where cities with a greater number of airports tend to host {'more' if slope > 0 else 'fewer'} music events
+                - The R² value of {r_squared:.3f} indicates that approximately **{r_squared:.1%}** of the variability in the number of music events can be explained by the number of airports in a city, pointing to a **{correlation_strength(r_squared)} correlation**
+                - The p-value for the slope is {p_value_slope:.10f}, {'confirming that this correlation is **statistically significant**' if is_significant(fit) else 'so this correlation is **not statistically significant**'}
+                - Overall, this analysis suggests that the presence of airports in a city {'has a certain' if is_significant(fit) else 'has no clear'} impact on the number of music events, and it accounts for {r_squared:.1%} of the variation in event frequency. This implies that other factors also play significant roles in determining the distribution of music events in cities
+                ''')
+
+
+
+
+
+
+
+# Code for creating chart and analysis of the relationship between the number of airports within 50 km of the city and number of events
+# The section needs venue and airport coordinates, which datasets collected before them do not have
+if scatter_available('city_airports_nearby'):
+    # Insert a Markdown header
+    st.markdown("""
+    #### **Relationship between Airports within 50 km and Number of Music Events per City**
+    """, unsafe_allow_html=True)
+
+    # Create a toggle, which users can click to view its contents;
+    # the section is only computed once opened, and its figure is then reused until the dataset or the date range changes
+    if open_section('city_airports_nearby'):
+        # Reuse the figure cached for this dataset version (prebuilt by the start-up warm-up), and the cached fit for the statistics below
+        fig = page_figure('city_airports_nearby', period, options)
+        fit = get_fit('city', 'Airports within 50 km', options, period)
+
+        # Display the plot
+        st.plotly_chart(fig, use_container_width=True)
+
+        # Add the interactive instruction, styling for smaller, italic font in a specific color
+        st.markdown('''
+                    <style>
+                    .small-font {
+                        font-size: 14px;
+                        font-style: italic;
+                        color: lightcoral
+                    }
+                    </style>
+                    <div class="small-font">
+                    Hover over the points and the regression line to view specific data.
+                    </div>
+                    &nbsp;
+                    ''', unsafe_allow_html=True)
+
+        # Display key statistical data from the cached fit
+        st.markdown(f'''
+                    **Key Statistics:**
+                    - R² value: {fit.r_squared:.3f}
+                    - Slope (coefficient for Airports within 50 km of a City): {fit.slope:.10f}
+                    - Intercept: {fit.intercept:.3f}
+                    - p-value for Slope: {fit.p_value:.10f}
+                    - Cities with venue coordinates: {fit.n:,}''')
+
+        # Name the model behind the statistics when it is not the default OLS fit
+        model_note(options, fit)
+
+        # Add a note on reading the chart
+        st.markdown('''
+                    ##### How to read this chart
+                    - Unlike the number of airports above, this count includes every airport within 50 km of the city's venues, whatever city the airport is listed under, so the suburbs of a hub are no longer counted as having no airport
+                    - A **positive slope** means that cities with more airports nearby tend to host more music events
+                    ''')
+
+
+
+
+
+
+
+# Code for creating chart and analysis of the relationship between the distance from the city to its nearest airport and number of events
+# The section needs venue and airport coordinates, which datasets collected before them do not have
+if scatter_available('city_airport_distance'):
+    # Insert a Markdown header
+    st.markdown("""
+    #### **Relationship between Distance to the Nearest Airport and Number of Music Events per City**
+    """, unsafe_allow_html=True)
+
+    # Create a toggle, which users can click to view its contents;
+    # the section is only computed once opened, and its figure is then reused until the dataset or the date range changes
+    if open_section('city_airport_distance'):
+        # Reuse the figure cached for this dataset version (prebuilt by the start-up warm-up), and the cached fit for the statistics below
+        fig = page_figure('city_airport_distance', period, options)
+        fit = get_fit('city', 'Distance to Nearest Airport (km)', options, period)
+
+        # Display the plot
+        st.plotly_chart(fig, use_container_width=True)
+
+        # Add the interactive instruction, styling for smaller, italic font in a specific color
+        st.markdown('''
+                    <style>
+                    .small-font {
+                        font-size: 14px;
+                        font-style: italic;
+                        color: lightcoral
+                    }
+                    </style>
+                    <div class="small-font">
+                    Hover over the points and the regression line to view specific data.
+                    </div>
+                    &nbsp;
+                    ''', unsafe_allow_html=True)
+
+        # Display key statistical data from the cached fit
+        st.markdown(f'''
+                    **Key Statistics:**
+                    - R² value: {fit.r_squared:.3f}
+                    - Slope (coefficient for Distance to the Nearest Airport in km): {fit.slope:.10f}
+                    - Intercept: {fit.intercept:.3f}
+                    - p-value for Slope: {fit.p_value:.10f}
+                    - Cities with venue coordinates: {fit.n:,}''')
+
+        # Name the model behind the statistics when it is not the default OLS fit
+        model_note(options, fit)
+
+        # Add a note on reading the chart
+        st.markdown('''
+                    ##### How to read this chart
+                    - The distance is measured along the Earth's surface, from the median location of the city's venues to the nearest airport
+                    - A **negative slope** means that cities closer to an airport tend to host more music events
+                    ''')